@@ -0,0 +1,109 @@
+"""
+Measures the import time and memory of each service entry point.
+
+Every module is imported in a fresh interpreter, so that nothing is shared
+between measurements. Run it from the root of the repository with the
+workspace environment, e.g.
+
+    uv run scripts/benchmark_imports.py --top 10
+"""
+
+import argparse
+import subprocess
+import sys
+
+ENTRY_POINTS = [
+    'trades.main',
+    'candles.main',
+    'technical_indicators.main',
+    'predictor.main',
+    'predictor.incremental',
+    'predictor.inference',
+]
+
+# Imports the module and prints the wall time and the peak RSS of the process.
+MEASURE = """
+import resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+# ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+scale = 1 if sys.platform == 'darwin' else 1024
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale)
+"""
+
+
+def measure(module: str, repeat: int) -> tuple[float, float]:
+    """
+    Import the module in fresh interpreters.
+
+    Args:
+        module: The module to import.
+        repeat: The number of interpreters to start.
+
+    Returns:
+        The best import time in seconds and the peak RSS in MB.
+    """
+    times, rss = [], []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', MEASURE.format(module=module)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+        times.append(float(output[0]))
+        rss.append(int(output[1]) / 1024 / 1024)
+    return min(times), max(rss)
+
+
+def slowest_imports(module: str, top: int) -> list[tuple[int, str]]:
+    """
+    Get the direct imports of the module with the largest cumulative time, from
+    `python -X importtime`.
+
+    Returns:
+        A list of (cumulative time in microseconds, imported package).
+    """
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, package = line.removeprefix('import time:').split('|')
+        # Each level of the import tree is indented by two more spaces. Keep
+        # the modules imported directly by the entry point.
+        depth = (len(package) - len(package.lstrip()) - 1) // 2
+        if depth == 1:
+            imports.append((int(cumulative), package.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f'{"module":<30}{"import (s)":>12}{"peak RSS (MB)":>16}')
+    for module in args.modules:
+        try:
+            elapsed, rss = measure(module, args.repeat)
+        except subprocess.CalledProcessError as e:
+            print(f'{module:<30}{"failed":>12}  {e.stderr.strip().splitlines()[-1]}')
+            continue
+        print(f'{module:<30}{elapsed:>12.3f}{rss:>16.1f}')
+
+        if args.top:
+            for cumulative, package in slowest_imports(module, args.top):
+                print(f'    {cumulative / 1e6:>8.3f}s  {package}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Compares the CPU cost per candle of the per-candle and micro-batched indicators.
+
+Both paths are fed the same candles: one update per symbol per batch, over a
+history of `max_candles` candles. The per-candle path keeps the history of each
+symbol in a dict standing in for the quixstreams state, and the batched path
+in a `CandleHistory`. Run it from the root of the repository with the workspace
+environment, e.g.
+
+    uv run --extra talib scripts/benchmark_indicators.py --symbols 1 8 64 512
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+from benchmark_state import InMemoryState
+from technical_indicators.batch import CandleHistory, compute_technical_indicators_batch
+from technical_indicators.candle import update_candle_state
+from technical_indicators.indicators import compute_technical_indicators
+
+
+def generate_batches(num_symbols: int, num_batches: int, seed: int) -> list[list[dict]]:
+    """
+    Generate batches of candles with one new window per symbol in every batch.
+    """
+    rng = np.random.default_rng(seed)
+    prices = 100.0 * np.exp(
+        np.cumsum(rng.normal(0.0, 1e-3, size=(num_batches, num_symbols)), axis=0)
+    )
+    volumes = rng.lognormal(size=(num_batches, num_symbols))
+    return [
+        [
+            {
+                'symbol': f'SYM{s}',
+                'window_start_ms': b * 60_000,
+                'window_end_ms': (b + 1) * 60_000,
+                'opening_price': prices[b, s],
+                'high_price': prices[b, s],
+                'low_price': prices[b, s],
+                'closing_price': prices[b, s],
+                'volume': volumes[b, s],
+                'candle_duration': 60,
+            }
+            for s in range(num_symbols)
+        ]
+        for b in range(num_batches)
+    ]
+
+
+def run_per_candle(batches: list[list[dict]], max_candles: int) -> float:
+    states: dict[str, InMemoryState] = {}
+    start_ns = time.perf_counter_ns()
+    for batch in batches:
+        for candle in batch:
+            state = states.setdefault(candle['symbol'], InMemoryState())
+            candle = update_candle_state(candle, state, max_candles=max_candles)
+            # Late updates of older windows only update the state.
+            if candle is not None:
+                compute_technical_indicators(candle, state)
+    return time.perf_counter_ns() - start_ns
+
+
+def run_batched(batches: list[list[dict]], max_candles: int) -> float:
+    history = CandleHistory(max_candles)
+    start_ns = time.perf_counter_ns()
+    for batch in batches:
+        latest, rows = history.update(batch)
+        indicators = compute_technical_indicators_batch(
+            history.closing_prices[rows],
+            history.volume[rows],
+            history.lengths[rows],
+        )
+        for i, j in enumerate(latest):
+            _ = {**batch[j], **{name: values[i] for name, values in indicators.items()}}
+    return time.perf_counter_ns() - start_ns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--symbols', type=int, nargs='+', default=[1, 8, 64, 512])
+    parser.add_argument('--num-candles', type=int, default=20_000)
+    parser.add_argument('--max-candles', type=int, default=70)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    report = {}
+    for num_symbols in args.symbols:
+        num_batches = max(args.num_candles // num_symbols, args.max_candles)
+        batches = generate_batches(num_symbols, num_batches, args.seed)
+        num_candles = num_symbols * num_batches
+        report[num_symbols] = {
+            'candles': num_candles,
+            'per_candle_us': run_per_candle(batches, args.max_candles)
+            / num_candles
+            / 1000,
+            'batched_us': run_batched(batches, args.max_candles) / num_candles / 1000,
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    columns = ['candles', 'per_candle_us', 'batched_us']
+    print(f'{"symbols":<10}' + ''.join(f'{column:>16}' for column in columns))
+    for num_symbols, stats in report.items():
+        print(
+            f'{num_symbols:<10}'
+            + ''.join(f'{stats[column]:>16.2f}' for column in columns)
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""
+Runs trades -> candles -> technical_indicators in a single process.
+
+The transformation functions of the services are wired together over
+in-memory topics instead of Kafka, and fed by a deterministic trade source,
+so that the pipeline can be benchmarked on a laptop without the kind cluster.
+Messages are JSON encoded between stages, as they are on the real topics.
+Run it from the root of the repository with the workspace environment, e.g.
+
+    uv run --extra talib scripts/benchmark_pipeline.py --num-trades 200000
+"""
+
+import argparse
+import json
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import numpy as np
+from benchmark_state import InMemoryState
+from candles.main import init_candle, update_candle
+from technical_indicators.candle import update_candle_state
+from technical_indicators.indicators import compute_technical_indicators
+from trades.config import Settings as TradesSettings
+from trades.trade import Trade
+
+# The start of the generated trades, so that every run sees the same windows.
+START_MS = 1_700_000_000_000
+
+
+@dataclass
+class Message:
+    key: str
+    value: bytes
+    # When the trade the message originates from entered the pipeline.
+    created_ns: int
+
+
+class InMemoryTopic:
+    def __init__(self, name: str):
+        """
+        A stand-in for a Kafka topic, holding JSON encoded messages in memory.
+
+        Args:
+            name: The name of the topic.
+        """
+        self.name = name
+        self._messages: deque[Message] = deque()
+
+    def produce(self, key: str, value: dict, created_ns: int):
+        self._messages.append(Message(key, json.dumps(value).encode(), created_ns))
+
+    def poll(self, max_messages: int) -> list[Message]:
+        return [
+            self._messages.popleft()
+            for _ in range(min(max_messages, len(self._messages)))
+        ]
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+
+@dataclass
+class Stage:
+    """
+    A step of the pipeline, consuming one topic and producing to another.
+
+    `process` maps the key and decoded value of a message to the values to
+    produce, and is timed per message.
+    """
+
+    name: str
+    input_topic: InMemoryTopic
+    output_topic: Optional[InMemoryTopic]
+    process: Callable[[str, dict], list[dict]]
+    latencies_ns: list[int] = field(default_factory=list)
+    messages_out: int = 0
+
+    def run(self, max_messages: int, on_output: Callable[[Message], None]):
+        for message in self.input_topic.poll(max_messages):
+            start_ns = time.perf_counter_ns()
+            outputs = self.process(message.key, json.loads(message.value))
+            for value in outputs:
+                if self.output_topic is not None:
+                    self.output_topic.produce(message.key, value, message.created_ns)
+                on_output(message)
+            self.latencies_ns.append(time.perf_counter_ns() - start_ns)
+            self.messages_out += len(outputs)
+
+
+def generate_trades(
+    symbols: list[str], num_trades: int, trades_per_sec: float, seed: int
+) -> list[dict]:
+    """
+    Generate a reproducible stream of trades, as produced by the trades service.
+
+    Prices follow a geometric random walk per symbol, and the time between
+    trades is exponentially distributed.
+
+    Args:
+        symbols: The symbols to generate trades for.
+        num_trades: The number of trades across all symbols.
+        trades_per_sec: The average number of trades per second.
+        seed: The seed of the random generator.
+
+    Returns:
+        The trades, sorted by time.
+    """
+    rng = np.random.default_rng(seed)
+    symbol_idx = rng.integers(len(symbols), size=num_trades)
+    timestamp_ms = START_MS + np.cumsum(
+        rng.exponential(1000 / trades_per_sec, size=num_trades)
+    ).astype(np.int64)
+    quantities = rng.lognormal(mean=-2.0, sigma=1.0, size=num_trades)
+
+    log_returns = rng.normal(0.0, 1e-4, size=num_trades)
+    prices = np.empty(num_trades)
+    for i in range(len(symbols)):
+        mask = symbol_idx == i
+        prices[mask] = 100.0 * (i + 1) * np.exp(np.cumsum(log_returns[mask]))
+
+    return [
+        Trade.from_rest_api(
+            symbol=symbols[s], price=float(p), quantity=float(q), timestamp_sec=t / 1000
+        ).to_dict()
+        for s, p, q, t in zip(symbol_idx, prices, quantities, timestamp_ms, strict=True)
+    ]
+
+
+def candles_stage(candle_duration: int) -> Callable[[str, dict], list[dict]]:
+    """
+    The candles service: a tumbling window per symbol, emitting the current
+    candle on every trade.
+    """
+    duration_ms = candle_duration * 1000
+    windows: dict[str, dict] = {}
+
+    def process(key: str, trade: dict) -> list[dict]:
+        start_ms = trade['timestamp_ms'] - trade['timestamp_ms'] % duration_ms
+        window = windows.get(key)
+        if window is None or start_ms > window['start']:
+            window = {'start': start_ms, 'value': init_candle(trade)}
+            windows[key] = window
+        elif start_ms < window['start']:
+            # The window is already closed.
+            return []
+        else:
+            window['value'] = update_candle(window['value'], trade)
+
+        candle = window['value']
+        return [
+            {
+                'symbol': candle['symbol'],
+                'window_start_ms': start_ms,
+                'window_end_ms': start_ms + duration_ms,
+                'opening_price': candle['open'],
+                'high_price': candle['high'],
+                'low_price': candle['low'],
+                'closing_price': candle['close'],
+                'volume': candle['volume'],
+                'candle_duration': candle_duration,
+            }
+        ]
+
+    return process
+
+
+def technical_indicators_stage(
+    candle_duration: int, max_candles: int
+) -> Callable[[str, dict], list[dict]]:
+    """
+    The technical_indicators service: the candle history per symbol and the
+    indicators computed over it.
+    """
+    states: dict[str, InMemoryState] = defaultdict(InMemoryState)
+
+    def process(key: str, candle: dict) -> list[dict]:
+        if candle['candle_duration'] != candle_duration:
+            return []
+        state = states[key]
+        candle = update_candle_state(candle, state, max_candles=max_candles)
+        # Late updates of older windows only update the state, as in the service.
+        if candle is None:
+            return []
+        return [compute_technical_indicators(candle, state)]
+
+    return process
+
+
+def summarize(latencies_ns: list[int], total_ns: Optional[int] = None) -> dict:
+    """
+    Get the throughput and latency percentiles of a list of latencies.
+
+    Args:
+        latencies_ns: The latencies in nanoseconds.
+        total_ns: The wall time to compute the throughput over. Defaults to the
+            sum of the latencies.
+
+    Returns:
+        The number of messages, messages per second and latencies in microseconds.
+    """
+    latencies = np.asarray(latencies_ns, dtype=np.float64)
+    if not len(latencies):
+        return {'messages': 0}
+    if total_ns is None:
+        total_ns = latencies.sum()
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) / 1000
+    return {
+        'messages': len(latencies),
+        'msgs_per_sec': len(latencies) / (total_ns / 1e9),
+        'p50_us': p50,
+        'p95_us': p95,
+        'p99_us': p99,
+        'max_us': latencies.max() / 1000,
+    }
+
+
+def run(
+    trades: list[dict],
+    candle_duration: int,
+    max_candles: int,
+    batch_size: int,
+) -> dict[str, dict]:
+    """
+    Push the trades through the pipeline.
+
+    Trades are produced in batches of `batch_size`, and every stage then
+    consumes its topic in batches of `batch_size` until all topics are empty.
+
+    Returns:
+        The summary of each stage, and of the end-to-end latency from a trade
+        being produced to the indicators it updates being emitted.
+    """
+    trades_topic = InMemoryTopic('trades')
+    candles_topic = InMemoryTopic('candles')
+    indicators_topic = InMemoryTopic('technical_indicators')
+    stages = [
+        Stage('candles', trades_topic, candles_topic, candles_stage(candle_duration)),
+        Stage(
+            'technical_indicators',
+            candles_topic,
+            indicators_topic,
+            technical_indicators_stage(candle_duration, max_candles),
+        ),
+    ]
+
+    end_to_end_ns = []
+
+    def on_indicators(message: Message):
+        end_to_end_ns.append(time.perf_counter_ns() - message.created_ns)
+
+    def noop(message: Message):
+        pass
+
+    start_ns = time.perf_counter_ns()
+    for i in range(0, len(trades), batch_size):
+        for trade in trades[i : i + batch_size]:
+            trades_topic.produce(trade['symbol'], trade, time.perf_counter_ns())
+        while any(len(stage.input_topic) for stage in stages):
+            for stage in stages:
+                stage.run(
+                    batch_size,
+                    on_indicators if stage is stages[-1] else noop,
+                )
+        # Nothing reads the output topic, so keep it from growing.
+        indicators_topic.poll(len(indicators_topic))
+    total_ns = time.perf_counter_ns() - start_ns
+
+    summary = {stage.name: summarize(stage.latencies_ns) for stage in stages}
+    summary['end_to_end'] = summarize(end_to_end_ns, total_ns)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--symbols', nargs='+', default=TradesSettings.model_fields['symbols'].default
+    )
+    parser.add_argument('--num-trades', type=int, default=100_000)
+    parser.add_argument('--trades-per-sec', type=float, default=20.0)
+    parser.add_argument('--candle-duration', type=int, default=60)
+    parser.add_argument('--max-candles', type=int, default=70)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    trades = generate_trades(
+        args.symbols, args.num_trades, args.trades_per_sec, args.seed
+    )
+    summary = run(trades, args.candle_duration, args.max_candles, args.batch_size)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    columns = ['messages', 'msgs_per_sec', 'p50_us', 'p95_us', 'p99_us', 'max_us']
+    print(f'{"stage":<22}' + ''.join(f'{column:>14}' for column in columns))
+    for name, stats in summary.items():
+        print(
+            f'{name:<22}'
+            + ''.join(f'{stats.get(column, float("nan")):>14.1f}' for column in columns)
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+"""
+The stand-in for the quixstreams state shared by the benchmark scripts.
+"""
+
+from typing import Any
+
+
+class InMemoryState:
+    """
+    A stand-in for the quixstreams state of a single message key.
+    """
+
+    def __init__(self):
+        self._data: dict[str, Any] = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._data.get(key, default)
+
+    def set(self, key: str, value: Any):
+        self._data[key] = value
@@ -0,0 +1,22 @@
+from functools import lru_cache
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file='services/archive/src/archive/archive.env'
+    )
+
+    kafka_broker_address: str
+    kafka_input_topic: str
+    kafka_consumer_group: str
+    archive_dir: str
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Get the settings of the archive service, loaded on first use.
+    """
+    return Settings()
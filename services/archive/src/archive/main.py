@@ -0,0 +1,140 @@
+import json
+import os
+from collections import defaultdict
+
+from loguru import logger
+from quixstreams import Application
+from quixstreams.sinks import BatchingSink, SinkBatch
+
+from archive.store import INDEX_COLUMN, ArchiveWriter
+
+Stream = tuple[str, int]
+
+# The held back candles, kept next to the streams of the archive.
+PENDING_FILE = 'pending.json'
+
+
+class CandleArchiveSink(BatchingSink):
+    def __init__(self, archive_dir: str):
+        """
+        Appends the candles of a topic to the archive.
+
+        Candles are emitted on every update of their window, so the latest
+        version of each window is held back until the next window starts, and
+        only then appended. Updates of a window that was already archived are
+        dropped, which also makes replays after a restart idempotent.
+
+        The held back candles are saved to the archive at the end of every
+        batch, before its offsets are committed, and loaded again on restart,
+        so the last window of every stream is not lost with them.
+
+        Args:
+            archive_dir: The directory of the archive.
+        """
+        super().__init__()
+        self.archive_dir = archive_dir
+        self._writers: dict[Stream, ArchiveWriter] = {}
+        self._pending_path = os.path.join(archive_dir, PENDING_FILE)
+        self._pending: dict[Stream, dict] = self._load_pending()
+
+    def _get_writer(self, stream: Stream) -> ArchiveWriter:
+        writer = self._writers.get(stream)
+        if writer is None:
+            writer = ArchiveWriter(self.archive_dir, *stream)
+            self._writers[stream] = writer
+        return writer
+
+    def write(self, batch: SinkBatch):
+        complete: dict[Stream, list[dict]] = defaultdict(list)
+        for item in batch:
+            candle = item.value
+            stream = (candle['symbol'], int(candle['candle_duration']))
+            pending = self._pending.get(stream)
+            if pending is not None:
+                if candle[INDEX_COLUMN] < pending[INDEX_COLUMN]:
+                    continue
+                if candle[INDEX_COLUMN] > pending[INDEX_COLUMN]:
+                    complete[stream].append(pending)
+            self._pending[stream] = candle
+
+        for stream, candles in complete.items():
+            num_rows = self._get_writer(stream).append(candles)
+            logger.debug(f'Archived {num_rows} candles of {stream}')
+
+        if batch.size:
+            self._save_pending()
+
+    def _load_pending(self) -> dict[Stream, dict]:
+        if not os.path.exists(self._pending_path):
+            return {}
+        with open(self._pending_path) as f:
+            candles = json.load(f)
+        logger.info(f'Loaded {len(candles)} pending candles')
+        return {
+            (candle['symbol'], int(candle['candle_duration'])): candle
+            for candle in candles
+        }
+
+    def _save_pending(self):
+        """
+        Write the held back candles, replacing the previous ones atomically.
+        """
+        os.makedirs(self.archive_dir, exist_ok=True)
+        tmp_path = f'{self._pending_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(list(self._pending.values()), f)
+        os.replace(tmp_path, self._pending_path)
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+
+
+def run(
+    kafka_broker_address: str,
+    kafka_input_topic: str,
+    kafka_consumer_group: str,
+    archive_dir: str,
+):
+    """
+    Archives a stream of candles or technical indicators to local columnar files.
+
+    - Ingests candles from the 'kafka_input_topic' topic.
+    - Appends the complete candles of each symbol and candle duration to
+      'archive_dir'.
+
+    Args:
+        kafka_broker_address (str): The address of the Kafka broker.
+        kafka_input_topic (str): The topic to ingest candles from.
+        kafka_consumer_group (str): The consumer group to use for the application.
+        archive_dir (str): The directory of the archive.
+    """
+    app = Application(
+        broker_address=kafka_broker_address,
+        consumer_group=kafka_consumer_group,
+        auto_offset_reset='earliest',
+    )
+
+    candles_topic = app.topic(kafka_input_topic, value_deserializer='json')
+
+    sink = CandleArchiveSink(archive_dir)
+    sdf = app.dataframe(topic=candles_topic)
+    sdf.sink(sink)
+
+    try:
+        app.run()
+    finally:
+        sink.close()
+
+
+if __name__ == '__main__':
+    from archive.config import get_settings
+
+    settings = get_settings()
+
+    run(
+        kafka_broker_address=settings.kafka_broker_address,
+        kafka_input_topic=settings.kafka_input_topic,
+        kafka_consumer_group=settings.kafka_consumer_group,
+        archive_dir=settings.archive_dir,
+    )
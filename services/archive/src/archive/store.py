@@ -0,0 +1,245 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# The column the rows are sorted by, and searched to read a time range.
+INDEX_COLUMN = 'window_start_ms'
+INT_COLUMNS = ('window_start_ms', 'window_end_ms')
+# Columns encoded in the path of the stream instead of stored per row.
+STREAM_COLUMNS = ('symbol', 'candle_duration')
+SCHEMA_FILE = 'schema.json'
+
+
+def get_stream_dir(root: str, symbol: str, candle_duration: int) -> str:
+    return os.path.join(root, symbol.replace('/', '_'), str(candle_duration))
+
+
+def _column_path(stream_dir: str, column: str) -> str:
+    return os.path.join(stream_dir, f'{column}.bin')
+
+
+class ArchiveWriter:
+    def __init__(self, root: str, symbol: str, candle_duration: int):
+        """
+        Appends candles of one (symbol, candle_duration) stream to the archive.
+
+        Every column is stored in its own file of fixed-width little-endian
+        values, so row `i` of every column is at offset `i * itemsize`. Rows
+        must be appended in time order. The index column is written last, so
+        its length is the number of complete rows, and a partially written row
+        is truncated when the stream is opened again.
+
+        Args:
+            root: The directory of the archive.
+            symbol: The symbol of the candles.
+            candle_duration: The duration of the candles in seconds.
+        """
+        self.symbol = symbol
+        self.candle_duration = candle_duration
+        self.stream_dir = get_stream_dir(root, symbol, candle_duration)
+        self.columns: Optional[dict[str, np.dtype]] = None
+        self.num_rows = 0
+        self.last_window_start_ms: Optional[int] = None
+        self._files = {}
+
+        schema_path = os.path.join(self.stream_dir, SCHEMA_FILE)
+        if os.path.exists(schema_path):
+            with open(schema_path) as f:
+                schema = json.load(f)
+            self.columns = {
+                column: np.dtype(dtype) for column, dtype in schema['columns'].items()
+            }
+            self._open()
+
+    def _open(self):
+        index_path = _column_path(self.stream_dir, INDEX_COLUMN)
+        index_dtype = self.columns[INDEX_COLUMN]
+        self.num_rows = (
+            os.path.getsize(index_path) // index_dtype.itemsize
+            if os.path.exists(index_path)
+            else 0
+        )
+
+        for column, dtype in self.columns.items():
+            path = _column_path(self.stream_dir, column)
+            f = open(path, 'ab')
+            # Drop the rows that were not completely written.
+            f.truncate(self.num_rows * dtype.itemsize)
+            self._files[column] = f
+
+        if self.num_rows:
+            index = np.memmap(index_path, dtype=index_dtype, mode='r')
+            self.last_window_start_ms = int(index[self.num_rows - 1])
+
+    def _create(self, row: dict):
+        columns = [INDEX_COLUMN] + [
+            column
+            for column, value in row.items()
+            if column != INDEX_COLUMN
+            and column not in STREAM_COLUMNS
+            and (value is None or isinstance(value, (int, float)))
+        ]
+        self.columns = {
+            column: np.dtype('<i8' if column in INT_COLUMNS else '<f8')
+            for column in columns
+        }
+
+        os.makedirs(self.stream_dir, exist_ok=True)
+        with open(os.path.join(self.stream_dir, SCHEMA_FILE), 'w') as f:
+            json.dump(
+                {
+                    'symbol': self.symbol,
+                    'candle_duration': self.candle_duration,
+                    'columns': {
+                        column: dtype.str for column, dtype in self.columns.items()
+                    },
+                },
+                f,
+                indent=2,
+            )
+        self._open()
+        logger.info(f'Created archive {self.stream_dir} with {len(columns)} columns')
+
+    def append(self, rows: list[dict]) -> int:
+        """
+        Append the rows that are newer than the last archived row.
+
+        Columns missing from a row are stored as NaN, and columns that are not
+        in the schema of the stream are ignored.
+
+        Args:
+            rows: The candles, sorted by time.
+
+        Returns:
+            The number of rows appended.
+        """
+        if self.last_window_start_ms is not None:
+            rows = [
+                row for row in rows if row[INDEX_COLUMN] > self.last_window_start_ms
+            ]
+        if not rows:
+            return 0
+        if self.columns is None:
+            self._create(rows[0])
+
+        # The index column is written last, making the rows visible to readers.
+        for column in [*list(self.columns)[1:], INDEX_COLUMN]:
+            values = [row.get(column) for row in rows]
+            values = np.array(
+                [np.nan if value is None else value for value in values],
+                dtype=self.columns[column],
+            )
+            self._files[column].write(values.tobytes())
+            self._files[column].flush()
+
+        self.num_rows += len(rows)
+        self.last_window_start_ms = int(rows[-1][INDEX_COLUMN])
+        return len(rows)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+class CandleArchive:
+    def __init__(self, root: str):
+        """
+        Reads candles from the archive written by `ArchiveWriter`.
+
+        Args:
+            root: The directory of the archive.
+        """
+        self.root = root
+
+    def streams(self) -> list[tuple[str, int]]:
+        """
+        Get the (symbol, candle_duration) of every stream in the archive.
+        """
+        streams = []
+        for stream_dir, _, files in os.walk(self.root):
+            if SCHEMA_FILE in files:
+                with open(os.path.join(stream_dir, SCHEMA_FILE)) as f:
+                    schema = json.load(f)
+                streams.append((schema['symbol'], schema['candle_duration']))
+        return sorted(streams)
+
+    def read(
+        self,
+        symbol: str,
+        candle_duration: int,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+    ) -> dict[str, np.ndarray]:
+        """
+        Read a time range of a stream without copying it into memory.
+
+        Args:
+            symbol: The symbol of the candles.
+            candle_duration: The duration of the candles in seconds.
+            start_ms: The first window start to include. Defaults to the first row.
+            end_ms: The window start to stop before. Defaults to after the last row.
+
+        Returns:
+            A read-only memory-mapped array per column.
+        """
+        stream_dir = get_stream_dir(self.root, symbol, candle_duration)
+        schema_path = os.path.join(stream_dir, SCHEMA_FILE)
+        if not os.path.exists(schema_path):
+            raise ValueError(
+                f'No archive for {symbol} {candle_duration} in {self.root}'
+            )
+        with open(schema_path) as f:
+            columns = {
+                column: np.dtype(dtype)
+                for column, dtype in json.load(f)['columns'].items()
+            }
+
+        index_path = _column_path(stream_dir, INDEX_COLUMN)
+        num_rows = os.path.getsize(index_path) // columns[INDEX_COLUMN].itemsize
+        if not num_rows:
+            return {
+                column: np.empty(0, dtype=dtype) for column, dtype in columns.items()
+            }
+
+        # The rows are sorted by the index column, so it is its own time index.
+        index = np.memmap(
+            index_path, dtype=columns[INDEX_COLUMN], mode='r', shape=(num_rows,)
+        )
+        start = 0 if start_ms is None else int(np.searchsorted(index, start_ms))
+        end = num_rows if end_ms is None else int(np.searchsorted(index, end_ms))
+
+        return {
+            column: np.memmap(
+                _column_path(stream_dir, column),
+                dtype=dtype,
+                mode='r',
+                shape=(num_rows,),
+            )[start:end]
+            for column, dtype in columns.items()
+        }
+
+    def read_frame(
+        self,
+        symbol: str,
+        candle_duration: int,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Read a time range of a stream into a dataframe with the same columns as
+        the technical indicators table.
+        """
+        columns = self.read(symbol, candle_duration, start_ms, end_ms)
+        num_rows = len(columns[INDEX_COLUMN])
+        return pd.DataFrame(
+            {
+                'symbol': np.full(num_rows, symbol, dtype=object),
+                'candle_duration': np.full(num_rows, candle_duration),
+                **columns,
+            }
+        )
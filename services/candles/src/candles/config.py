@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -11,6 +14,21 @@ class Settings(BaseSettings):
     kafka_output_topic: str
     candle_duration: int
     kafka_consumer_group: str
+    # How long after its end a window still accepts trades, and whether the
+    # windows are closed by the trades of their symbol or of their partition.
+    allowed_lateness_sec: float = 0.0
+    window_closing_strategy: Literal['key', 'partition'] = 'key'
+    # The port to serve metrics on, disabled when not set.
+    metrics_port: Optional[int] = None
+    # Profile for `profile_duration_sec` on SIGUSR1, or right away.
+    profile_dir: str = 'profiles'
+    profile_duration_sec: float = 30.0
+    profile_on_start: bool = False
 
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Get the settings of the candles service, loaded on first use.
+    """
+    return Settings()
@@ -1,10 +1,43 @@
 from datetime import timedelta
-from typing import Any, List, Optional, Tuple
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
 from loguru import logger
-from quixstreams import Application
+from observability import REGISTRY, Counter, Gauge, start_metrics_server
+from observability.profiling import install_profiler, timed
+from observability.streaming import StreamMetrics
+from observability.tracing import CANDLE_EMITTED, from_headers, stamp, to_headers
+from quixstreams import Application, message_context
+from quixstreams.dataframe import StreamingDataFrame
 from quixstreams.models import TimestampType
 
+# What advances the time windows are closed against: the trades of the same
+# symbol, or all the trades of the partition.
+ClosingStrategy = Literal['key', 'partition']
+
+LATE_TRADES_DROPPED = REGISTRY.register(
+    Counter(
+        'late_trades_dropped_total',
+        'Trades dropped for arriving after their window was closed, per symbol.',
+        label_names=('symbol',),
+    )
+)
+LATE_TRADES_ACCEPTED = REGISTRY.register(
+    Counter(
+        'late_trades_accepted_total',
+        'Trades that updated a window after its end, within the allowed lateness, '
+        'per symbol.',
+        label_names=('symbol',),
+    )
+)
+WINDOW_WATERMARK_MS = REGISTRY.register(
+    Gauge(
+        'window_watermark_ms',
+        'The latest trade time, per symbol or per partition depending on the '
+        'closing strategy.',
+        label_names=('key',),
+    )
+)
+
 
 def timestamp_extractor(
     value: any,
@@ -18,6 +51,105 @@ def timestamp_extractor(
     return value['timestamp_ms']
 
 
+def attach_trace(
+    value: dict,
+    key: Any,
+    timestamp: int,
+    headers: Optional[List[Tuple[str, Any]]],
+) -> dict:
+    """
+    Copy the timing headers of the trade into its value, so that the candle
+    can carry the trace of its latest trade through the window.
+    """
+    return {**value, 'trace': from_headers(headers)}
+
+
+def trace_candle(
+    value: dict,
+    key: Any,
+    timestamp: int,
+    headers: Optional[List[Tuple[str, Any]]],
+) -> List[Tuple[str, bytes]]:
+    """
+    Set the timing headers of the emitted candle from the trace of its latest trade.
+    """
+    return to_headers(stamp(value['value'].get('trace'), CANDLE_EMITTED))
+
+
+def count_dropped_trade(
+    value: dict,
+    key: Any,
+    timestamp_ms: int,
+    late_by_ms: int,
+    start: int,
+    end: int,
+    store_name: str,
+    topic: str,
+    partition: int,
+    offset: int,
+) -> bool:
+    """
+    Count a trade dropped for arriving after its window was closed.
+
+    Returns:
+        bool: False, so that the window does not log a warning per trade, which
+            a replay of old trades would flood the logs with.
+    """
+    LATE_TRADES_DROPPED.inc(symbol=value['symbol'])
+    logger.debug(f'Dropped a trade of {value["symbol"]} late by {late_by_ms}ms')
+    return False
+
+
+class WindowLateness:
+    def __init__(
+        self,
+        candle_duration: int,
+        allowed_lateness_ms: int,
+        closing_strategy: ClosingStrategy,
+    ):
+        """
+        Follows the watermarks the windows are closed against, to count the
+        trades that update a window after its end. The dropped trades are
+        counted by `count_dropped_trade`.
+
+        The watermarks are kept in memory, so they start over on restart,
+        while the windows keep theirs in the state.
+
+        Args:
+            candle_duration: The duration of the candles in seconds.
+            allowed_lateness_ms: How long after its end a window still accepts
+                trades.
+            closing_strategy: Whether the watermark is per symbol ('key') or per
+                partition ('partition').
+        """
+        self.duration_ms = candle_duration * 1000
+        self.allowed_lateness_ms = allowed_lateness_ms
+        self.closing_strategy = closing_strategy
+        self._watermarks: Dict[str, int] = {}
+
+    def observe(
+        self,
+        value: dict,
+        key: Any,
+        timestamp: int,
+        headers: Optional[List[Tuple[str, Any]]],
+    ):
+        if self.closing_strategy == 'key':
+            watermark_key = value['symbol']
+        else:
+            watermark_key = f'partition {message_context().partition}'
+
+        watermark = self._watermarks.get(watermark_key)
+        if watermark is None or timestamp >= watermark:
+            self._watermarks[watermark_key] = timestamp
+            WINDOW_WATERMARK_MS.set(timestamp, key=watermark_key)
+            return
+
+        window_end = timestamp - timestamp % self.duration_ms + self.duration_ms
+        if watermark - self.allowed_lateness_ms < window_end <= watermark:
+            LATE_TRADES_ACCEPTED.inc(symbol=value['symbol'])
+
+
 def init_candle(trade: dict) -> dict:
     """
     Initialize a candle with the first trade
@@ -29,6 +161,7 @@ def init_candle(trade: dict) -> dict:
         'close': trade['price'],
         'volume': trade['quantity'],
         'symbol': trade['symbol'],
+        'trace': trade.get('trace'),
     }
 
 
@@ -40,58 +173,70 @@ def update_candle(candle: dict, trade: dict) -> dict:
     candle['high'] = max(candle['high'], trade['price'])
     candle['low'] = min(candle['low'], trade['price'])
     candle['volume'] += trade['quantity']
+    candle['trace'] = trade.get('trace')
 
     return candle
 
 
-def run(
-    kafka_broker_address: str,
-    kafka_input_topic: str,
-    kafka_output_topic: str,
+def candles_from_trades(
+    sdf: StreamingDataFrame,
     candle_duration: int,
-    kafka_consumer_group: str,
-):
+    allowed_lateness_ms: int = 0,
+    closing_strategy: ClosingStrategy = 'key',
+) -> StreamingDataFrame:
     """
-    Transforms a stream of input trades into a stream of output candles.
+    Aggregates a dataframe of trades into candles of a fixed duration.
 
-    - Ingests trades from the 'kafka_input_topic' topic.
-    - Aggregates trades into candles of a fixed duration (in seconds).
-    - Produces candles to the 'kafka_output_topic' topic.
+    The current candle of each window is emitted on every trade.
+
+    A window is closed, and its state deleted, once the watermark is
+    `allowed_lateness_ms` past its end, and the trades arriving after that are
+    dropped. A late trade emits the candle of its window again, after the
+    candles of newer windows.
+
+    With the 'key' closing strategy the watermark is the latest trade of the
+    same symbol, so replayed trades of a symbol are not dropped against the
+    live trades of another, but the last windows of an idle symbol stay in the
+    state until its next trade. With the 'partition' strategy every trade
+    closes the windows of all the symbols of its partition. Either way, the
+    state holds at most `1 + allowed_lateness_ms / candle_duration` windows
+    per symbol.
 
     Args:
-        kafka_broker_address (str): The address of the Kafka broker.
-        kafka_input_topic (str): The topic to ingest trades from.
-        kafka_output_topic (str): The topic to produce candles to.
+        sdf (StreamingDataFrame): The dataframe of trades, keyed by symbol.
         candle_duration (int): The duration of the candles in seconds.
-        kafka_consumer_group (str): The consumer group to use for the application.
-    """
-    app = Application(
-        broker_address=kafka_broker_address,
-        consumer_group=kafka_consumer_group,
-    )
+        allowed_lateness_ms (int): How long after its end a window still
+            accepts trades.
+        closing_strategy (ClosingStrategy): What advances the watermark.
 
-    trades_topic = app.topic(
-        kafka_input_topic,
-        value_deserializer='json',
-        timestamp_extractor=timestamp_extractor,
-    )
-    candles_topic = app.topic(kafka_output_topic, value_serializer='json')
+    Returns:
+        StreamingDataFrame: The dataframe of candles.
+    """
+    sdf = sdf.apply(attach_trace, metadata=True)
 
-    # Create a dataframe to ingest trades from the trades topic
-    sdf = app.dataframe(topic=trades_topic)
+    lateness = WindowLateness(candle_duration, allowed_lateness_ms, closing_strategy)
+    sdf = sdf.update(lateness.observe, metadata=True)
 
-    # Update the dataframe to log the received trades for now.
     sdf = (
         # define the tumbling window
-        sdf.tumbling_window(timedelta(seconds=candle_duration))
+        sdf.tumbling_window(
+            timedelta(seconds=candle_duration),
+            grace_ms=allowed_lateness_ms,
+            on_late=count_dropped_trade,
+        )
         # reducers to aggregate trades into candles
         .reduce(
-            reducer=update_candle,  # updates the candle with a new trade
-            initializer=init_candle,  # returns initial value for the candle
+            # updates the candle with a new trade
+            reducer=timed('update_candle')(update_candle),
+            # returns initial value for the candle
+            initializer=timed('init_candle')(init_candle),
         )
     )
 
-    sdf = sdf.current()
+    sdf = sdf.current(closing_strategy=closing_strategy)
+
+    # headers do not survive the window, so set them from the latest trade
+    sdf = sdf.set_headers(trace_candle)
 
     # extract the candle details and re-format the dataframe
     sdf['opening_price'] = sdf['value']['open']
@@ -120,17 +265,81 @@ def run(
 
     sdf['candle_duration'] = candle_duration
 
+    return sdf
+
+
+def run(
+    kafka_broker_address: str,
+    kafka_input_topic: str,
+    kafka_output_topic: str,
+    candle_duration: int,
+    kafka_consumer_group: str,
+    metrics_port: Optional[int] = None,
+    allowed_lateness_ms: int = 0,
+    closing_strategy: ClosingStrategy = 'key',
+):
+    """
+    Transforms a stream of input trades into a stream of output candles.
+
+    - Ingests trades from the 'kafka_input_topic' topic.
+    - Aggregates trades into candles of a fixed duration (in seconds).
+    - Produces candles to the 'kafka_output_topic' topic.
+
+    Args:
+        kafka_broker_address (str): The address of the Kafka broker.
+        kafka_input_topic (str): The topic to ingest trades from.
+        kafka_output_topic (str): The topic to produce candles to.
+        candle_duration (int): The duration of the candles in seconds.
+        kafka_consumer_group (str): The consumer group to use for the application.
+        metrics_port (Optional[int]): The port to serve metrics on.
+        allowed_lateness_ms (int): How long after its end a window still
+            accepts trades.
+        closing_strategy (ClosingStrategy): Whether the windows are closed per
+            symbol ('key') or per partition ('partition').
+    """
+    if metrics_port is not None:
+        start_metrics_server(metrics_port)
+
+    metrics = StreamMetrics()
+    app = Application(
+        broker_address=kafka_broker_address,
+        consumer_group=kafka_consumer_group,
+        on_message_processed=metrics.on_message_processed,
+    )
+    metrics.watch(app)
+
+    trades_topic = app.topic(
+        kafka_input_topic,
+        value_deserializer='json',
+        timestamp_extractor=timestamp_extractor,
+    )
+    candles_topic = app.topic(kafka_output_topic, value_serializer='json')
+
+    # Create a dataframe to ingest trades from the trades topic
+    sdf = app.dataframe(topic=trades_topic)
+    sdf = sdf.update(metrics.on_message_received, metadata=True)
+    sdf = candles_from_trades(
+        sdf, candle_duration, allowed_lateness_ms, closing_strategy
+    )
+
     sdf = sdf.update(lambda value: logger.debug(f'Candle: {value}'))
 
     # Write the transformed dataframe to the candles topic.
     sdf = sdf.to_topic(candles_topic)
+    sdf = sdf.update(metrics.count_produced(candles_topic.name))
 
     # Run the application.
     app.run()
 
 
 if __name__ == '__main__':
-    from candles.config import settings
+    from candles.config import get_settings
+
+    settings = get_settings()
+
+    install_profiler(
+        settings.profile_dir, settings.profile_duration_sec, settings.profile_on_start
+    )
 
     run(
         kafka_broker_address=settings.kafka_broker_address,
@@ -138,4 +347,7 @@ if __name__ == '__main__':
         kafka_output_topic=settings.kafka_output_topic,
         candle_duration=settings.candle_duration,
         kafka_consumer_group=settings.kafka_consumer_group,
+        metrics_port=settings.metrics_port,
+        allowed_lateness_ms=int(settings.allowed_lateness_sec * 1000),
+        closing_strategy=settings.window_closing_strategy,
     )
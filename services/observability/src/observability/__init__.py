@@ -0,0 +1,17 @@
+from observability.metrics import (
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    start_metrics_server,
+)
+
+__all__ = [
+    'REGISTRY',
+    'Counter',
+    'Gauge',
+    'Histogram',
+    'MetricsRegistry',
+    'start_metrics_server',
+]
@@ -0,0 +1,290 @@
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional, TypeVar, Union
+
+from loguru import logger
+
+# Upper bounds of the latency buckets, in milliseconds.
+LATENCY_BUCKETS_MS = (
+    1,
+    2,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1_000,
+    2_500,
+    5_000,
+    10_000,
+    30_000,
+    60_000,
+    120_000,
+)
+# Upper bounds of the buckets of per-message processing times, in milliseconds.
+PROCESSING_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS_MS,
+        label_names: tuple[str, ...] = (),
+    ):
+        """
+        A histogram with fixed buckets, one set of buckets per label values.
+
+        Args:
+            name: The name of the metric.
+            documentation: What the metric measures.
+            buckets: The upper bounds of the buckets, in increasing order.
+            label_names: The names of the labels of each observation.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label_names = label_names
+        # label values -> (bucket counts, including +Inf, sum of observations)
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[key] = series
+            counts, total = series
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def snapshot(self) -> dict[tuple[str, ...], tuple[list[int], float]]:
+        """
+        Get the bucket counts and sum of observations of each series.
+        """
+        with self._lock:
+            return {
+                key: (list(counts), total[0])
+                for key, (counts, total) in self._series.items()
+            }
+
+    def quantile(self, q: float, **labels: str) -> Optional[float]:
+        """
+        Estimate a quantile of a series as the upper bound of the bucket it is in.
+
+        Returns:
+            The estimate, or None if nothing was observed. Values above the
+            largest bucket are reported as infinite.
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        counts, _ = self.snapshot().get(key, ([], 0.0))
+        num_observations = sum(counts)
+        if not num_observations:
+            return None
+        cumulative = 0
+        for upper_bound, count in zip(
+            (*self.buckets, float('inf')), counts, strict=True
+        ):
+            cumulative += count
+            if cumulative >= q * num_observations:
+                return upper_bound
+        return float('inf')
+
+    def render(self) -> list[str]:
+        """
+        Render the histogram in the Prometheus text exposition format.
+        """
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for key, (counts, total) in sorted(self.snapshot().items()):
+            labels = [
+                f'{name}="{value}"'
+                for name, value in zip(self.label_names, key, strict=True)
+            ]
+            cumulative = 0
+            for upper_bound, count in zip((*self.buckets, '+Inf'), counts, strict=True):
+                cumulative += count
+                bucket_labels = ','.join([*labels, f'le="{upper_bound}"'])
+                lines.append(f'{self.name}_bucket{{{bucket_labels}}} {cumulative}')
+            series_labels = f'{{{",".join(labels)}}}' if labels else ''
+            lines.append(f'{self.name}_sum{series_labels} {total}')
+            lines.append(f'{self.name}_count{series_labels} {cumulative}')
+        return lines
+
+
+def _format_labels(label_names: tuple[str, ...], key: tuple[str, ...]) -> str:
+    if not label_names:
+        return ''
+    labels = ','.join(
+        f'{name}="{value}"' for name, value in zip(label_names, key, strict=True)
+    )
+    return f'{{{labels}}}'
+
+
+class Counter:
+    def __init__(
+        self, name: str, documentation: str, label_names: tuple[str, ...] = ()
+    ):
+        """
+        A monotonically increasing count, one per label values. Rates, such as
+        messages per second, are derived from it at query time.
+
+        Args:
+            name: The name of the metric.
+            documentation: What the metric counts.
+            label_names: The names of the labels of each increment.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} counter',
+            *(
+                f'{self.name}{_format_labels(self.label_names, key)} {value}'
+                for key, value in values
+            ),
+        ]
+
+
+class Gauge:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        callback: Optional[Callable[[], dict[tuple[str, ...], float]]] = None,
+    ):
+        """
+        A value that can go up and down, one per label values.
+
+        Args:
+            name: The name of the metric.
+            documentation: What the metric measures.
+            label_names: The names of the labels of each value.
+            callback: Computes the values on every scrape instead of them being
+                set, for values that are expensive to keep up to date. Maps the
+                label values to the value.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.callback = callback
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels: str) -> Optional[float]:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            return self._values.get(key)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        if self.callback is not None:
+            try:
+                values.update(self.callback())
+            except Exception as e:
+                logger.error(f'Error computing {self.name}: {e}')
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} gauge',
+            *(
+                f'{self.name}{_format_labels(self.label_names, key)} {value}'
+                for key, value in sorted(values.items())
+            ),
+        ]
+
+
+Metric = Union[Histogram, Counter, Gauge]
+MetricT = TypeVar('MetricT', Histogram, Counter, Gauge)
+
+
+class MetricsRegistry:
+    """
+    The metrics exposed by a service.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: MetricT) -> MetricT:
+        """
+        Register a metric, or get the one already registered under its name.
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+def start_metrics_server(
+    port: int, host: str = '0.0.0.0', registry: MetricsRegistry = REGISTRY
+) -> ThreadingHTTPServer:
+    """
+    Serve the metrics on `http://<host>:<port>/metrics` from a daemon thread.
+
+    Args:
+        port: The port to listen on.
+        host: The address to listen on.
+        registry: The metrics to serve.
+
+    Returns:
+        The server, which can be stopped with `shutdown`.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f'Serving metrics on http://{host}:{port}/metrics')
+    return server
@@ -0,0 +1,184 @@
+import functools
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter as CounterDict
+from typing import Callable, Optional, TypeVar
+
+from loguru import logger
+
+from observability.metrics import PROCESSING_BUCKETS_MS, REGISTRY, Histogram
+
+STAGE_DURATION_MS = REGISTRY.register(
+    Histogram(
+        'stage_duration_ms',
+        'Time spent in a step of the pipeline, in milliseconds.',
+        buckets=PROCESSING_BUCKETS_MS,
+        label_names=('stage',),
+    )
+)
+
+F = TypeVar('F', bound=Callable)
+
+
+def timed(stage: str) -> Callable[[F], F]:
+    """
+    Record the duration of every call of the decorated function in the
+    `stage_duration_ms` histogram.
+
+    Args:
+        stage: The name of the stage.
+    """
+
+    def decorator(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started_at = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                STAGE_DURATION_MS.observe(
+                    (time.perf_counter() - started_at) * 1000, stage=stage
+                )
+
+        return wrapper
+
+    return decorator
+
+
+Stack = tuple[str, ...]
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    def __init__(self, output_dir: str, interval_sec: float = 0.005):
+        """
+        A statistical profiler that samples the stacks of all threads from a
+        background thread, so the profiled code runs uninstrumented.
+
+        Every run writes two files to `output_dir`:
+        - `profile-<time>.folded`: the sampled stacks in the collapsed format
+          read by flamegraph.pl, speedscope and inferno.
+        - `profile-<time>.txt`: the functions with the most samples, and the
+          per-stage timers.
+
+        Args:
+            output_dir: The directory to write the profiles to.
+            interval_sec: The time between two samples.
+        """
+        self.output_dir = output_dir
+        self.interval_sec = interval_sec
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration_sec: float) -> bool:
+        """
+        Start sampling for the given duration, unless a run is in progress.
+
+        Returns:
+            Whether a new run was started.
+        """
+        if self.is_running:
+            logger.warning('Profiler is already running')
+            return False
+        self._thread = threading.Thread(
+            target=self._run, args=(duration_sec,), name='profiler', daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def _run(self, duration_sec: float):
+        logger.info(f'Profiling for {duration_sec} seconds')
+        own_id = threading.get_ident()
+        stacks: CounterDict[Stack] = CounterDict()
+        num_samples = 0
+        deadline = time.monotonic() + duration_sec
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                stacks[tuple(reversed(stack))] += 1
+            num_samples += 1
+            time.sleep(self.interval_sec)
+
+        try:
+            self._dump(stacks, num_samples)
+        except OSError as e:
+            logger.error(f'Error writing profile: {e}')
+
+    def _dump(self, stacks: CounterDict[Stack], num_samples: int):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(
+            self.output_dir, f'profile-{time.strftime("%Y%m%d-%H%M%S")}'
+        )
+
+        with open(f'{path}.folded', 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{";".join(stack)} {count}\n')
+
+        # Samples where the function is running, and where it is on the stack.
+        self_samples: CounterDict[str] = CounterDict()
+        total_samples: CounterDict[str] = CounterDict()
+        for stack, count in stacks.items():
+            self_samples[stack[-1]] += count
+            for function in set(stack[1:]):
+                total_samples[function] += count
+
+        with open(f'{path}.txt', 'w') as f:
+            f.write(f'{num_samples} samples every {self.interval_sec * 1000:g} ms\n\n')
+            f.write(f'{"self":>8}{"total":>8}  function\n')
+            for function, count in total_samples.most_common(100):
+                f.write(f'{self_samples[function]:>8}{count:>8}  {function}\n')
+
+            f.write('\nstage timers since start (ms)\n')
+            for (stage,), (counts, total) in sorted(
+                STAGE_DURATION_MS.snapshot().items()
+            ):
+                calls = sum(counts)
+                p99 = STAGE_DURATION_MS.quantile(0.99, stage=stage)
+                f.write(
+                    f'{stage}: {calls} calls, mean {total / calls:.3f}, p99 <= {p99}\n'
+                )
+
+        logger.info(f'Profile written to {path}.folded and {path}.txt')
+
+
+def install_profiler(
+    output_dir: str,
+    duration_sec: float,
+    on_start: bool = False,
+    signum: int = signal.SIGUSR1,
+) -> SamplingProfiler:
+    """
+    Profile the service for `duration_sec` every time it receives `signum`,
+    e.g. with `kill -USR1 <pid>`. Must be called from the main thread.
+
+    Args:
+        output_dir: The directory to write the profiles to.
+        duration_sec: How long to sample for.
+        on_start: Whether to also profile right away.
+        signum: The signal that starts a run.
+
+    Returns:
+        The profiler.
+    """
+    profiler = SamplingProfiler(output_dir)
+    signal.signal(signum, lambda *_: profiler.start(duration_sec))
+    if on_start:
+        profiler.start(duration_sec)
+    return profiler
@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from confluent_kafka import TopicPartition
+from loguru import logger
+from quixstreams import Application, message_context
+from quixstreams.kafka import Consumer
+
+from observability.metrics import (
+    PROCESSING_BUCKETS_MS,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+)
+
+MESSAGES_CONSUMED = REGISTRY.register(
+    Counter(
+        'messages_consumed_total',
+        'Messages consumed, per topic and partition.',
+        label_names=('topic', 'partition'),
+    )
+)
+MESSAGES_PRODUCED = REGISTRY.register(
+    Counter(
+        'messages_produced_total',
+        'Messages produced, per topic.',
+        label_names=('topic',),
+    )
+)
+PROCESSING_MS = REGISTRY.register(
+    Histogram(
+        'message_processing_ms',
+        'Time spent processing a message, in milliseconds.',
+        buckets=PROCESSING_BUCKETS_MS,
+        label_names=('topic',),
+    )
+)
+ACTIVE_KEYS = REGISTRY.register(
+    Gauge(
+        'active_keys',
+        'Distinct message keys in the last window of messages, per topic and '
+        'partition.',
+        label_names=('topic', 'partition'),
+    )
+)
+CONSUMER_LAG = REGISTRY.register(
+    Gauge(
+        'consumer_lag_messages',
+        'Messages behind the end of the partition, per topic and partition.',
+        label_names=('topic', 'partition'),
+    )
+)
+
+
+def state_store_sizes(state_dir: Path) -> dict[tuple[str, str], float]:
+    """
+    Get the size on disk of every state store partition under a directory.
+
+    Returns:
+        The size in bytes, per store path relative to the directory and partition.
+    """
+    sizes = defaultdict(float)
+    for root, _dirs, files in os.walk(state_dir):
+        relative = Path(root).relative_to(state_dir)
+        partition = next(
+            (i for i, part in enumerate(relative.parts) if part.isdigit()), None
+        )
+        if partition is None:
+            continue
+        key = (
+            str(Path(*relative.parts[:partition])),
+            relative.parts[partition],
+        )
+        for file in files:
+            try:
+                sizes[key] += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                # RocksDB removes files while compacting.
+                pass
+    return dict(sizes)
+
+
+class StreamMetrics:
+    def __init__(self, lag_interval_sec: float = 1.0, keys_window_sec: float = 60.0):
+        """
+        Collects the runtime metrics of a quixstreams application.
+
+        Pass `on_message_processed` to the `Application`, and call `watch` with
+        the application and `on_message_received` as its first step, e.g.
+
+            metrics = StreamMetrics()
+            app = Application(..., on_message_processed=metrics.on_message_processed)
+            metrics.watch(app)
+            sdf = app.dataframe(topic=topic)
+            sdf = sdf.update(metrics.on_message_received, metadata=True)
+
+        Args:
+            lag_interval_sec: How often to update the consumer lag.
+            keys_window_sec: The window the distinct message keys are counted
+                over. The keys of a window are forgotten once it is reported, so
+                the memory is bounded by the keys of one window, and the
+                partitions that are no longer assigned drop to zero.
+        """
+        self.lag_interval_sec = lag_interval_sec
+        self.keys_window_sec = keys_window_sec
+        self._started_at: Optional[float] = None
+        self._keys: dict[tuple[str, int], set] = defaultdict(set)
+        self._keys_reported: set[tuple[str, int]] = set()
+        self._keys_window_end = time.monotonic() + keys_window_sec
+        # The last processed offset, per topic and partition.
+        self._offsets: dict[tuple[str, int], int] = {}
+
+    def watch(self, app: Application):
+        """
+        Report the size of the state stores and the consumer lag of the application.
+
+        The lag is computed from the high watermarks fetched by a separate
+        consumer from a background thread, so that the broker is not called
+        while processing messages. The consumer is not subscribed to anything,
+        so it does not join the consumer group of the application.
+        """
+        state_dir = Path(app.config.state_dir) / app.config.consumer_group
+        REGISTRY.register(
+            Gauge(
+                'state_store_bytes',
+                'Size of the state store on disk, per store and partition.',
+                label_names=('store', 'partition'),
+                callback=lambda: state_store_sizes(state_dir),
+            )
+        )
+        threading.Thread(
+            target=self._report_lag,
+            args=(app.get_consumer(auto_commit_enable=False),),
+            name='consumer-lag',
+            daemon=True,
+        ).start()
+
+    def _report_lag(self, consumer: Consumer):
+        while True:
+            time.sleep(self.lag_interval_sec)
+            for (topic, partition), offset in list(self._offsets.items()):
+                try:
+                    _low, high = consumer.get_watermark_offsets(
+                        TopicPartition(topic, partition),
+                        timeout=self.lag_interval_sec,
+                    )
+                except Exception as e:
+                    logger.debug(f'Failed to get the watermarks of {topic}: {e}')
+                    continue
+                if high >= 0:
+                    CONSUMER_LAG.set(
+                        max(high - offset - 1, 0), topic=topic, partition=partition
+                    )
+
+    def on_message_received(
+        self, value: Any, key: Any, timestamp: int, headers: Any
+    ) -> None:
+        self._started_at = time.perf_counter()
+        ctx = message_context()
+        self._keys[(ctx.topic, ctx.partition)].add(key)
+        if time.monotonic() >= self._keys_window_end:
+            self._report_keys()
+
+    def _report_keys(self):
+        for topic, partition in self._keys_reported | self._keys.keys():
+            keys = self._keys.get((topic, partition), ())
+            ACTIVE_KEYS.set(len(keys), topic=topic, partition=partition)
+        self._keys_reported = set(self._keys)
+        self._keys = defaultdict(set)
+        self._keys_window_end = time.monotonic() + self.keys_window_sec
+
+    def on_message_processed(self, topic: str, partition: int, offset: int):
+        MESSAGES_CONSUMED.inc(topic=topic, partition=partition)
+        if self._started_at is not None:
+            PROCESSING_MS.observe(
+                (time.perf_counter() - self._started_at) * 1000, topic=topic
+            )
+            self._started_at = None
+        self._offsets[(topic, partition)] = offset
+
+    @staticmethod
+    def count_produced(topic: str) -> Callable[[Any], None]:
+        """
+        Get a step counting the messages produced to a topic, to add after `to_topic`.
+        """
+
+        def count(value: Any) -> None:
+            MESSAGES_PRODUCED.inc(topic=topic)
+
+        return count
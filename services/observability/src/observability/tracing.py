@@ -0,0 +1,90 @@
+import time
+from typing import Any, Optional
+
+from observability.metrics import REGISTRY, Histogram
+
+# The timing headers, in the order the stages of the pipeline set them.
+EXCHANGE_TS = 'exchange_ts_ms'
+TRADES_PRODUCED = 'trades_produced_ms'
+CANDLE_EMITTED = 'candle_emitted_ms'
+INDICATOR_EMITTED = 'indicator_emitted_ms'
+TRACE_HEADERS = (EXCHANGE_TS, TRADES_PRODUCED, CANDLE_EMITTED, INDICATOR_EMITTED)
+
+HOP_LATENCY_MS = REGISTRY.register(
+    Histogram(
+        'pipeline_hop_latency_ms',
+        'Time between a stage of the pipeline and the previous one, in milliseconds.',
+        label_names=('hop',),
+    )
+)
+EXCHANGE_LAG_MS = REGISTRY.register(
+    Histogram(
+        'pipeline_exchange_lag_ms',
+        'Time between the trade on the exchange and a stage of the pipeline, in milliseconds.',
+        label_names=('stage',),
+    )
+)
+
+Trace = dict[str, int]
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def from_headers(headers: Optional[list[tuple[str, Any]]]) -> Trace:
+    """
+    Read the timing headers of a message, ignoring any other header.
+    """
+    trace = {}
+    for name, value in headers or []:
+        if name in TRACE_HEADERS:
+            trace[name] = int(value.decode() if isinstance(value, bytes) else value)
+    return trace
+
+
+def to_headers(trace: Trace) -> list[tuple[str, bytes]]:
+    return [(name, str(value).encode()) for name, value in trace.items()]
+
+
+def stamp(
+    trace: Optional[Trace], stage: str, timestamp_ms: Optional[int] = None
+) -> Trace:
+    """
+    Add the time a stage emitted a message to its trace, and record the
+    latency of the hop from the previous stage and the lag behind the exchange.
+
+    The lags are computed from wall clocks of different machines, so they are
+    only as accurate as the clocks are in sync.
+
+    Args:
+        trace: The trace of the message, as read from its headers.
+        stage: The header of the emitting stage.
+        timestamp_ms: The time of the stage. Defaults to now.
+
+    Returns:
+        A new trace with the stage added.
+    """
+    trace = {**(trace or {}), stage: now_ms() if timestamp_ms is None else timestamp_ms}
+
+    previous = [
+        name for name in TRACE_HEADERS[: TRACE_HEADERS.index(stage)] if name in trace
+    ]
+    if previous:
+        HOP_LATENCY_MS.observe(
+            trace[stage] - trace[previous[-1]], hop=f'{previous[-1]}->{stage}'
+        )
+    if EXCHANGE_TS in trace and stage != EXCHANGE_TS:
+        EXCHANGE_LAG_MS.observe(trace[stage] - trace[EXCHANGE_TS], stage=stage)
+
+    return trace
+
+
+def exchange_lag_ms(trace: Trace) -> Optional[int]:
+    """
+    The time between the trade on the exchange and the last stage of the trace.
+    """
+    stages = [name for name in TRACE_HEADERS if name in trace]
+    if EXCHANGE_TS not in trace or len(stages) < 2:
+        return None
+    return trace[stages[-1]] - trace[EXCHANGE_TS]
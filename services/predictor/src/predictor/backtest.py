@@ -0,0 +1,165 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from predictor.models import BaselineModel, get_model
+from predictor.tracking import RunLogger
+
+
+def get_folds(
+    num_rows: int, train_window: int, test_window: int, step: int, gap: int = 0
+) -> list[tuple[int, int, int]]:
+    """
+    Get the walk-forward folds over the given number of rows.
+
+    Args:
+        num_rows: The number of rows in the data.
+        train_window: The number of rows each model is trained on.
+        test_window: The number of rows each model is evaluated on.
+        step: The number of rows between the start of consecutive folds.
+        gap: The number of rows dropped between the train and test windows, so
+            that no training target overlaps the test window.
+
+    Returns:
+        A list of (train_start, test_start, test_end) row positions.
+    """
+    fold_size = train_window + gap + test_window
+    return [
+        (start, start + train_window + gap, start + fold_size)
+        for start in range(0, num_rows - fold_size + 1, step)
+    ]
+
+
+def _fit_predict_fold(
+    model_name: str,
+    X: pd.DataFrame,
+    y: pd.DataFrame,
+    train_start: int,
+    train_end: int,
+    test_start: int,
+    test_end: int,
+) -> np.ndarray:
+    """
+    Fit one model per target column on the train window and predict the test window.
+
+    Returns:
+        The predictions, with shape (test_window, num_targets).
+    """
+    X_train = X.iloc[train_start:train_end]
+    X_test = X.iloc[test_start:test_end]
+    predictions = []
+    for target in y.columns:
+        model = get_model(model_name)
+        model.fit(X_train, y[target].iloc[train_start:train_end])
+        predictions.append(np.asarray(model.predict(X_test)))
+    return np.column_stack(predictions)
+
+
+def walk_forward_backtest(
+    data: pd.DataFrame,
+    model_name: str,
+    train_window: int,
+    test_window: int,
+    step: int,
+    run_logger: RunLogger,
+    gap: int = 0,
+    target_columns: Optional[list[str]] = None,
+    n_jobs: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Evaluate how the model would have performed across many retrain cycles.
+
+    Folds are fitted in parallel. Errors for the model and the baseline are
+    then computed in one vectorized pass over all folds and target columns,
+    and logged to MLflow with the fold number as step.
+
+    Args:
+        data: The prepared dataframe.
+        model_name: The name of the model, as understood by `get_model`.
+        train_window: The number of rows each model is trained on.
+        test_window: The number of rows each model is evaluated on.
+        step: The number of rows between the start of consecutive folds.
+        run_logger: The logger of the active MLflow run.
+        gap: The number of rows dropped between the train and test windows.
+        target_columns: The target columns to evaluate. Defaults to `target`.
+        n_jobs: The number of worker threads.
+
+    Returns:
+        A dataframe with the MAE of the model and the baseline per fold and target.
+    """
+    if target_columns is None:
+        target_columns = ['target']
+
+    folds = get_folds(len(data), train_window, test_window, step, gap)
+    if not folds:
+        raise ValueError(
+            f'Not enough rows ({len(data)}) for a single fold of '
+            f'{train_window + gap + test_window} rows'
+        )
+
+    X = data.drop(columns=target_columns)
+    y = data[target_columns]
+    logger.info(f'Backtesting {model_name} over {len(folds)} folds')
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [
+            executor.submit(
+                _fit_predict_fold,
+                model_name,
+                X,
+                y,
+                train_start,
+                test_start - gap,
+                test_start,
+                test_end,
+            )
+            for train_start, test_start, test_end in folds
+        ]
+        # (num_folds, test_window, num_targets)
+        y_pred = np.stack([future.result() for future in futures])
+
+    # Gather the test windows of all folds at once.
+    test_idx = np.array([np.arange(start, end) for _, start, end in folds])
+    y_true = y.to_numpy(dtype=np.float64)[test_idx]
+    y_baseline = np.asarray(BaselineModel().predict(X), dtype=np.float64)[test_idx]
+
+    mae_model = np.abs(y_pred - y_true).mean(axis=1)
+    mae_baseline = np.abs(y_baseline[:, :, np.newaxis] - y_true).mean(axis=1)
+
+    window_start_ms = data['window_start_ms'].to_numpy()
+    results = pd.DataFrame(
+        {
+            'fold': np.repeat(np.arange(len(folds)), len(target_columns)),
+            'target': np.tile(target_columns, len(folds)),
+            'train_start_ms': np.repeat(
+                window_start_ms[[train_start for train_start, _, _ in folds]],
+                len(target_columns),
+            ),
+            'test_start_ms': np.repeat(
+                window_start_ms[[test_start for _, test_start, _ in folds]],
+                len(target_columns),
+            ),
+            'mae_model': mae_model.ravel(),
+            'mae_baseline': mae_baseline.ravel(),
+        }
+    )
+
+    for fold in range(len(folds)):
+        run_logger.log_metrics(
+            {
+                f'backtest_mae_{name}_{target}': errors[fold, i]
+                for name, errors in (('model', mae_model), ('baseline', mae_baseline))
+                for i, target in enumerate(target_columns)
+            },
+            step=fold,
+        )
+    run_logger.log_table(results, 'backtest_summary.json')
+
+    logger.info(
+        f'Backtest MAE: model {mae_model.mean()}, baseline {mae_baseline.mean()}'
+    )
+
+    return results
@@ -0,0 +1,32 @@
+from functools import lru_cache
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file='services/predictor/src/predictor/inference.env'
+    )
+
+    kafka_broker_address: str
+    kafka_input_topic: str
+    kafka_output_topic: str
+    kafka_consumer_group: str
+    symbols: list[str]
+    candle_duration: int
+    pred_horizons_sec: list[int]
+    mlflow_tracking_uri: str
+    model_poll_interval_sec: int = 60
+    model_cache_dir: str = '.model_cache'
+    model_cache_max_size_mb: int = 1024
+    max_batch_size: int = 100
+    max_batch_wait_ms: int = 50
+    stats_interval_sec: int = 10
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Get the settings of the predictor service, loaded on first use.
+    """
+    return Settings()
@@ -1,44 +1,32 @@
-import great_expectations as ge
+import time
+from typing import Optional
+
+import numpy as np
 import pandas as pd
 from loguru import logger
-from risingwave import OutputFormat, RisingWave, RisingWaveConnOptions
+
+from predictor.features import FeaturePipeline
+from predictor.utils import TRACING_COLUMNS, get_target_column
+from predictor.validation import INDICATOR_PREFIX, validate_frame
 
 
-def validate_data(data: pd.DataFrame):
+def validate_data(data: pd.DataFrame, candle_duration: Optional[int] = None):
     """
     Runs a battery of checks on the data.
     If any of the checks fail, the function will raise an exception.
+
+    Args:
+        data: The prepared dataframe.
+        candle_duration: The duration of each candle in seconds, used to detect
+            gaps between candles.
     """
-    # Check that the closing price is positive.
-    ge_data = ge.from_pandas(data)
-    validation_result = ge_data.expect_column_values_to_be_between(
-        column='closing_price',
-        min_value=0,
-        max_value=float('inf'),
-        strict_min=True,
-        strict_max=True,
-    )
-    if not validation_result.success:
-        raise ValueError(validation_result.get_failure_cases())
-
-    # Check that the target is positive.
-    validation_result = ge_data.expect_column_values_to_be_between(
-        column='target',
-        min_value=0,
-        max_value=float('inf'),
-        strict_min=True,
-        strict_max=True,
-    )
-    if not validation_result.success:
-        raise ValueError(validation_result.get_failure_cases())
+    report = validate_frame(data, candle_duration=candle_duration)
 
-    # Check that closing price is not NaN.
-    validation_result = ge_data.expect_column_values_to_be_of_type(
-        column='closing_price',
-        type_='float64',
-    )
-    if not validation_result.success:
-        raise ValueError(validation_result.get_failure_cases())
+    for warning in report.warnings:
+        logger.warning(f'Data validation: {warning}')
+
+    if not report.success:
+        raise ValueError(report.errors)
 
 
 def load_data_from_risingwave(
@@ -50,6 +38,7 @@ def load_data_from_risingwave(
     symbol: str,
     since_days: int,
     candle_duration: int,
+    since_ms: Optional[int] = None,
 ) -> pd.DataFrame:
     """
     Load the data from the risingwave table.
@@ -63,10 +52,14 @@ def load_data_from_risingwave(
         symbol: The symbol to load the data for.
         since_days: The number of days to load the data for.
         candle_duration: The duration of each candle in seconds.
+        since_ms: Only load candles starting after this timestamp instead of
+            the last `since_days` days.
 
     Returns:
         A pandas dataframe containing the data.
     """
+    from risingwave import OutputFormat, RisingWave, RisingWaveConnOptions
+
     logger.info(f'Connecting to risingwave: {host}:{port} {user} {password} {database}')
     rw = RisingWave(
         RisingWaveConnOptions.from_connection_info(
@@ -78,12 +71,17 @@ def load_data_from_risingwave(
         )
     )
 
+    if since_ms is not None:
+        since_filter = f'window_start_ms > {since_ms}'
+    else:
+        since_filter = f"to_timestamp(window_start_ms / 1000) > now() - interval '{since_days} days'"
+
     query = f"""
     SELECT *
     FROM public.technical_indicators
     WHERE symbol = '{symbol}'
         AND candle_duration = {candle_duration}
-        AND to_timestamp(window_start_ms / 1000) > now() - interval '{since_days} days'
+        AND {since_filter}
     ORDER BY window_start_ms ASC;
     """
     data = rw.fetch(query, format=OutputFormat.DATAFRAME)
@@ -94,26 +92,98 @@ def load_data_from_risingwave(
     return data
 
 
+def load_data_from_archive(
+    archive_dir: str,
+    symbol: str,
+    since_days: int,
+    candle_duration: int,
+    since_ms: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Load the data from the local candle archive, with the same columns as the
+    risingwave table.
+
+    Args:
+        archive_dir: The directory of the archive.
+        symbol: The symbol to load the data for.
+        since_days: The number of days to load the data for.
+        candle_duration: The duration of each candle in seconds.
+        since_ms: Only load candles starting after this timestamp instead of
+            the last `since_days` days.
+
+    Returns:
+        A pandas dataframe containing the data.
+    """
+    from archive.store import CandleArchive
+
+    if since_ms is not None:
+        start_ms = since_ms + 1
+    else:
+        start_ms = int((time.time() - since_days * 24 * 60 * 60) * 1000)
+
+    data = CandleArchive(archive_dir).read_frame(
+        symbol, candle_duration, start_ms=start_ms
+    )
+    logger.info(
+        f'Loaded {len(data)} rows from {archive_dir} for {symbol} in the last {since_days} days'
+    )
+
+    return data
+
+
 def prepare_data(
-    data: pd.DataFrame, pred_horizon_sec: int, candle_duration: int
+    data: pd.DataFrame,
+    pred_horizon_sec: int | list[int],
+    candle_duration: int,
+    features: Optional[FeaturePipeline] = None,
 ) -> pd.DataFrame:
     """
     Prepare the data for training by adding the target column and cleaning the data.
 
     Args:
         data: The input dataframe.
-        pred_horizon_sec: The prediction horizon in seconds.
+        pred_horizon_sec: The prediction horizon in seconds. When a list of
+            horizons is given, one `target_<horizon>` column is added per horizon.
         candle_duration: The duration of each candle in seconds.
+        features: The feature pipeline to add engineered features with. The
+            rows without enough history for every feature and indicator are
+            dropped, as the models cannot be fitted on NaNs.
 
     Returns:
         The prepared dataframe.
     """
-    # Add the target column to the dataframe.
-    data['target'] = data['closing_price'].shift(-pred_horizon_sec // candle_duration)
+    if features is not None:
+        data = features.transform(data)
+        # Drop the warm-up rows of the features and indicators.
+        indicator_columns = [
+            column for column in data.columns if column.startswith(INDICATOR_PREFIX)
+        ]
+        data = data.dropna(subset=[*features.names, *indicator_columns])
+
+    if isinstance(pred_horizon_sec, list):
+        # Add all target columns at once, by indexing the closing prices with a
+        # (rows x horizons) matrix of future row positions.
+        target_columns = [get_target_column(h) for h in pred_horizon_sec]
+        closing_prices = data['closing_price'].to_numpy(dtype=np.float64)
+        steps = -(-np.array(pred_horizon_sec) // candle_duration)
+        future_idx = np.arange(len(data))[:, np.newaxis] + steps
+        data[target_columns] = np.where(
+            future_idx < len(data),
+            closing_prices[np.minimum(future_idx, len(data) - 1)],
+            np.nan,
+        )
+    else:
+        # Add the target column to the dataframe.
+        target_columns = ['target']
+        data['target'] = data['closing_price'].shift(
+            -pred_horizon_sec // candle_duration
+        )
 
-    # Drop rows with NaN values in the target column.
-    data = data.dropna(subset=['target'])
+    # Drop rows with NaN values in the target columns.
+    data = data.dropna(subset=target_columns)
     # Drop symbol and candle_duration columns.
     data = data.drop(columns=['symbol', 'candle_duration'])
+    # Drop the latency tracing columns, when the table has them.
+    data = data.drop(columns=TRACING_COLUMNS, errors='ignore')
 
     return data
@@ -0,0 +1,201 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+@dataclass(frozen=True)
+class Feature:
+    """
+    A feature computed from the last `window` values of a column.
+
+    `fn` maps an array of windows with shape (n, window), oldest value first,
+    to one value per window. The same function is used over all windows of a
+    dataframe for training and over the single latest window for serving,
+    which keeps both paths identical.
+    """
+
+    name: str
+    column: str
+    window: int
+    fn: Callable[[np.ndarray], np.ndarray]
+
+
+def returns(column: str, periods: int) -> Feature:
+    """
+    The relative change of the column over the last `periods` candles.
+    """
+    return Feature(
+        name=f'{column}_return_{periods}',
+        column=column,
+        window=periods + 1,
+        fn=lambda x: x[:, -1] / x[:, 0] - 1,
+    )
+
+
+def lag(column: str, periods: int) -> Feature:
+    """
+    The value of the column `periods` candles ago.
+    """
+    return Feature(
+        name=f'{column}_lag_{periods}',
+        column=column,
+        window=periods + 1,
+        fn=lambda x: x[:, 0],
+    )
+
+
+def volatility(column: str, periods: int) -> Feature:
+    """
+    The standard deviation of the one-candle returns over the last `periods` candles.
+    """
+    return Feature(
+        name=f'{column}_volatility_{periods}',
+        column=column,
+        window=periods + 1,
+        fn=lambda x: (x[:, 1:] / x[:, :-1] - 1).std(axis=1),
+    )
+
+
+def delta(column: str, periods: int = 1) -> Feature:
+    """
+    The absolute change of the column over the last `periods` candles.
+    """
+    return Feature(
+        name=f'{column}_delta_{periods}',
+        column=column,
+        window=periods + 1,
+        fn=lambda x: x[:, -1] - x[:, 0],
+    )
+
+
+@dataclass
+class FeatureState:
+    """
+    The bounded rolling history of one (symbol, candle_duration) stream.
+    """
+
+    buffers: dict[str, deque]
+    last_window_start_ms: Optional[int] = field(default=None)
+
+
+class FeaturePipeline:
+    def __init__(self, features: list[Feature]):
+        """
+        A set of features that can be computed over a full dataframe or one row
+        at a time.
+
+        Args:
+            features: The features to compute.
+        """
+        self.features = features
+        self.history_sizes: dict[str, int] = {}
+        for feature in features:
+            self.history_sizes[feature.column] = max(
+                self.history_sizes.get(feature.column, 0), feature.window
+            )
+
+    @property
+    def names(self) -> list[str]:
+        return [feature.name for feature in self.features]
+
+    def transform(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Compute the features over a dataframe of consecutive candles of a
+        single symbol, sorted by time.
+
+        Args:
+            data: The candles.
+
+        Returns:
+            The candles with one column added per feature. Rows without enough
+            history are NaN.
+        """
+        values = {
+            column: data[column].to_numpy(dtype=np.float64)
+            for column in self.history_sizes
+        }
+        columns = {}
+        for feature in self.features:
+            column_values = values[feature.column]
+            output = np.full(len(column_values), np.nan)
+            if len(column_values) >= feature.window:
+                windows = sliding_window_view(column_values, feature.window)
+                output[feature.window - 1 :] = feature.fn(windows)
+            columns[feature.name] = output
+
+        return data.assign(**columns)
+
+    def init_state(self) -> FeatureState:
+        """
+        Create an empty rolling history for a new stream.
+        """
+        return FeatureState(
+            buffers={
+                column: deque(maxlen=size)
+                for column, size in self.history_sizes.items()
+            }
+        )
+
+    def transform_row(self, row: dict, state: FeatureState) -> dict:
+        """
+        Compute the features for the latest candle of a stream.
+
+        An update of the last seen candle window replaces it in the history
+        instead of being appended, matching the one row per window that the
+        batch path sees.
+
+        Args:
+            row: The latest candle.
+            state: The rolling history of the stream, updated in place.
+
+        Returns:
+            The candle with the features added.
+        """
+        is_update = state.last_window_start_ms == row['window_start_ms']
+        for column, buffer in state.buffers.items():
+            value = row[column]
+            value = np.nan if value is None else float(value)
+            if is_update and buffer:
+                buffer[-1] = value
+            else:
+                buffer.append(value)
+        state.last_window_start_ms = row['window_start_ms']
+
+        history = {
+            column: np.array(buffer, dtype=np.float64)
+            for column, buffer in state.buffers.items()
+        }
+        output = dict(row)
+        for feature in self.features:
+            column_values = history[feature.column]
+            if len(column_values) < feature.window:
+                output[feature.name] = np.nan
+            else:
+                window = column_values[
+                    np.newaxis, len(column_values) - feature.window :
+                ]
+                output[feature.name] = float(feature.fn(window)[0])
+
+        return output
+
+
+FEATURE_PIPELINE = FeaturePipeline(
+    [
+        returns('closing_price', 1),
+        returns('closing_price', 5),
+        returns('closing_price', 15),
+        lag('closing_price', 1),
+        lag('closing_price', 2),
+        lag('closing_price', 3),
+        volatility('closing_price', 15),
+        volatility('closing_price', 60),
+        delta('volume'),
+        delta('close_prices_rsi_14'),
+        delta('close_prices_macd_7_hist'),
+        delta('close_prices_obv'),
+    ]
+)
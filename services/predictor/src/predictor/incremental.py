@@ -0,0 +1,189 @@
+import time
+from typing import TYPE_CHECKING, Optional
+
+from loguru import logger
+from sklearn.metrics import mean_absolute_error
+
+from predictor.data import load_data_from_risingwave, prepare_data, validate_data
+from predictor.models import BaselineModel, IncrementalHuberRegressor
+from predictor.tracking import RunLogger
+from predictor.utils import get_experiment_name, get_model_name
+
+if TYPE_CHECKING:
+    from mlflow import MlflowClient
+
+
+def _get_previous_model(
+    client: 'MlflowClient', model_name: str
+) -> Optional[tuple[IncrementalHuberRegressor, dict]]:
+    """
+    Get the latest registered model and the params of the run that trained it.
+
+    Returns:
+        The model and its run params, or None if there is no registered model
+        that can be updated incrementally.
+    """
+    import mlflow
+
+    versions = client.search_model_versions(
+        f"name = '{model_name}'",
+        max_results=1,
+        order_by=['version_number DESC'],
+    )
+    if not versions:
+        logger.info(f'No registered version of {model_name} found')
+        return None
+
+    params = client.get_run(versions[0].run_id).data.params
+    if params.get('training_mode') not in ('incremental', 'full_refit'):
+        logger.info(f'Latest version of {model_name} was not trained incrementally')
+        return None
+
+    pipe = mlflow.sklearn.load_model(f'models:/{model_name}/{versions[0].version}')
+    if not IncrementalHuberRegressor.supports(pipe):
+        logger.info(f'Latest version of {model_name} does not support partial_fit')
+        return None
+
+    return IncrementalHuberRegressor(pipe), params
+
+
+def train_incremental(
+    rw_host: str,
+    rw_port: int,
+    rw_user: str,
+    rw_password: str,
+    rw_database: str,
+    symbol: str,
+    since_days: int,
+    candle_duration: int,
+    pred_horizon_sec: int,
+    mlflow_tracking_uri: str,
+    train_test_split_ratio: float,
+    full_refit_interval_days: int = 7,
+):
+    """
+    Update the registered model for the given symbol with the candles that
+    arrived since the last run.
+
+    Falls back to a full refit on the last `since_days` days when there is no
+    incrementally trained model yet, or the last full refit is older than
+    `full_refit_interval_days`. In both cases the model is scored on the data
+    it has not seen yet before being updated with it, and then pushed to the
+    model registry.
+
+    Args:
+        rw_host: The host of the risingwave cluster.
+        rw_port: The port of the risingwave cluster.
+        rw_user: The user of the risingwave cluster.
+        rw_password: The password of the risingwave cluster.
+        rw_database: The database to use.
+        symbol: The symbol being predicted.
+        since_days: The number of days to load for a full refit.
+        candle_duration: The duration of each candle in seconds.
+        pred_horizon_sec: The prediction horizon in seconds.
+        mlflow_tracking_uri: The URI of the MLflow tracking server.
+        train_test_split_ratio: The ratio of training data to test data for a
+            full refit.
+        full_refit_interval_days: How often to refit the model from scratch.
+    """
+    import mlflow
+    from mlflow import MlflowClient
+
+    mlflow.set_tracking_uri(mlflow_tracking_uri)
+    mlflow.set_experiment(
+        get_experiment_name(symbol, candle_duration, pred_horizon_sec)
+    )
+    model_name = get_model_name(symbol, candle_duration, pred_horizon_sec)
+
+    previous = _get_previous_model(MlflowClient(), model_name)
+    now_ms = int(time.time() * 1000)
+    full_refit = (
+        previous is None
+        or now_ms - int(previous[1]['last_full_refit_ms'])
+        > full_refit_interval_days * 24 * 60 * 60 * 1000
+    )
+
+    with mlflow.start_run() as run, RunLogger(run.info.run_id) as run_logger:
+        logger.info(f'Starting MLFlow run {run.info.run_id}')
+        data = load_data_from_risingwave(
+            host=rw_host,
+            port=rw_port,
+            user=rw_user,
+            password=rw_password,
+            database=rw_database,
+            symbol=symbol,
+            since_days=since_days,
+            candle_duration=candle_duration,
+            since_ms=None if full_refit else int(previous[1]['last_window_start_ms']),
+        )
+        data = prepare_data(data, pred_horizon_sec, candle_duration)
+        validate_data(data, candle_duration)
+
+        # SGD cannot handle the indicators' warm-up rows.
+        data = data.dropna()
+        if data.empty:
+            logger.info('No new candles to train on')
+            return
+
+        X = data.drop(columns=['target'])
+        y = data['target']
+
+        if full_refit:
+            logger.info(f'Refitting {model_name} from scratch on {len(data)} rows')
+            model = IncrementalHuberRegressor()
+            last_full_refit_ms = now_ms
+
+            train_size = int(len(data) * train_test_split_ratio)
+            model.fit(X.iloc[:train_size], y.iloc[:train_size])
+            X_new, y_new = X.iloc[train_size:], y.iloc[train_size:]
+        else:
+            logger.info(f'Updating {model_name} with {len(data)} new rows')
+            model = previous[0]
+            last_full_refit_ms = int(previous[1]['last_full_refit_ms'])
+            X_new, y_new = X, y
+
+        # Score on the data the model has not seen yet, then learn from it, so
+        # the most recent candles are never only used for testing.
+        if not X_new.empty:
+            mae = mean_absolute_error(y_new, model.predict(X_new))
+            baseline_mae = mean_absolute_error(y_new, BaselineModel().predict(X_new))
+            run_logger.log_metrics(
+                {'mae_incremental': mae, 'mae_baseline': baseline_mae}
+            )
+            logger.info(f'MAE on new data: {mae}, baseline MAE: {baseline_mae}')
+
+            model.partial_fit(X_new, y_new)
+
+        run_logger.log_params(
+            {
+                'training_mode': 'full_refit' if full_refit else 'incremental',
+                'prediction_horizon_seconds': pred_horizon_sec,
+                'last_window_start_ms': int(data['window_start_ms'].iloc[-1]),
+                'last_full_refit_ms': last_full_refit_ms,
+                'num_rows': len(data),
+            }
+        )
+
+        mlflow.sklearn.log_model(
+            sk_model=model.pipe,
+            artifact_path='model',
+            registered_model_name=model_name,
+        )
+        logger.info(f'Registered model {model_name}')
+
+
+if __name__ == '__main__':
+    train_incremental(
+        rw_host='localhost',
+        rw_port=4567,
+        rw_user='root',
+        rw_password='',
+        rw_database='dev',
+        symbol='ETH/EUR',
+        since_days=10,
+        candle_duration=60,
+        pred_horizon_sec=300,
+        mlflow_tracking_uri='http://localhost:8283',
+        train_test_split_ratio=0.8,
+        full_refit_interval_days=7,
+    )
@@ -0,0 +1,288 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from quixstreams import Application
+
+from predictor.features import FEATURE_PIPELINE, FeatureState
+from predictor.model_cache import ModelCache
+from predictor.model_registry import ModelRegistry
+from predictor.utils import TRACING_COLUMNS
+
+# Columns identifying a feature row, which the models are not trained on.
+ID_COLUMNS = ['symbol', 'candle_duration']
+
+
+class InferenceStats:
+    def __init__(self):
+        """
+        Accumulates per-message latencies and throughput between reports.
+        """
+        self._reset()
+
+    def _reset(self):
+        self.started_at = time.monotonic()
+        self.num_messages = 0
+        self.num_predictions = 0
+        self.predict_sec = 0.0
+        self.latencies_ms: list[np.ndarray] = []
+
+    def record(
+        self, latencies_ms: np.ndarray, num_predictions: int, predict_sec: float
+    ):
+        """
+        Record a processed batch.
+
+        Args:
+            latencies_ms: The time from receiving to publishing each message.
+            num_predictions: The number of predictions published.
+            predict_sec: The time spent in `predict` calls.
+        """
+        self.latencies_ms.append(latencies_ms)
+        self.num_messages += len(latencies_ms)
+        self.num_predictions += num_predictions
+        self.predict_sec += predict_sec
+
+    def report(self):
+        """
+        Log the throughput and latency percentiles since the last report.
+        """
+        elapsed = time.monotonic() - self.started_at
+        if self.num_messages:
+            latencies_ms = np.concatenate(self.latencies_ms)
+            p50, p99 = np.percentile(latencies_ms, [50, 99])
+            logger.info(
+                f'Inference: {self.num_messages / elapsed:.1f} msg/s, '
+                f'{self.num_predictions / elapsed:.1f} predictions/s, '
+                f'latency p50={p50:.2f}ms p99={p99:.2f}ms max={latencies_ms.max():.2f}ms, '
+                f'predict {1000 * self.predict_sec / self.num_messages:.3f}ms/msg'
+            )
+        self._reset()
+
+
+def predict_batch(
+    rows: list[dict], registry: ModelRegistry, pred_horizons_sec: list[int]
+) -> tuple[list[dict], float]:
+    """
+    Predict the future closing price for a batch of feature rows.
+
+    Rows are grouped by symbol and candle duration, so each model is called
+    once per batch no matter how many rows it has to predict.
+
+    Args:
+        rows: The technical indicator rows.
+        registry: The registry holding the loaded models.
+        pred_horizons_sec: The prediction horizons to predict for.
+
+    Returns:
+        The predictions and the time spent in `predict` calls.
+    """
+    data = pd.DataFrame(rows)
+    predictions = []
+    predict_sec = 0.0
+    for (symbol, candle_duration), group in data.groupby(ID_COLUMNS, sort=False):
+        for pred_horizon_sec in pred_horizons_sec:
+            loaded = registry.get((symbol, int(candle_duration), pred_horizon_sec))
+            if loaded is None:
+                continue
+
+            if loaded.features is not None:
+                X = group[loaded.features]
+            else:
+                X = group.drop(columns=ID_COLUMNS + TRACING_COLUMNS, errors='ignore')
+
+            # Rows still in the indicator or feature warm-up cannot be predicted.
+            is_complete = X.notna().all(axis=1).to_numpy()
+            if not is_complete.any():
+                continue
+            X = X[is_complete]
+            rows_to_predict = group[is_complete]
+
+            start = time.perf_counter()
+            y_pred = loaded.model.predict(X)
+            predict_sec += time.perf_counter() - start
+
+            predicted_at_ms = int(time.time() * 1000)
+            for window_start_ms, window_end_ms, closing_price, predicted_price in zip(
+                rows_to_predict['window_start_ms'],
+                rows_to_predict['window_end_ms'],
+                rows_to_predict['closing_price'],
+                y_pred,
+                strict=True,
+            ):
+                predictions.append(
+                    {
+                        'symbol': symbol,
+                        'candle_duration': int(candle_duration),
+                        'pred_horizon_sec': pred_horizon_sec,
+                        'window_start_ms': int(window_start_ms),
+                        'window_end_ms': int(window_end_ms),
+                        'closing_price': float(closing_price),
+                        'predicted_price': float(predicted_price),
+                        'model_name': loaded.name,
+                        'model_version': loaded.version,
+                        'predicted_at_ms': predicted_at_ms,
+                    }
+                )
+
+    return predictions, predict_sec
+
+
+def _poll_batch(consumer, max_batch_size: int, max_batch_wait_sec: float) -> list:
+    """
+    Poll messages until the batch is full or the wait time is over.
+
+    Returns:
+        A list of (message, received_at) tuples.
+    """
+    batch = []
+    deadline = time.monotonic() + max_batch_wait_sec
+    while len(batch) < max_batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+
+        message = consumer.poll(remaining)
+        if message is None:
+            continue
+        if message.error():
+            logger.error(f'Error consuming message: {message.error()}')
+            continue
+
+        batch.append((message, time.perf_counter()))
+
+    return batch
+
+
+def run(
+    kafka_broker_address: str,
+    kafka_input_topic: str,
+    kafka_output_topic: str,
+    kafka_consumer_group: str,
+    symbols: list[str],
+    candle_duration: int,
+    pred_horizons_sec: list[int],
+    mlflow_tracking_uri: str,
+    model_poll_interval_sec: int,
+    model_cache_dir: str,
+    model_cache_max_size_mb: int,
+    max_batch_size: int,
+    max_batch_wait_ms: int,
+    stats_interval_sec: int,
+):
+    """
+    Transforms a stream of technical indicators into a stream of price predictions.
+
+    - Ingests technical indicators from the 'kafka_input_topic' topic.
+    - Micro-batches them and predicts with the latest registered models.
+    - Produces predictions to the 'kafka_output_topic' topic.
+
+    Args:
+        kafka_broker_address (str): The address of the Kafka broker.
+        kafka_input_topic (str): The topic to ingest technical indicators from.
+        kafka_output_topic (str): The topic to produce predictions to.
+        kafka_consumer_group (str): The consumer group to use for the application.
+        symbols (list[str]): The symbols to predict for.
+        candle_duration (int): The duration of the candles in seconds.
+        pred_horizons_sec (list[int]): The prediction horizons in seconds.
+        mlflow_tracking_uri (str): The URI of the MLflow tracking server.
+        model_poll_interval_sec (int): How often to check for new model versions.
+        model_cache_dir (str): The directory of the local model cache.
+        model_cache_max_size_mb (int): The size cap of the local model cache.
+        max_batch_size (int): The maximum number of messages per batch.
+        max_batch_wait_ms (int): The maximum time to wait for a batch to fill.
+        stats_interval_sec (int): How often to report latency and throughput.
+    """
+    registry = ModelRegistry(
+        mlflow_tracking_uri=mlflow_tracking_uri,
+        keys=[
+            (symbol, candle_duration, pred_horizon_sec)
+            for symbol in symbols
+            for pred_horizon_sec in pred_horizons_sec
+        ],
+        poll_interval_sec=model_poll_interval_sec,
+        cache=ModelCache(
+            cache_dir=model_cache_dir,
+            max_size_bytes=model_cache_max_size_mb * 1024 * 1024,
+        ),
+    )
+    registry.start()
+
+    app = Application(
+        broker_address=kafka_broker_address,
+        consumer_group=kafka_consumer_group,
+        auto_offset_reset='latest',
+    )
+
+    input_topic = app.topic(kafka_input_topic, value_deserializer='json')
+    output_topic = app.topic(kafka_output_topic, value_serializer='json')
+
+    stats = InferenceStats()
+    feature_states: dict[tuple[str, int], FeatureState] = {}
+    with app.get_consumer() as consumer, app.get_producer() as producer:
+        consumer.subscribe([input_topic.name])
+
+        while True:
+            batch = _poll_batch(consumer, max_batch_size, max_batch_wait_ms / 1000)
+
+            if batch:
+                rows = []
+                for message, _ in batch:
+                    row = json.loads(message.value())
+                    key = (row['symbol'], row['candle_duration'])
+                    if key not in feature_states:
+                        feature_states[key] = FEATURE_PIPELINE.init_state()
+                    rows.append(
+                        FEATURE_PIPELINE.transform_row(row, feature_states[key])
+                    )
+                predictions, predict_sec = predict_batch(
+                    rows, registry, pred_horizons_sec
+                )
+
+                for prediction in predictions:
+                    message = output_topic.serialize(
+                        key=prediction['symbol'], value=prediction
+                    )
+                    producer.produce(
+                        topic=output_topic.name, value=message.value, key=message.key
+                    )
+
+                published_at = time.perf_counter()
+                stats.record(
+                    latencies_ms=np.array(
+                        [
+                            1000 * (published_at - received_at)
+                            for _, received_at in batch
+                        ]
+                    ),
+                    num_predictions=len(predictions),
+                    predict_sec=predict_sec,
+                )
+
+            if time.monotonic() - stats.started_at >= stats_interval_sec:
+                stats.report()
+
+
+if __name__ == '__main__':
+    from predictor.config import get_settings
+
+    settings = get_settings()
+
+    run(
+        kafka_broker_address=settings.kafka_broker_address,
+        kafka_input_topic=settings.kafka_input_topic,
+        kafka_output_topic=settings.kafka_output_topic,
+        kafka_consumer_group=settings.kafka_consumer_group,
+        symbols=settings.symbols,
+        candle_duration=settings.candle_duration,
+        pred_horizons_sec=settings.pred_horizons_sec,
+        mlflow_tracking_uri=settings.mlflow_tracking_uri,
+        model_poll_interval_sec=settings.model_poll_interval_sec,
+        model_cache_dir=settings.model_cache_dir,
+        model_cache_max_size_mb=settings.model_cache_max_size_mb,
+        max_batch_size=settings.max_batch_size,
+        max_batch_wait_ms=settings.max_batch_wait_ms,
+        stats_interval_sec=settings.stats_interval_sec,
+    )
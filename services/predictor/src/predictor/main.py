@@ -1,12 +1,20 @@
+import math
 import os
 
-import mlflow
 from loguru import logger
 
-from predictor.data import load_data_from_risingwave, prepare_data, validate_data
-from predictor.profiling import profile_data
-from predictor.train import train_model
-from predictor.utils import get_experiment_name
+from predictor.backtest import walk_forward_backtest
+from predictor.data import (
+    load_data_from_archive,
+    load_data_from_risingwave,
+    prepare_data,
+    validate_data,
+)
+from predictor.features import FEATURE_PIPELINE
+from predictor.profiling import profile_data, summarize_columns
+from predictor.tracking import RunLogger
+from predictor.train import train_model, train_multi_horizon_model
+from predictor.utils import get_experiment_name, get_target_column
 
 
 def train(
@@ -18,61 +26,141 @@ def train(
     symbol: str,
     since_days: int,
     candle_duration: int,
-    pred_horizon_sec: int,
+    pred_horizon_sec: int | list[int],
     generate_report: bool,
     mlflow_tracking_uri: str,
     train_test_split_ratio: float,
+    screening_models: list[str] | None = None,
+    screening_time_budget_sec: float = 60.0,
+    profiling_sample_size: int | None = None,
+    profiling_cache_dir: str | None = None,
+    backtest_train_window: int | None = None,
+    backtest_test_window: int = 60,
+    backtest_step: int = 60,
+    add_features: bool = False,
+    archive_dir: str | None = None,
 ):
     """
     Train the model for the given symbol.
     Pushes to the model registry.
+
+    When `pred_horizon_sec` is a list, all horizons share the data load,
+    validation and scaling, and one model head is trained per horizon.
+
+    When `archive_dir` is given, the data is read from the local candle archive
+    written by the archive service instead of the risingwave table.
     """
+    import mlflow
+
     logger.info(f'Setting MLFlow tracking URI to {mlflow_tracking_uri}')
     mlflow.set_tracking_uri(mlflow_tracking_uri)
 
     logger.info(f'Setting MLFlow experiment to {symbol}')
-    mlflow.set_experiment(
-        get_experiment_name(symbol, candle_duration, pred_horizon_sec)
-    )
+    experiment_name = get_experiment_name(symbol, candle_duration, pred_horizon_sec)
+    mlflow.set_experiment(experiment_name)
 
-    with mlflow.start_run() as run:
+    with mlflow.start_run() as run, RunLogger(run.info.run_id) as run_logger:
         logger.info(f'Starting MLFlow run {run.info.run_id}')
-        # Load the data from the risingwave table.
-        data = load_data_from_risingwave(
-            host=rw_host,
-            port=rw_port,
-            user=rw_user,
-            password=rw_password,
-            database=rw_database,
-            symbol=symbol,
-            since_days=since_days,
-            candle_duration=candle_duration,
-        )
+        if archive_dir is not None:
+            # Load the data from the local candle archive.
+            data = load_data_from_archive(
+                archive_dir=archive_dir,
+                symbol=symbol,
+                since_days=since_days,
+                candle_duration=candle_duration,
+            )
+        else:
+            # Load the data from the risingwave table.
+            data = load_data_from_risingwave(
+                host=rw_host,
+                port=rw_port,
+                user=rw_user,
+                password=rw_password,
+                database=rw_database,
+                symbol=symbol,
+                since_days=since_days,
+                candle_duration=candle_duration,
+            )
 
         # Prepare the data for training.
-        data = prepare_data(data, pred_horizon_sec, candle_duration)
+        data = prepare_data(
+            data,
+            pred_horizon_sec,
+            candle_duration,
+            features=FEATURE_PIPELINE if add_features else None,
+        )
 
         # Validate the data.
-        validate_data(data)
+        validate_data(data, candle_duration)
 
         # Perform EDA on the data (Data Profiling).
         if generate_report:
-            profile_data(data, 'data_profiling.html')
+            # A sampled profile only computes the cheap statistics.
+            profile_data(
+                data,
+                'data_profiling.html',
+                sample_size=profiling_sample_size,
+                minimal=profiling_sample_size is not None,
+            )
             if os.path.exists('data_profiling.html'):
-                mlflow.log_artifact(
+                run_logger.log_artifact(
                     local_path='data_profiling.html', artifact_path='eda_report'
                 )
 
+            # Per-column statistics over the full data, cached per chunk.
+            if profiling_cache_dir is not None:
+                column_summary = summarize_columns(
+                    data,
+                    os.path.join(
+                        profiling_cache_dir, experiment_name.replace('/', '_')
+                    ),
+                )
+                run_logger.log_table(column_summary, 'eda_report/column_summary.json')
+
+        if isinstance(pred_horizon_sec, list):
+            horizons = pred_horizon_sec
+            target_columns = [get_target_column(h) for h in horizons]
+        else:
+            horizons = [pred_horizon_sec]
+            target_columns = ['target']
+
+        # Evaluate the model across walk-forward retrain cycles.
+        if backtest_train_window is not None:
+            walk_forward_backtest(
+                data,
+                model_name='HuberRegressor',
+                train_window=backtest_train_window,
+                test_window=backtest_test_window,
+                step=backtest_step,
+                run_logger=run_logger,
+                # The targets are that many candles ahead, rounded up.
+                gap=math.ceil(max(horizons) / candle_duration),
+                target_columns=target_columns,
+            )
+
         # Train the model.
-        train_model(
-            data=data,
-            symbol=symbol,
-            candle_duration=candle_duration,
-            pred_horizon_sec=pred_horizon_sec,
-            train_test_split_ratio=train_test_split_ratio,
-            generate_report=generate_report,
-            mlflow_tracking_uri=mlflow_tracking_uri,
-        )
+        if isinstance(pred_horizon_sec, list):
+            train_multi_horizon_model(
+                data=data,
+                symbol=symbol,
+                candle_duration=candle_duration,
+                pred_horizons_sec=pred_horizon_sec,
+                train_test_split_ratio=train_test_split_ratio,
+                run_logger=run_logger,
+            )
+        else:
+            train_model(
+                data=data,
+                symbol=symbol,
+                candle_duration=candle_duration,
+                pred_horizon_sec=pred_horizon_sec,
+                train_test_split_ratio=train_test_split_ratio,
+                generate_report=generate_report,
+                mlflow_tracking_uri=mlflow_tracking_uri,
+                run_logger=run_logger,
+                screening_models=screening_models,
+                screening_time_budget_sec=screening_time_budget_sec,
+            )
 
 
 if __name__ == '__main__':
@@ -89,4 +177,7 @@ if __name__ == '__main__':
         generate_report=False,
         mlflow_tracking_uri='http://localhost:8283',
         train_test_split_ratio=0.8,
+        screening_time_budget_sec=60.0,
+        profiling_sample_size=50_000,
+        profiling_cache_dir='.profiling_cache',
     )
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Optional
+
+import joblib
+from loguru import logger
+
+MODEL_FILE = 'model.joblib'
+META_FILE = 'meta.json'
+
+
+class ModelCache:
+    def __init__(self, cache_dir: str, max_size_bytes: int):
+        """
+        On-disk cache of deserialized models, keyed by registered model version.
+
+        Entries are evicted least recently used first once the cache grows past
+        `max_size_bytes`. Models are stored uncompressed so that their numpy
+        arrays can be memory mapped on load instead of read into memory.
+
+        Args:
+            cache_dir: The directory holding the cached models.
+            max_size_bytes: The maximum total size of the cached models.
+        """
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(name: str, version: int, run_id: str) -> str:
+        """
+        Get the cache key of a registered model version.
+        """
+        return hashlib.sha256(f'{run_id}/{name}/{version}'.encode()).hexdigest()
+
+    def get(self, name: str, version: int, run_id: str) -> Optional[Any]:
+        """
+        Load a model from the cache, if present.
+        """
+        entry_dir = os.path.join(self.cache_dir, self.key(name, version, run_id))
+        if not os.path.exists(os.path.join(entry_dir, META_FILE)):
+            return None
+
+        # Mark the entry as recently used.
+        os.utime(entry_dir)
+        return joblib.load(os.path.join(entry_dir, MODEL_FILE), mmap_mode='r')
+
+    def put(self, name: str, version: int, run_id: str, model: Any):
+        """
+        Add a model to the cache and evict old entries if it is full.
+        """
+        entry_dir = os.path.join(self.cache_dir, self.key(name, version, run_id))
+        if os.path.exists(entry_dir):
+            return
+
+        # Write to a temporary directory first, so that readers never see a
+        # partially written entry.
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+        joblib.dump(model, os.path.join(tmp_dir, MODEL_FILE))
+        with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+            json.dump(
+                {
+                    'name': name,
+                    'version': version,
+                    'run_id': run_id,
+                    'cached_at': time.time(),
+                },
+                f,
+            )
+        os.replace(tmp_dir, entry_dir)
+
+        self.evict()
+
+    def latest(self, name: str) -> Optional[tuple[int, str]]:
+        """
+        Get the latest cached (version, run_id) of the given model, if any.
+        """
+        versions = [
+            (meta['version'], meta['run_id'])
+            for meta in self._entries().values()
+            if meta['name'] == name
+        ]
+        return max(versions, default=None)
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits its size cap.
+        """
+        entries = []
+        for key in self._entries():
+            entry_dir = os.path.join(self.cache_dir, key)
+            size = sum(
+                os.path.getsize(os.path.join(entry_dir, file))
+                for file in os.listdir(entry_dir)
+            )
+            entries.append((os.path.getmtime(entry_dir), size, entry_dir))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            logger.info(f'Evicting {entry_dir} from the model cache')
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
+
+    def _entries(self) -> dict[str, dict]:
+        entries = {}
+        for key in os.listdir(self.cache_dir):
+            meta_file = os.path.join(self.cache_dir, key, META_FILE)
+            if key.startswith('.') or not os.path.exists(meta_file):
+                continue
+            with open(meta_file) as f:
+                entries[key] = json.load(f)
+        return entries
@@ -0,0 +1,175 @@
+import threading
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from loguru import logger
+
+from predictor.model_cache import ModelCache
+from predictor.utils import get_model_name
+
+# (symbol, candle_duration, pred_horizon_sec)
+ModelKey = tuple[str, int, int]
+
+
+@dataclass
+class LoadedModel:
+    """
+    A registered model version loaded into memory.
+    """
+
+    name: str
+    version: int
+    model: Any
+    features: Optional[list[str]]
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        mlflow_tracking_uri: str,
+        keys: list[ModelKey],
+        poll_interval_sec: float = 60.0,
+        cache: Optional[ModelCache] = None,
+    ):
+        """
+        Keeps the latest registered model for each key in memory.
+
+        Models are loaded once and swapped for a new version as soon as it is
+        registered, without blocking predictions with the current version.
+
+        Args:
+            mlflow_tracking_uri: The URI of the MLflow tracking server.
+            keys: The (symbol, candle_duration, pred_horizon_sec) to serve.
+            poll_interval_sec: How often to check for new model versions.
+            cache: The local cache to load models from before downloading them
+                from the tracking server.
+        """
+        import mlflow
+        from mlflow import MlflowClient
+
+        mlflow.set_tracking_uri(mlflow_tracking_uri)
+        self.keys = keys
+        self.poll_interval_sec = poll_interval_sec
+        self.cache = cache
+
+        self._client = MlflowClient(tracking_uri=mlflow_tracking_uri)
+        self._models: dict[ModelKey, LoadedModel] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self, key: ModelKey) -> Optional[LoadedModel]:
+        """
+        Get the current model for the given key, if one has been loaded.
+        """
+        return self._models.get(key)
+
+    def refresh(self):
+        """
+        Load the latest registered version of every model that has changed.
+        """
+        for key in self.keys:
+            name = get_model_name(*key)
+            try:
+                latest = self._latest_version(name)
+            except Exception as e:
+                logger.error(f'Error getting the latest version of {name}: {e}')
+                continue
+
+            if latest is None:
+                continue
+            version, run_id = latest
+
+            current = self._models.get(key)
+            if current is not None and current.version >= version:
+                continue
+
+            try:
+                model = self._load(name, version, run_id)
+            except Exception as e:
+                logger.error(f'Error loading model {name} version {version}: {e}')
+                continue
+
+            self._swap(key, name, version, model)
+
+    def preload(self):
+        """
+        Load the latest cached version of every model, without contacting the
+        tracking server.
+        """
+        if self.cache is None:
+            return
+
+        for key in self.keys:
+            name = get_model_name(*key)
+            latest = self.cache.latest(name)
+            if latest is None:
+                continue
+
+            version, run_id = latest
+            try:
+                model = self.cache.get(name, version, run_id)
+            except Exception as e:
+                logger.error(
+                    f'Error loading cached model {name} version {version}: {e}'
+                )
+                continue
+
+            if model is not None:
+                self._swap(key, name, version, model)
+
+    def start(self):
+        """
+        Load the models and keep polling for new versions in the background.
+        """
+        self.preload()
+        self.refresh()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop polling for new versions.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval_sec):
+            self.refresh()
+
+    def _swap(self, key: ModelKey, name: str, version: int, model: Any):
+        # Swapping the dict entry is atomic, so readers see either version.
+        self._models[key] = LoadedModel(
+            name=name,
+            version=version,
+            model=model,
+            features=list(getattr(model, 'feature_names_in_', [])) or None,
+        )
+        logger.info(f'Loaded model {name} version {version}')
+
+    def _latest_version(self, name: str) -> Optional[tuple[int, str]]:
+        versions = self._client.search_model_versions(
+            f"name = '{name}'",
+            max_results=1,
+            order_by=['version_number DESC'],
+        )
+        if not versions:
+            return None
+        return int(versions[0].version), versions[0].run_id
+
+    def _load(self, name: str, version: int, run_id: str) -> Any:
+        import mlflow
+
+        if self.cache is not None:
+            model = self.cache.get(name, version, run_id)
+            if model is not None:
+                logger.info(f'Model {name} version {version} found in cache')
+                return model
+
+        model = mlflow.sklearn.load_model(f'models:/{name}/{version}')
+
+        if self.cache is not None:
+            self.cache.put(name, version, run_id, model)
+
+        return model
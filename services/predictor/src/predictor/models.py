@@ -1,10 +1,17 @@
 from typing import Optional, Type, Union
 
 import numpy as np
-import optuna
 import pandas as pd
 from loguru import logger
-from sklearn.linear_model import HuberRegressor
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.linear_model import (
+    ElasticNet,
+    HuberRegressor,
+    Lasso,
+    LinearRegression,
+    Ridge,
+    SGDRegressor,
+)
 from sklearn.metrics import mean_absolute_error
 from sklearn.model_selection import TimeSeriesSplit
 from sklearn.pipeline import Pipeline
@@ -88,6 +95,8 @@ class HuberRegressorWithHyperParameterTuning:
             The best model.
         """
 
+        import optuna
+
         # define the objective function to be minimized for the HuberRegressor
         def objective(trial: optuna.Trial):
             """
@@ -144,7 +153,174 @@ class HuberRegressorWithHyperParameterTuning:
         return study.best_trial.params
 
 
-Model = Union[Type[HuberRegressorWithHyperParameterTuning]]
+class ScaledRegressor:
+    def __init__(self, estimator_cls: type, params: Optional[dict] = None):
+        """
+        Initialize the model.
+
+        Args:
+            estimator_cls: The sklearn regressor class to wrap.
+            params: The parameters for the regressor.
+        """
+        self.estimator_cls = estimator_cls
+        self.params = params or {}
+        self.pipe = Pipeline(
+            [
+                ('scaler', StandardScaler()),
+                ('model', estimator_cls(**self.params)),
+            ]
+        )
+
+    def fit(self, X_train: pd.DataFrame, y_train: pd.Series):
+        """
+        Fit the model.
+
+        Args:
+            X_train: The training data.
+            y_train: The training target.
+        """
+        self.pipe.fit(X_train, y_train)
+
+    def predict(self, X_test: pd.DataFrame) -> pd.Series:
+        """
+        Predict the target.
+
+        Args:
+            X_test: The test data.
+
+        Returns:
+            The predicted target.
+        """
+        return self.pipe.predict(X_test)
+
+
+class SGDHuberRegressor(RegressorMixin, BaseEstimator):
+    def __init__(self, alpha: float = 1e-4, epsilon: float = 1.35, eta0: float = 0.01):
+        """
+        Robust linear regression trained with SGD, which supports `partial_fit`.
+
+        The target is standardized with a scaler fitted on the first batch, so
+        the Huber loss works on the same scale no matter the price level. Later
+        batches do not update it, as that would change the meaning of the
+        coefficients learned so far.
+
+        Args:
+            alpha: The regularization strength.
+            epsilon: The Huber loss threshold, in standard deviations of the target.
+            eta0: The initial learning rate.
+        """
+        self.alpha = alpha
+        self.epsilon = epsilon
+        self.eta0 = eta0
+
+    def _create_model(self) -> SGDRegressor:
+        return SGDRegressor(
+            loss='huber', alpha=self.alpha, epsilon=self.epsilon, eta0=self.eta0
+        )
+
+    def fit(self, X, y):
+        self.y_scaler_ = StandardScaler()
+        y = self.y_scaler_.fit_transform(np.asarray(y, dtype=float).reshape(-1, 1))
+        self.model_ = self._create_model().fit(X, y.ravel())
+        return self
+
+    def partial_fit(self, X, y):
+        y = np.asarray(y, dtype=float).reshape(-1, 1)
+        if not hasattr(self, 'model_'):
+            self.y_scaler_ = StandardScaler().fit(y)
+            self.model_ = self._create_model()
+        self.model_.partial_fit(X, self.y_scaler_.transform(y).ravel())
+        return self
+
+    def predict(self, X):
+        y_pred = self.model_.predict(X).reshape(-1, 1)
+        return self.y_scaler_.inverse_transform(y_pred).ravel()
+
+
+class IncrementalHuberRegressor:
+    def __init__(self, pipe: Optional[Pipeline] = None):
+        """
+        Initialize the model.
+
+        Args:
+            pipe: A previously trained pipeline to keep updating. A new one is
+                created when not given.
+        """
+        if pipe is None:
+            pipe = Pipeline(
+                [
+                    ('scaler', StandardScaler()),
+                    ('model', SGDHuberRegressor()),
+                ]
+            )
+        self.pipe = pipe
+
+    @staticmethod
+    def supports(pipe: Pipeline) -> bool:
+        """
+        Check whether the given pipeline can be updated incrementally.
+        """
+        return isinstance(pipe, Pipeline) and isinstance(
+            pipe.named_steps.get('model'), SGDHuberRegressor
+        )
+
+    def fit(self, X_train: pd.DataFrame, y_train: pd.Series):
+        """
+        Fit the model from scratch.
+
+        Args:
+            X_train: The training data.
+            y_train: The training target.
+        """
+        self.pipe.fit(X_train, y_train)
+
+    def partial_fit(self, X_train: pd.DataFrame, y_train: pd.Series):
+        """
+        Update the model with new data only.
+
+        The scalers are kept as they were fitted on the first data, so that the
+        new data is scaled like the data the coefficients were learned on. They
+        are only refitted by `fit`.
+
+        Args:
+            X_train: The new training data.
+            y_train: The new training target.
+        """
+        scaler = self.pipe.named_steps['scaler']
+        if not hasattr(scaler, 'mean_'):
+            scaler.fit(X_train)
+        self.pipe.named_steps['model'].partial_fit(scaler.transform(X_train), y_train)
+
+    def predict(self, X_test: pd.DataFrame) -> pd.Series:
+        """
+        Predict the target.
+
+        Args:
+            X_test: The test data.
+
+        Returns:
+            The predicted target.
+        """
+        return self.pipe.predict(X_test)
+
+
+# Regressors that `get_model` can build, keyed by their sklearn class name.
+# These are also the candidates considered by the model screening stage.
+SCALED_REGRESSORS = {
+    'LinearRegression': (LinearRegression, {}),
+    'Ridge': (Ridge, {}),
+    'Lasso': (Lasso, {'max_iter': 5000}),
+    'ElasticNet': (ElasticNet, {'max_iter': 5000}),
+}
+
+AVAILABLE_MODELS = ['HuberRegressor', *SCALED_REGRESSORS]
+
+
+Model = Union[
+    Type[HuberRegressorWithHyperParameterTuning],
+    Type[ScaledRegressor],
+    Type[IncrementalHuberRegressor],
+]
 
 
 def get_model(model_name: str) -> Model:
@@ -165,6 +341,13 @@ def get_model(model_name: str) -> Model:
                 'hyper_param_folds': 3,
             }
         )
+    elif model_name in SCALED_REGRESSORS:
+        logger.info(f'Getting ScaledRegressor model for {model_name}')
+        estimator_cls, params = SCALED_REGRESSORS[model_name]
+        return ScaledRegressor(estimator_cls, params)
+    elif model_name == 'IncrementalHuberRegressor':
+        logger.info('Getting IncrementalHuberRegressor model')
+        return IncrementalHuberRegressor()
     else:
         raise ValueError(f'Model {model_name} not found')
 
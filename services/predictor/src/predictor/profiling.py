@@ -1,8 +1,177 @@
+import hashlib
+import json
+import os
+from typing import Optional
+
+import numpy as np
 import pandas as pd
-from ydata_profiling import ProfileReport
+from loguru import logger
+
+
+def sample_data(
+    data: pd.DataFrame, sample_size: int, num_strata: int = 20
+) -> pd.DataFrame:
+    """
+    Take a stratified time-based sample of the data.
+
+    Splits the time range covered by `window_start_ms` into `num_strata` equal
+    buckets and takes evenly spaced rows from each, so every period is
+    represented and the sample stays in time order.
+
+    Args:
+        data: The data to sample.
+        sample_size: The maximum number of rows in the sample.
+        num_strata: The number of time buckets to sample from.
+
+    Returns:
+        The sampled data.
+    """
+    if len(data) <= sample_size:
+        return data
+
+    window_start_ms = data['window_start_ms'].to_numpy(dtype=np.int64)
+    span = window_start_ms.max() - window_start_ms.min() + 1
+    strata = (window_start_ms - window_start_ms.min()) * num_strata // span
+
+    rows_per_stratum = max(1, sample_size // num_strata)
+    positions = []
+    for stratum in np.unique(strata):
+        stratum_positions = np.flatnonzero(strata == stratum)
+        idx = np.linspace(
+            0, len(stratum_positions) - 1, min(rows_per_stratum, len(stratum_positions))
+        )
+        positions.append(stratum_positions[np.unique(idx.round().astype(int))])
+
+    return data.iloc[np.sort(np.concatenate(positions))]
+
+
+def _summarize_chunk(chunk: pd.DataFrame) -> dict:
+    """
+    Compute mergeable per-column statistics for the numeric columns of a chunk.
+    """
+    numeric = chunk.select_dtypes(include='number')
+    values = numeric.to_numpy(dtype=np.float64)
+    finite = np.isfinite(values)
+    masked = np.where(finite, values, 0.0)
+    with np.errstate(invalid='ignore'):
+        minimum = np.where(finite, values, np.inf).min(axis=0)
+        maximum = np.where(finite, values, -np.inf).max(axis=0)
+
+    return {
+        column: {
+            'count': int(finite[:, i].sum()),
+            'missing': int(len(values) - finite[:, i].sum()),
+            'sum': float(masked[:, i].sum()),
+            'sum_sq': float((masked[:, i] ** 2).sum()),
+            'min': float(minimum[i]),
+            'max': float(maximum[i]),
+        }
+        for i, column in enumerate(numeric.columns)
+    }
+
 
+def summarize_columns(
+    data: pd.DataFrame, cache_dir: str, chunk_duration_sec: int = 24 * 60 * 60
+) -> pd.DataFrame:
+    """
+    Compute per-column summary statistics, reusing cached chunk summaries.
+
+    The data is split into chunks of `chunk_duration_sec` by `window_start_ms`.
+    The summary of each complete chunk is cached under its start, row count,
+    last timestamp and columns, which are cheap to compare. The first and last
+    chunks may only be partly covered by the data, so they are never cached.
+    Cached summaries that the data no longer uses are removed.
+
+    Args:
+        data: The data to summarize.
+        cache_dir: The directory holding the cached chunk summaries. It should
+            only be shared by runs on the same symbol and candle duration.
+        chunk_duration_sec: The duration of each chunk in seconds.
+
+    Returns:
+        A dataframe with one row per numeric column.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+
+    chunk_ids = data['window_start_ms'] // (chunk_duration_sec * 1000)
+    first_chunk_id, last_chunk_id = chunk_ids.min(), chunk_ids.max()
+    columns_key = hashlib.sha256(
+        json.dumps([str(c) for c in data.columns]).encode()
+    ).hexdigest()[:16]
+
+    totals: dict[str, dict] = {}
+    cache_files = set()
+    cache_hits = 0
+    for chunk_id, chunk in data.groupby(chunk_ids, sort=True):
+        if chunk_id in (first_chunk_id, last_chunk_id):
+            summary = _summarize_chunk(chunk)
+        else:
+            cache_file = (
+                f'{chunk_id * chunk_duration_sec * 1000}_{len(chunk)}_'
+                f'{chunk["window_start_ms"].max()}_{columns_key}.json'
+            )
+            cache_files.add(cache_file)
+            cache_path = os.path.join(cache_dir, cache_file)
+            if os.path.exists(cache_path):
+                with open(cache_path) as f:
+                    summary = json.load(f)
+                cache_hits += 1
+            else:
+                summary = _summarize_chunk(chunk)
+                with open(cache_path, 'w') as f:
+                    json.dump(summary, f)
+
+        for column, stats in summary.items():
+            total = totals.setdefault(
+                column,
+                {
+                    'count': 0,
+                    'missing': 0,
+                    'sum': 0.0,
+                    'sum_sq': 0.0,
+                    'min': np.inf,
+                    'max': -np.inf,
+                },
+            )
+            total['count'] += stats['count']
+            total['missing'] += stats['missing']
+            total['sum'] += stats['sum']
+            total['sum_sq'] += stats['sum_sq']
+            total['min'] = min(total['min'], stats['min'])
+            total['max'] = max(total['max'], stats['max'])
 
-def profile_data(data: pd.DataFrame, output_file: str):
+    # Chunks that moved out of the data or changed since they were cached.
+    stale_files = [
+        file
+        for file in os.listdir(cache_dir)
+        if file.endswith('.json') and file not in cache_files
+    ]
+    for file in stale_files:
+        os.remove(os.path.join(cache_dir, file))
+
+    logger.info(
+        f'Summarized {chunk_ids.nunique()} chunks, {cache_hits} served from cache, '
+        f'{len(stale_files)} stale summaries removed'
+    )
+
+    summary = pd.DataFrame.from_dict(totals, orient='index')
+    count = summary['count'].where(summary['count'] > 0)
+    summary['mean'] = summary['sum'] / count
+    summary['std'] = np.sqrt(
+        ((summary['sum_sq'] - count * summary['mean'] ** 2) / (count - 1)).clip(lower=0)
+    )
+    summary = summary.drop(columns=['sum', 'sum_sq'])
+    summary.index.name = 'column'
+
+    return summary.reset_index()
+
+
+def profile_data(
+    data: pd.DataFrame,
+    output_file: str,
+    sample_size: Optional[int] = None,
+    minimal: bool = False,
+):
     """
     Profile the data and save the report to the given file.
     Generates a HTML file containing the EDA report.
@@ -10,11 +179,21 @@ def profile_data(data: pd.DataFrame, output_file: str):
     Args:
         data: The data to profile.
         output_file: The file to save the report to.
+        sample_size: Profile a stratified time-based sample of at most this many
+            rows instead of the full data.
+        minimal: Whether to only compute the cheap statistics.
     """
+    from ydata_profiling import ProfileReport
+
+    if sample_size is not None:
+        data = sample_data(data, sample_size)
+        logger.info(f'Profiling a sample of {len(data)} rows')
+
     profile = ProfileReport(
         data,
         tsmode=True,
         sortby='window_start_ms',
         title='Data Profiling Report',
+        minimal=minimal,
     )
     profile.to_file(output_file)
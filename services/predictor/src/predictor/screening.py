@@ -0,0 +1,208 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Optional
+
+import pandas as pd
+from loguru import logger
+from sklearn.metrics import mean_absolute_error
+
+from predictor.models import AVAILABLE_MODELS, get_model
+
+
+def _fit_and_score(
+    model_name: str,
+    X_train: pd.DataFrame,
+    y_train: pd.Series,
+    X_test: pd.DataFrame,
+    y_test: pd.Series,
+) -> dict:
+    """
+    Fit a single candidate model and score it on the test data.
+
+    Args:
+        model_name: The name of the model, as understood by `get_model`.
+        X_train: The training data.
+        y_train: The training target.
+        X_test: The test data.
+        y_test: The test target.
+
+    Returns:
+        A dictionary with the model name, its MAE and the time taken.
+    """
+    start = time.perf_counter()
+    model = get_model(model_name)
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    return {
+        'Model': model_name,
+        'MAE': mean_absolute_error(y_test, y_pred),
+        'Time Taken': time.perf_counter() - start,
+        'Rows': len(X_train),
+    }
+
+
+def _run_stage(
+    model_names: list[str],
+    X_train: pd.DataFrame,
+    y_train: pd.Series,
+    X_test: pd.DataFrame,
+    y_test: pd.Series,
+    deadline: float,
+    n_jobs: Optional[int],
+) -> tuple[list[dict], dict[str, Exception], list[str]]:
+    """
+    Fit the given candidates in parallel until they finish or the deadline passes.
+
+    Candidates that have not started when the deadline passes are cancelled.
+    Python threads cannot be interrupted, so candidates that are already running
+    are only dropped from the results and keep running in the background.
+
+    Args:
+        model_names: The candidates to fit.
+        X_train: The training data.
+        y_train: The training target.
+        X_test: The test data.
+        y_test: The test target.
+        deadline: The `time.monotonic()` value after which results are ignored.
+        n_jobs: The number of worker threads. Defaults to one per candidate.
+
+    Returns:
+        The results of the candidates that finished in time, the exceptions of the
+        candidates that failed and the names of the candidates that timed out.
+    """
+    results = []
+    failures = {}
+    timed_out = []
+    if not model_names:
+        return results, failures, timed_out
+    if time.monotonic() >= deadline:
+        return results, failures, list(model_names)
+
+    executor = ThreadPoolExecutor(max_workers=n_jobs or len(model_names))
+    futures = {
+        executor.submit(_fit_and_score, name, X_train, y_train, X_test, y_test): name
+        for name in model_names
+    }
+    done, _ = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+
+    # Iterate in submission order, so that the first failure is deterministic.
+    for future, name in futures.items():
+        if future not in done:
+            future.cancel()
+            timed_out.append(name)
+            continue
+        try:
+            results.append(future.result())
+        except Exception as e:
+            logger.error(f'Model {name} failed during screening: {e!r}')
+            failures[name] = e
+
+    if timed_out:
+        logger.warning(f'Models {timed_out} exceeded the screening time budget')
+
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    return results, failures, timed_out
+
+
+def screen_models(
+    X_train: pd.DataFrame,
+    y_train: pd.Series,
+    X_test: pd.DataFrame,
+    y_test: pd.Series,
+    model_names: Optional[list[str]] = None,
+    time_budget_sec: float = 60.0,
+    subsample_size: int = 5000,
+    keep_top: int = 3,
+    n_jobs: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Rank candidate models by their MAE on the test data within a wall-clock budget.
+
+    - Fits every candidate in parallel on the most recent `subsample_size`
+      training rows.
+    - Keeps only the `keep_top` best candidates and refits them on the full
+      training data with whatever is left of the budget.
+    - Candidates that fail or do not finish in time are dropped and reported
+      separately. If none of them finishes, raises an error naming the first
+      failure, or a `TimeoutError` if they all ran out of time.
+
+    Args:
+        X_train: The training data.
+        y_train: The training target.
+        X_test: The test data.
+        y_test: The test target.
+        model_names: The allowlist of candidates. Defaults to every model
+            `get_model` can build.
+        time_budget_sec: The wall-clock budget for the whole screening.
+        subsample_size: The number of rows used in the first screening stage.
+        keep_top: The number of candidates refitted on the full training data.
+        n_jobs: The number of worker threads. Defaults to one per candidate.
+
+    Returns:
+        A dataframe with one row per ranked model. Models refitted on the full
+        training data come first, each group sorted by ascending MAE.
+    """
+    if model_names is None:
+        model_names = AVAILABLE_MODELS
+
+    unknown = [name for name in model_names if name not in AVAILABLE_MODELS]
+    if unknown:
+        raise ValueError(f'Models {unknown} not found')
+
+    deadline = time.monotonic() + time_budget_sec
+    results = []
+    failures = {}
+    timed_out = []
+    candidates = list(model_names)
+
+    # Screen on the most recent rows first, so that slow or poor models are cut
+    # before they are fitted on the full training data.
+    if len(X_train) > subsample_size and len(candidates) > keep_top:
+        logger.info(
+            f'Screening {len(candidates)} models on the last {subsample_size} rows'
+        )
+        results, failures, timed_out = _run_stage(
+            candidates,
+            X_train.iloc[-subsample_size:],
+            y_train.iloc[-subsample_size:],
+            X_test,
+            y_test,
+            deadline,
+            n_jobs,
+        )
+        results.sort(key=lambda result: result['MAE'])
+        candidates = [result['Model'] for result in results[: max(1, keep_top)]]
+
+    logger.info(f'Screening {candidates} on the full training data')
+    full_results, full_failures, full_timed_out = _run_stage(
+        candidates, X_train, y_train, X_test, y_test, deadline, n_jobs
+    )
+
+    # Models refitted on the full training data replace their subsample scores.
+    refitted = {result['Model'] for result in full_results}
+    results = full_results + [
+        result for result in results if result['Model'] not in refitted
+    ]
+    failures.update(full_failures)
+    timed_out += full_timed_out
+
+    if failures:
+        logger.warning(f'Models {list(failures)} failed during screening')
+    if timed_out:
+        logger.warning(f'Models {timed_out} did not finish within the time budget')
+
+    if not results:
+        if failures:
+            model_name, error = next(iter(failures.items()))
+            raise RuntimeError(
+                f'No model finished screening, the first failure was {model_name}: '
+                f'{error!r}'
+            ) from error
+        raise TimeoutError('No model finished screening within the time budget')
+
+    models = pd.DataFrame(results, columns=['Model', 'MAE', 'Time Taken', 'Rows'])
+    models.sort_values(by=['Rows', 'MAE'], ascending=[False, True], inplace=True)
+    models.reset_index(drop=True, inplace=True)
+
+    return models
@@ -0,0 +1,163 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from predictor.utils import get_fingerprint
+
+if TYPE_CHECKING:
+    from mlflow.entities import Metric
+
+# Limits of a single MLflow `log_batch` call.
+MAX_PARAMS_PER_BATCH = 100
+MAX_METRICS_PER_BATCH = 1000
+MAX_ENTITIES_PER_BATCH = 1000
+
+
+class RunLogger:
+    def __init__(self, run_id: str):
+        """
+        Buffers params and metrics of an MLflow run and uploads artifacts in the
+        background, so that training does not wait on the tracking server.
+
+        Params and metrics are sent in batches on `flush`, and `close` waits for
+        the pending uploads. Use it as a context manager inside the run.
+
+        Args:
+            run_id: The ID of the MLflow run to log to.
+        """
+        from mlflow import MlflowClient
+
+        self.run_id = run_id
+        self._client = MlflowClient()
+        self._params: dict[str, str] = {}
+        self._metrics: list['Metric'] = []
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._uploads: list[Future] = []
+
+    def __enter__(self) -> 'RunLogger':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def log_param(self, key: str, value: Any):
+        self._params[key] = str(value)
+
+    def log_params(self, params: dict[str, Any]):
+        for key, value in params.items():
+            self.log_param(key, value)
+
+    def log_metric(self, key: str, value: float, step: Optional[int] = None):
+        from mlflow.entities import Metric
+
+        self._metrics.append(
+            Metric(key, float(value), int(time.time() * 1000), step or 0)
+        )
+
+    def log_metrics(self, metrics: dict[str, float], step: Optional[int] = None):
+        for key, value in metrics.items():
+            self.log_metric(key, value, step)
+
+    def log_dataset(self, data: pd.DataFrame, context: str):
+        """
+        Log a fingerprint of the data instead of the data itself.
+
+        The content hash, shape and time range are logged as params, and the
+        schema and per-column statistics as a JSON artifact.
+
+        Args:
+            data: The dataset.
+            context: What the dataset is used for, e.g. 'training'.
+        """
+        self.log_params(
+            {
+                f'dataset_{context}_hash': get_fingerprint(data),
+                f'dataset_{context}_rows': len(data),
+                f'dataset_{context}_columns': data.shape[1],
+            }
+        )
+        if 'window_start_ms' in data.columns and not data.empty:
+            self.log_params(
+                {
+                    f'dataset_{context}_start_ms': int(data['window_start_ms'].iloc[0]),
+                    f'dataset_{context}_end_ms': int(data['window_start_ms'].iloc[-1]),
+                }
+            )
+
+        numeric = data.select_dtypes(include='number')
+        values = numeric.to_numpy(dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            stats = {
+                'mean': np.nanmean(values, axis=0),
+                'std': np.nanstd(values, axis=0),
+                'min': np.nanmin(values, axis=0),
+                'max': np.nanmax(values, axis=0),
+                'missing': np.isnan(values).sum(axis=0),
+            }
+        summary = {
+            'schema': {column: str(dtype) for column, dtype in data.dtypes.items()},
+            'stats': {
+                column: {name: float(stat[i]) for name, stat in stats.items()}
+                for i, column in enumerate(numeric.columns)
+            },
+        }
+        self._submit(
+            self._client.log_dict, self.run_id, summary, f'dataset/{context}.json'
+        )
+
+    def log_artifact(self, local_path: str, artifact_path: Optional[str] = None):
+        """
+        Upload a local file in the background.
+        """
+        self._submit(self._client.log_artifact, self.run_id, local_path, artifact_path)
+
+    def log_table(self, data: pd.DataFrame, artifact_file: str):
+        """
+        Upload a table in the background.
+        """
+        self._submit(self._client.log_table, self.run_id, data, artifact_file)
+
+    def flush(self):
+        """
+        Send the buffered params and metrics in as few calls as possible.
+        """
+        from mlflow.entities import Param
+
+        params = [Param(key, value) for key, value in self._params.items()]
+        metrics = self._metrics
+        self._params = {}
+        self._metrics = []
+
+        while params or metrics:
+            num_params = min(len(params), MAX_PARAMS_PER_BATCH)
+            # The params and metrics of a call also count towards a shared limit.
+            num_metrics = min(
+                len(metrics), MAX_METRICS_PER_BATCH, MAX_ENTITIES_PER_BATCH - num_params
+            )
+            self._client.log_batch(
+                self.run_id,
+                params=params[:num_params],
+                metrics=metrics[:num_metrics],
+            )
+            params = params[num_params:]
+            metrics = metrics[num_metrics:]
+
+    def close(self):
+        """
+        Flush the buffered params and metrics and wait for pending uploads.
+        """
+        self.flush()
+        for upload in self._uploads:
+            try:
+                upload.result()
+            except Exception as e:
+                logger.error(f'Error uploading to MLflow: {e}')
+        self._uploads = []
+        self._executor.shutdown()
+
+    def _submit(self, fn, *args):
+        self._uploads.append(self._executor.submit(fn, *args))
@@ -1,12 +1,18 @@
-import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
-import mlflow
+import numpy as np
 import pandas as pd
-from lazypredict.Supervised import LazyRegressor
 from loguru import logger
+from sklearn.base import clone
 from sklearn.metrics import mean_absolute_error
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
 
 from predictor.models import BaselineModel, get_model
+from predictor.screening import screen_models
+from predictor.tracking import RunLogger
+from predictor.utils import get_model_name, get_target_column
 
 
 def train_model(
@@ -17,6 +23,9 @@ def train_model(
     train_test_split_ratio: float,
     generate_report: bool,
     mlflow_tracking_uri: str,
+    run_logger: RunLogger,
+    screening_models: Optional[list[str]] = None,
+    screening_time_budget_sec: float = 60.0,
 ):
     """
     Train the model for the given data.
@@ -30,17 +39,22 @@ def train_model(
         train_test_split_ratio: The ratio of training data to test data.
         generate_report: Whether to generate a data profiling report.
         mlflow_tracking_uri: The URI of the MLflow tracking server.
+        run_logger: The logger of the active MLflow run.
+        screening_models: The allowlist of models to screen. Defaults to every
+            model `get_model` can build.
+        screening_time_budget_sec: The wall-clock budget for model screening.
     """
+    import mlflow
+
     logger.info(f'Training model for {symbol} with {data.shape[0]} rows')
     # Log training parameters.
-    mlflow.log_param('prediction_horizon_seconds', pred_horizon_sec)
-    mlflow.log_param('train_test_split_ratio', train_test_split_ratio)
+    run_logger.log_param('prediction_horizon_seconds', pred_horizon_sec)
+    run_logger.log_param('train_test_split_ratio', train_test_split_ratio)
 
-    # Log the data to mlflow.
-    dataset = mlflow.data.from_pandas(data)
-    mlflow.log_input(dataset, context='training')
+    # Log a fingerprint of the data to mlflow.
+    run_logger.log_dataset(data, context='training')
 
-    mlflow.log_param('data-shape', data.shape)
+    run_logger.log_param('data-shape', data.shape)
 
     # Split the data into train and test.
     train_size = int(len(data) * train_test_split_ratio)
@@ -48,8 +62,8 @@ def train_model(
     test_data = data.iloc[train_size:]
 
     # Log the train and test data to mlflow.
-    mlflow.log_param('train-data-shape', train_data.shape)
-    mlflow.log_param('test-data-shape', test_data.shape)
+    run_logger.log_param('train-data-shape', train_data.shape)
+    run_logger.log_param('test-data-shape', test_data.shape)
 
     # Split the data into features and target.
     X_train = train_data.drop(columns=['target'])
@@ -58,10 +72,10 @@ def train_model(
     y_test = test_data['target']
 
     # Log the features and target to mlflow.
-    mlflow.log_param('X_train-shape', X_train.shape)
-    mlflow.log_param('y_train-shape', y_train.shape)
-    mlflow.log_param('X_test-shape', X_test.shape)
-    mlflow.log_param('y_test-shape', y_test.shape)
+    run_logger.log_param('X_train-shape', X_train.shape)
+    run_logger.log_param('y_train-shape', y_train.shape)
+    run_logger.log_param('X_test-shape', X_test.shape)
+    run_logger.log_param('y_test-shape', y_test.shape)
 
     # Train a baseline model.
     model = BaselineModel()
@@ -69,39 +83,130 @@ def train_model(
 
     # Log the metrics to mlflow.
     baseline_mae = mean_absolute_error(y_test, y_pred)
-    mlflow.log_metric('mae_baseline', baseline_mae)
+    run_logger.log_metric('mae_baseline', baseline_mae)
     logger.info(f'Baseline MAE: {baseline_mae}')
 
-    mlflow_tracking_uri = os.environ.get('MLFLOW_TRACKING_URI')
-    del os.environ['MLFLOW_TRACKING_URI']
-    # Train a set of N models using lazy predict.
-    reg = LazyRegressor(
-        verbose=0, ignore_warnings=False, custom_metric=mean_absolute_error
+    # Screen the candidate models within the time budget.
+    run_logger.log_param('screening_time_budget_sec', screening_time_budget_sec)
+    models = screen_models(
+        X_train,
+        y_train,
+        X_test,
+        y_test,
+        model_names=screening_models,
+        time_budget_sec=screening_time_budget_sec,
     )
-    models, _ = reg.fit(X_train, X_test, y_train, y_test)
-    models.reset_index(inplace=True)
-    if 'mean_absolute_error' in models.columns:
-        models.rename(columns={'mean_absolute_error': 'MAE'}, inplace=True)
 
-    os.environ['MLFLOW_TRACKING_URI'] = mlflow_tracking_uri
-    mlflow.log_table(models, 'models_summary.json')
+    run_logger.log_table(models, 'models_summary.json')
     logger.info(f'Models summary:\n\n {models}')
 
     # Pick the best model and perform hyper-parameter tuning.
-    best_model = None
-    models.sort_values(by='MAE', inplace=True)
-    for model_name in models['Model']:
-        try:
-            best_model = get_model(model_name)
-            break
-        except ValueError:
-            logger.error(f'Model {model_name} not found, skipping')
-            continue
+    best_model = get_model(models['Model'].iloc[0])
 
     best_model.fit(X_train, y_train)
 
     # Validate the best model.
     y_pred = best_model.predict(X_test)
     mae = mean_absolute_error(y_test, y_pred)
-    mlflow.log_metric('mae_best_model', mae)
+    run_logger.log_metric('mae_best_model', mae)
     logger.info(f'Best model MAE: {mae}')
+
+    # Push the best model to the model registry.
+    model_name = get_model_name(symbol, candle_duration, pred_horizon_sec)
+    mlflow.sklearn.log_model(
+        sk_model=best_model.pipe,
+        artifact_path='model',
+        registered_model_name=model_name,
+    )
+    logger.info(f'Registered model {model_name}')
+
+
+def train_multi_horizon_model(
+    data: pd.DataFrame,
+    symbol: str,
+    candle_duration: int,
+    pred_horizons_sec: list[int],
+    train_test_split_ratio: float,
+    run_logger: RunLogger,
+    model_name: str = 'HuberRegressor',
+    n_jobs: Optional[int] = None,
+):
+    """
+    Train one model head per prediction horizon on a shared feature matrix.
+    Pushes one model per horizon to the model registry.
+
+    The scaler is fitted and the features are transformed once, and the heads
+    are then fitted in parallel on the same scaled matrix.
+
+    Args:
+        data: The dataframe prepared with one target column per horizon.
+        symbol: The symbol being predicted.
+        candle_duration: The duration of each candle in seconds.
+        pred_horizons_sec: The prediction horizons in seconds.
+        train_test_split_ratio: The ratio of training data to test data.
+        run_logger: The logger of the active MLflow run.
+        model_name: The name of the model used for every head, as understood
+            by `get_model`.
+        n_jobs: The number of worker threads used to fit the heads.
+    """
+    import mlflow
+
+    target_columns = [get_target_column(h) for h in pred_horizons_sec]
+    logger.info(
+        f'Training {len(target_columns)} horizons for {symbol} with {data.shape[0]} rows'
+    )
+    run_logger.log_dataset(data, context='training')
+    run_logger.log_params(
+        {
+            'prediction_horizons_seconds': pred_horizons_sec,
+            'train_test_split_ratio': train_test_split_ratio,
+            'model_name': model_name,
+            'data-shape': data.shape,
+        }
+    )
+
+    # Split the data into train and test, and into features and targets.
+    train_size = int(len(data) * train_test_split_ratio)
+    X = data.drop(columns=target_columns)
+    X_train, X_test = X.iloc[:train_size], X.iloc[train_size:]
+    Y_train = data[target_columns].iloc[:train_size].to_numpy()
+    Y_test = data[target_columns].iloc[train_size:].to_numpy()
+
+    # Fit the scaler and transform the features once for all horizons.
+    scaler = StandardScaler().fit(X_train)
+    X_train_scaled = scaler.transform(X_train)
+
+    def fit_head(i: int):
+        head = clone(get_model(model_name).pipe.named_steps['model'])
+        return head.fit(X_train_scaled, Y_train[:, i])
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        heads = list(executor.map(fit_head, range(len(target_columns))))
+
+    # Validate all horizons at once against the baseline.
+    X_test_scaled = scaler.transform(X_test)
+    Y_pred = np.column_stack([head.predict(X_test_scaled) for head in heads])
+    Y_baseline = X_test['closing_price'].to_numpy()[:, np.newaxis]
+    mae = np.abs(Y_pred - Y_test).mean(axis=0)
+    baseline_mae = np.abs(Y_baseline - Y_test).mean(axis=0)
+
+    run_logger.log_metrics(
+        {
+            **{f'mae_{h}': mae[i] for i, h in enumerate(pred_horizons_sec)},
+            **{
+                f'mae_baseline_{h}': baseline_mae[i]
+                for i, h in enumerate(pred_horizons_sec)
+            },
+        }
+    )
+    logger.info(f'MAE per horizon: {dict(zip(pred_horizons_sec, mae, strict=True))}')
+
+    # Push one pipeline per horizon, sharing the fitted scaler.
+    for pred_horizon_sec, head in zip(pred_horizons_sec, heads, strict=True):
+        registered_name = get_model_name(symbol, candle_duration, pred_horizon_sec)
+        mlflow.sklearn.log_model(
+            sk_model=Pipeline([('scaler', scaler), ('model', head)]),
+            artifact_path=f'model_{pred_horizon_sec}',
+            registered_model_name=registered_name,
+        )
+        logger.info(f'Registered model {registered_name}')
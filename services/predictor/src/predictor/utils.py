@@ -1,7 +1,44 @@
+import hashlib
+import json
+
+import pandas as pd
+
+# Columns of the technical indicators table that describe the pipeline rather
+# than the market, and must never be used as features.
+TRACING_COLUMNS = ['exchange_lag_ms']
+
+
 def get_experiment_name(
-    symbol: str, candle_duration: int, pred_horizon_sec: int
+    symbol: str, candle_duration: int, pred_horizon_sec: int | list[int]
 ) -> str:
     """
     Get the experiment name for the given symbol, candle duration, and prediction horizon.
     """
+    if isinstance(pred_horizon_sec, list):
+        pred_horizon_sec = '_'.join(str(h) for h in pred_horizon_sec)
     return f'{symbol}-{candle_duration}-{pred_horizon_sec}'
+
+
+def get_model_name(symbol: str, candle_duration: int, pred_horizon_sec: int) -> str:
+    """
+    Get the registered model name for the given symbol, candle duration, and prediction horizon.
+    """
+    return f'{symbol.replace("/", "_")}-{candle_duration}-{pred_horizon_sec}'
+
+
+def get_target_column(pred_horizon_sec: int) -> str:
+    """
+    Get the target column name for the given prediction horizon, when training on
+    several horizons at once.
+    """
+    return f'target_{pred_horizon_sec}'
+
+
+def get_fingerprint(data: pd.DataFrame) -> str:
+    """
+    Get a fingerprint of the content and schema of the given data.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(c) for c in data.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
@@ -0,0 +1,158 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from predictor.features import FEATURE_PIPELINE
+
+# Columns that must be strictly positive.
+POSITIVE_COLUMNS = (
+    'opening_price',
+    'high_price',
+    'low_price',
+    'closing_price',
+    'target',
+)
+# Prefix of the per-horizon target columns, which must be strictly positive too.
+TARGET_PREFIX = 'target_'
+# Columns that must not be negative.
+NON_NEGATIVE_COLUMNS = ('volume',)
+# Prefix of the technical indicator columns, which are NaN until enough candles
+# have been seen to compute them.
+INDICATOR_PREFIX = 'close_prices_'
+# The feature columns, which are NaN until their window is full.
+FEATURE_COLUMNS = tuple(FEATURE_PIPELINE.names)
+
+
+@dataclass
+class ValidationReport:
+    """
+    The outcome of validating a dataframe of candles.
+    """
+
+    num_rows: int
+    errors: list[str] = field(default_factory=list)
+    warnings: list[str] = field(default_factory=list)
+    non_finite_counts: dict[str, int] = field(default_factory=dict)
+    non_positive_counts: dict[str, int] = field(default_factory=dict)
+    warm_up_rows: dict[str, int] = field(default_factory=dict)
+    duplicate_timestamps: int = 0
+    non_monotonic_timestamps: int = 0
+    # (window_start_ms after the gap, number of missing candles)
+    gaps: list[tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def success(self) -> bool:
+        return not self.errors
+
+
+def validate_frame(
+    data: pd.DataFrame,
+    candle_duration: Optional[int] = None,
+    max_warm_up_rows: Optional[int] = None,
+) -> ValidationReport:
+    """
+    Validates every numeric column of the data in a single vectorized pass.
+
+    - Columns other than indicators and features must be finite.
+    - Indicator and feature columns may only be NaN in a leading warm-up range.
+    - Price columns must be positive and volume must be non-negative.
+    - `window_start_ms` must be strictly increasing, and gaps larger than the
+      candle duration are reported as warnings.
+
+    Args:
+        data: The dataframe to validate.
+        candle_duration: The duration of each candle in seconds. Gap detection
+            is skipped when not given.
+        max_warm_up_rows: The longest allowed indicator warm-up range. Not
+            checked when not given.
+
+    Returns:
+        The validation report.
+    """
+    report = ValidationReport(num_rows=len(data))
+    if data.empty:
+        report.warnings.append('No rows to validate')
+        return report
+
+    if 'closing_price' in data.columns and data['closing_price'].dtype != np.float64:
+        report.errors.append(
+            f'closing_price has dtype {data["closing_price"].dtype}, expected float64'
+        )
+
+    numeric = data.select_dtypes(include='number')
+    columns = numeric.columns
+    values = numeric.to_numpy(dtype=np.float64)
+
+    # Finiteness, with the leading NaN range of each column as its warm-up.
+    finite = np.isfinite(values)
+    non_finite_counts = len(values) - finite.sum(axis=0)
+    first_finite = np.where(finite.any(axis=0), finite.argmax(axis=0), len(values))
+    is_indicator = columns.str.startswith(INDICATOR_PREFIX) | columns.isin(
+        FEATURE_COLUMNS
+    )
+    unexpected_non_finite = np.where(
+        is_indicator, non_finite_counts - first_finite, non_finite_counts
+    )
+
+    # Positivity, with non-finite values already counted above.
+    positive = columns.isin(POSITIVE_COLUMNS) | columns.str.startswith(TARGET_PREFIX)
+    non_negative = columns.isin(NON_NEGATIVE_COLUMNS)
+    with np.errstate(invalid='ignore'):
+        violations = np.where(positive, values <= 0, False) | np.where(
+            non_negative, values < 0, False
+        )
+    non_positive_counts = violations.sum(axis=0)
+
+    for i, column in enumerate(columns):
+        if non_finite_counts[i]:
+            report.non_finite_counts[column] = int(non_finite_counts[i])
+        if is_indicator[i]:
+            report.warm_up_rows[column] = int(first_finite[i])
+        if unexpected_non_finite[i]:
+            report.errors.append(
+                f'{column} has {unexpected_non_finite[i]} non-finite values'
+            )
+        if non_positive_counts[i]:
+            report.non_positive_counts[column] = int(non_positive_counts[i])
+            report.errors.append(
+                f'{column} has {non_positive_counts[i]} out of range values'
+            )
+
+    if max_warm_up_rows is not None:
+        for column, rows in report.warm_up_rows.items():
+            if rows > max_warm_up_rows:
+                report.warnings.append(
+                    f'{column} has a warm-up of {rows} rows, expected at most {max_warm_up_rows}'
+                )
+
+    if 'window_start_ms' in columns:
+        window_start_ms = data['window_start_ms'].to_numpy(dtype=np.int64)
+        diffs = np.diff(window_start_ms)
+
+        report.duplicate_timestamps = int((diffs == 0).sum())
+        report.non_monotonic_timestamps = int((diffs < 0).sum())
+        if report.duplicate_timestamps:
+            report.errors.append(
+                f'window_start_ms has {report.duplicate_timestamps} duplicated values'
+            )
+        if report.non_monotonic_timestamps:
+            report.errors.append(
+                f'window_start_ms decreases {report.non_monotonic_timestamps} times'
+            )
+
+        if candle_duration is not None:
+            step_ms = candle_duration * 1000
+            gap_idx = np.flatnonzero(diffs > step_ms)
+            report.gaps = [
+                (int(window_start_ms[i + 1]), int(diffs[i] // step_ms - 1))
+                for i in gap_idx
+            ]
+            if report.gaps:
+                missing = sum(count for _, count in report.gaps)
+                report.warnings.append(
+                    f'window_start_ms has {len(report.gaps)} gaps with {missing} missing candles'
+                )
+
+    return report
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+from predictor.data import prepare_data
+from predictor.features import FEATURE_PIPELINE
+from predictor.models import get_model
+from predictor.validation import validate_frame
+
+
+def make_candles(num_candles: int = 200, seed: int = 42) -> pd.DataFrame:
+    """
+    Consecutive one-minute candles of a single symbol, with indicator columns
+    that are NaN during their warm-up like the ones read from RisingWave.
+    """
+    rng = np.random.default_rng(seed)
+    closing_price = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 1e-3, num_candles)))
+    data = pd.DataFrame(
+        {
+            'window_start_ms': np.arange(num_candles, dtype=np.int64) * 60_000,
+            'opening_price': closing_price,
+            'high_price': closing_price,
+            'low_price': closing_price,
+            'closing_price': closing_price,
+            'volume': rng.lognormal(size=num_candles),
+            'close_prices_rsi_14': rng.uniform(0, 100, num_candles),
+            'close_prices_macd_7_hist': rng.normal(size=num_candles),
+            'close_prices_obv': rng.normal(size=num_candles),
+        }
+    )
+    data.loc[:14, 'close_prices_rsi_14'] = np.nan
+    data.loc[:28, 'close_prices_macd_7_hist'] = np.nan
+    return data
+
+
+def test_batch_and_streaming_features_are_identical():
+    data = make_candles()
+
+    batch = FEATURE_PIPELINE.transform(data)
+
+    state = FEATURE_PIPELINE.init_state()
+    streaming = pd.DataFrame(
+        [
+            FEATURE_PIPELINE.transform_row(row, state)
+            for row in data.to_dict(orient='records')
+        ]
+    )
+
+    for name in FEATURE_PIPELINE.names:
+        np.testing.assert_array_equal(
+            streaming[name].to_numpy(), batch[name].to_numpy(), err_msg=name
+        )
+
+
+def test_streaming_update_of_the_last_window_replaces_it():
+    data = make_candles(num_candles=30)
+    rows = data.to_dict(orient='records')
+
+    state = FEATURE_PIPELINE.init_state()
+    for row in rows[:-1]:
+        FEATURE_PIPELINE.transform_row(row, state)
+    # An earlier update of the last window, replaced by the final one.
+    FEATURE_PIPELINE.transform_row(
+        {**rows[-1], 'closing_price': rows[-1]['closing_price'] * 2}, state
+    )
+    output = FEATURE_PIPELINE.transform_row(rows[-1], state)
+
+    batch = FEATURE_PIPELINE.transform(data).iloc[-1]
+    for name in FEATURE_PIPELINE.names:
+        np.testing.assert_array_equal(output[name], batch[name], err_msg=name)
+
+
+def test_feature_warm_up_passes_validation():
+    data = FEATURE_PIPELINE.transform(make_candles())
+
+    report = validate_frame(data, candle_duration=60)
+
+    assert report.success, report.errors
+    assert report.warm_up_rows['closing_price_volatility_60'] == 60
+
+
+def test_prepared_features_can_be_fitted():
+    data = make_candles().assign(symbol='BTC/USD', candle_duration=60)
+
+    prepared = prepare_data(
+        data, [60, 300], candle_duration=60, features=FEATURE_PIPELINE
+    )
+
+    assert not prepared.isna().any().any()
+    X = prepared.drop(columns=['target_60', 'target_300'])
+    for model_name in ['HuberRegressor', 'Ridge']:
+        model = get_model(model_name)
+        model.fit(X, prepared['target_300'])
+        assert np.isfinite(model.predict(X)).all()
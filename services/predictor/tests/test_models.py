@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+from predictor.models import IncrementalHuberRegressor
+
+
+def make_data(num_rows: int, level: float, seed: int):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(
+        rng.normal(level, 1.0, size=(num_rows, 3)), columns=['a', 'b', 'c']
+    )
+    y = pd.Series(X.sum(axis=1) + rng.normal(scale=0.1, size=num_rows))
+    return X, y
+
+
+def test_partial_fit_keeps_the_scalers_of_the_first_fit():
+    model = IncrementalHuberRegressor()
+    model.fit(*make_data(500, level=100.0, seed=0))
+    scaler = model.pipe.named_steps['scaler']
+    regressor = model.pipe.named_steps['model']
+    x_mean, y_mean = scaler.mean_.copy(), regressor.y_scaler_.mean_.copy()
+    coef = regressor.model_.coef_.copy()
+
+    # A later batch at a different price level.
+    model.partial_fit(*make_data(500, level=200.0, seed=1))
+
+    np.testing.assert_array_equal(scaler.mean_, x_mean)
+    np.testing.assert_array_equal(regressor.y_scaler_.mean_, y_mean)
+    assert not np.array_equal(regressor.model_.coef_, coef)
+
+
+def test_partial_fit_of_a_new_model_fits_the_scalers():
+    X, y = make_data(500, level=100.0, seed=0)
+
+    model = IncrementalHuberRegressor()
+    model.partial_fit(X, y)
+
+    np.testing.assert_allclose(model.pipe.named_steps['scaler'].mean_, X.mean())
+    assert np.isfinite(model.predict(X)).all()
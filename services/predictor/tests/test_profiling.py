@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from predictor.profiling import summarize_columns
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def make_candles(first_day: int, num_days: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Hourly candles starting half-way through `first_day`, so that the first and
+    last days are only partly covered.
+    """
+    window_start_ms = np.arange(
+        first_day * DAY_MS + DAY_MS // 2,
+        (first_day + num_days) * DAY_MS + DAY_MS // 2,
+        60 * 60 * 1000,
+        dtype=np.int64,
+    )
+    rng = np.random.default_rng(seed + first_day)
+    return pd.DataFrame(
+        {
+            'window_start_ms': window_start_ms,
+            'closing_price': rng.normal(100, 1, len(window_start_ms)),
+        }
+    )
+
+
+def test_only_complete_days_are_cached_and_stale_ones_removed(tmp_path):
+    data = make_candles(first_day=0, num_days=4)
+
+    summarize_columns(data, str(tmp_path))
+    # Days 1 to 3 are complete.
+    assert len(list(tmp_path.iterdir())) == 3
+
+    data = pd.concat([data, make_candles(first_day=4, num_days=1)])
+    data = data[data['window_start_ms'] >= DAY_MS + DAY_MS // 2]
+    summary = summarize_columns(data, str(tmp_path))
+
+    # Day 1 is now the first, partly covered day, and day 4 became complete.
+    cached_days = sorted(
+        int(f.name.split('_')[0]) // DAY_MS for f in tmp_path.iterdir()
+    )
+    assert cached_days == [2, 3, 4]
+    closing_price = summary.set_index('column').loc['closing_price']
+    assert closing_price['count'] == len(data)
+    np.testing.assert_allclose(closing_price['mean'], data['closing_price'].mean())
+    np.testing.assert_allclose(closing_price['std'], data['closing_price'].std())
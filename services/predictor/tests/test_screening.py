@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from predictor import screening
+from predictor.models import get_model
+
+
+def make_data(num_rows: int = 100, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(num_rows, 3)), columns=['a', 'b', 'c'])
+    y = pd.Series(X.sum(axis=1) + rng.normal(scale=0.1, size=num_rows))
+    return X, y, X, y
+
+
+class BrokenModel:
+    def fit(self, X, y):
+        raise ValueError('broken fit')
+
+
+class SlowModel:
+    def fit(self, X, y):
+        time.sleep(1.0)
+
+
+def fake_get_model(model_name: str):
+    if model_name == 'Lasso':
+        return BrokenModel()
+    if model_name == 'Ridge':
+        return SlowModel()
+    return get_model(model_name)
+
+
+def test_failed_models_are_dropped(monkeypatch):
+    monkeypatch.setattr(screening, 'get_model', fake_get_model)
+
+    models = screening.screen_models(
+        *make_data(), model_names=['Lasso', 'LinearRegression']
+    )
+
+    assert models['Model'].tolist() == ['LinearRegression']
+
+
+def test_screening_raises_the_first_failure(monkeypatch):
+    monkeypatch.setattr(screening, 'get_model', fake_get_model)
+
+    with pytest.raises(RuntimeError, match='Lasso') as error:
+        screening.screen_models(*make_data(), model_names=['Lasso', 'Ridge'])
+
+    assert isinstance(error.value.__cause__, ValueError)
+
+
+def test_screening_raises_when_every_model_times_out(monkeypatch):
+    monkeypatch.setattr(screening, 'get_model', fake_get_model)
+
+    with pytest.raises(TimeoutError):
+        screening.screen_models(
+            *make_data(), model_names=['Ridge'], time_budget_sec=0.1
+        )
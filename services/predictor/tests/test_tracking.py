@@ -0,0 +1,20 @@
+from unittest import mock
+
+from mlflow.utils.validation import _validate_batch_log_limits
+from predictor.tracking import RunLogger
+
+
+def test_flush_keeps_every_batch_within_the_mlflow_limits():
+    with mock.patch('mlflow.MlflowClient') as client_cls:
+        run_logger = RunLogger('run')
+        run_logger.log_params({f'param_{i}': i for i in range(100)})
+        for i in range(1500):
+            run_logger.log_metric('mae', i, step=i)
+        run_logger.close()
+
+    calls = client_cls.return_value.log_batch.call_args_list
+    for call in calls:
+        # Raises for a batch the tracking server would reject.
+        _validate_batch_log_limits(call.kwargs['metrics'], call.kwargs['params'], [])
+    assert sum(len(call.kwargs['params']) for call in calls) == 100
+    assert sum(len(call.kwargs['metrics']) for call in calls) == 1500
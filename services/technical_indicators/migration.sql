@@ -24,6 +24,7 @@ CREATE TABLE technical_indicators (
     close_prices_macd_7_signal FLOAT,
     close_prices_macd_7_hist FLOAT,
     close_prices_obv FLOAT,
+    exchange_lag_ms BIGINT,
     PRIMARY KEY (symbol, window_start_ms, window_end_ms)
 ) WITH (
     connector='kafka',
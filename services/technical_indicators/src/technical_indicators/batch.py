@@ -0,0 +1,392 @@
+import os
+from itertools import zip_longest
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+from observability.profiling import timed
+from observability.streaming import MESSAGES_PRODUCED
+from observability.tracing import (
+    INDICATOR_EMITTED,
+    exchange_lag_ms,
+    from_headers,
+    stamp,
+    to_headers,
+)
+from quixstreams.kafka import Producer
+from quixstreams.models import Topic
+from quixstreams.sinks import BatchingSink, SinkBatch
+from quixstreams.sinks.base.item import SinkItem
+
+from technical_indicators.candle import CANDLES_IN_STATE, is_same_window
+from technical_indicators.latest import LatestIndicatorsIndex
+
+# The periods of the moving averages and RSIs of `compute_technical_indicators`.
+PERIODS = (7, 14, 21, 60)
+MACD_FAST_PERIOD = 7
+MACD_SLOW_PERIOD = 21
+MACD_SIGNAL_PERIOD = 9
+# talib treats values closer to zero than this as zero.
+ZERO = 1e-8
+
+
+def _tail(values: np.ndarray, size: int) -> np.ndarray:
+    """
+    Get the last `size` columns of a matrix, padded with NaN on the left.
+    """
+    num_rows, num_cols = values.shape
+    if size <= num_cols:
+        return values[:, num_cols - size :]
+    padding = np.full((num_rows, size - num_cols), np.nan)
+    return np.hstack([padding, values])
+
+
+def _ema_weights(period: int, size: int, num_outputs: int) -> np.ndarray:
+    """
+    Get the weights of the exponential moving average over the last
+    `num_outputs` of `size` candles, seeded with the simple moving average of the
+    `period` candles before, as talib computes it. The recursion is linear in
+    the candles, so it is run once on the identity matrix.
+
+    Returns:
+        A (size x num_outputs) matrix, so that `candles @ weights` is the moving
+            average of every row of candles.
+    """
+    k = 2 / (period + 1)
+    seed_col = size - num_outputs
+    candles = np.eye(size)
+    weights = np.empty((size, num_outputs))
+    weights[:, 0] = candles[:, seed_col - period + 1 : seed_col + 1].mean(axis=1)
+    for i in range(1, num_outputs):
+        previous = weights[:, i - 1]
+        weights[:, i] = (candles[:, seed_col + i] - previous) * k + previous
+    return weights
+
+
+# The candles the MACD of the last candle depends on.
+MACD_SIZE = MACD_SLOW_PERIOD + MACD_SIGNAL_PERIOD - 1
+# The MACD line over the last `MACD_SIGNAL_PERIOD` candles.
+_MACD_LINE_WEIGHTS = _ema_weights(
+    MACD_FAST_PERIOD, MACD_SIZE, MACD_SIGNAL_PERIOD
+) - _ema_weights(MACD_SLOW_PERIOD, MACD_SIZE, MACD_SIGNAL_PERIOD)
+# The MACD of the last candle, and its signal, which is seeded with the average
+# of the MACD line and has no candles left to smooth.
+MACD_WEIGHTS = np.column_stack(
+    [_MACD_LINE_WEIGHTS[:, -1], _MACD_LINE_WEIGHTS.mean(axis=1)]
+)
+
+
+@timed('compute_technical_indicators_batch')
+def compute_technical_indicators_batch(
+    closing_prices: np.ndarray, volume: np.ndarray, lengths: np.ndarray
+) -> dict[str, np.ndarray]:
+    """
+    Computes the technical indicators of `compute_technical_indicators` for many
+    symbols at once.
+
+    The talib stream functions used there only compute the last value from the
+    candles it depends on, e.g. the EMA is seeded with the SMA of the last
+    `period` candles and has no candles left to smooth. This reproduces them
+    with sums over the last columns of the matrices.
+
+    Args:
+        closing_prices (np.ndarray): The (symbols x candles) closing prices,
+            oldest first. The last `lengths[i]` columns of row `i` are candles.
+        volume (np.ndarray): The (symbols x candles) volumes.
+        lengths (np.ndarray): The number of candles of every symbol.
+
+    Returns:
+        dict[str, np.ndarray]: The value of every indicator for every symbol,
+            NaN where there are not enough candles.
+    """
+    periods = np.array(PERIODS)
+    # The sums of the last 1, 2, ... candles, and of their gains and losses.
+    prices = _tail(closing_prices, periods.max() + 1)[:, ::-1]
+    diffs = prices[:, :-1] - prices[:, 1:]
+    price_sums = np.cumsum(prices, axis=1)[:, periods - 1]
+    gain_sums = np.cumsum(np.maximum(diffs, 0.0), axis=1)[:, periods - 1]
+    loss_sums = np.cumsum(np.maximum(-diffs, 0.0), axis=1)[:, periods - 1]
+
+    smas = price_sums / periods
+    smas[lengths[:, np.newaxis] < periods] = np.nan
+    # The average gains and losses share the period, which cancels out.
+    total = gain_sums + loss_sums
+    rsis = 100 * gain_sums / np.where(total == 0, 1.0, total)
+    rsis[np.abs(total / periods) < ZERO] = 0.0
+    rsis[lengths[:, np.newaxis] <= periods] = np.nan
+
+    macd, signal = (_tail(closing_prices, MACD_SIZE) @ MACD_WEIGHTS).T
+    has_macd = lengths >= MACD_SIZE
+
+    indicators = {}
+    for i, period in enumerate(PERIODS):
+        indicators[f'close_prices_sma_{period}'] = smas[:, i]
+        indicators[f'close_prices_ema_{period}'] = smas[:, i]
+    for i, period in enumerate(PERIODS):
+        indicators[f'close_prices_rsi_{period}'] = rsis[:, i]
+    indicators['close_prices_macd_7'] = np.where(has_macd, macd, np.nan)
+    indicators['close_prices_macd_7_signal'] = np.where(has_macd, signal, np.nan)
+    indicators['close_prices_macd_7_hist'] = np.where(has_macd, macd - signal, np.nan)
+    # The OBV of a single candle is its volume.
+    indicators['close_prices_obv'] = volume[:, -1].copy()
+
+    return indicators
+
+
+class CandleHistory:
+    def __init__(self, max_candles: int, capacity: int = 16):
+        """
+        The last `max_candles` candles of every symbol, as (symbols x candles)
+        matrices of the values the indicators are computed from.
+
+        Each row is right aligned: the latest candle of a symbol is in the last
+        column, and older candles are shifted left when a new window starts.
+
+        Args:
+            max_candles (int): The number of candles to keep per symbol.
+            capacity (int): The number of rows to allocate up front. The
+                matrices double in size when they are full.
+        """
+        self.max_candles = max_candles
+        self.rows: dict[str, int] = {}
+        self.closing_prices = np.full((capacity, max_candles), np.nan)
+        self.volume = np.full((capacity, max_candles), np.nan)
+        # The window of every candle, -1 where there is none yet.
+        self.window_start_ms = np.full((capacity, max_candles), -1, dtype=np.int64)
+        self.lengths = np.zeros(capacity, dtype=np.int64)
+
+    def _get_row(self, symbol: str) -> int:
+        row = self.rows.get(symbol)
+        if row is not None:
+            return row
+
+        row = len(self.rows)
+        if row == len(self.lengths):
+            grow = len(self.lengths)
+            self.closing_prices = np.vstack(
+                [self.closing_prices, np.full((grow, self.max_candles), np.nan)]
+            )
+            self.volume = np.vstack(
+                [self.volume, np.full((grow, self.max_candles), np.nan)]
+            )
+            self.window_start_ms = np.vstack(
+                [
+                    self.window_start_ms,
+                    np.full((grow, self.max_candles), -1, dtype=np.int64),
+                ]
+            )
+            self.lengths = np.concatenate([self.lengths, np.zeros(grow, np.int64)])
+        self.rows[symbol] = row
+        return row
+
+    @timed('update_candle_history')
+    def update(self, candles: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Add candles to the history, like `update_candle_state` does for one.
+
+        A candle of an older window than the latest one of its symbol, i.e. a
+        late update or a candle replayed after a restart, replaces its window
+        in the history, or is dropped if the window is no longer in it.
+
+        Args:
+            candles (list[dict]): The candles, at most one per symbol.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The indices of the candles of the
+                latest window of their symbol, which the indicators are to be
+                computed for, and their rows.
+        """
+        latest = []
+        rows = []
+        for i, candle in enumerate(candles):
+            row = self._get_row(candle['symbol'])
+            window_start_ms = candle['window_start_ms']
+            if window_start_ms > self.window_start_ms[row, -1]:
+                self.closing_prices[row, :-1] = self.closing_prices[row, 1:]
+                self.volume[row, :-1] = self.volume[row, 1:]
+                self.window_start_ms[row, :-1] = self.window_start_ms[row, 1:]
+                self.lengths[row] = min(self.lengths[row] + 1, self.max_candles)
+                CANDLES_IN_STATE.set(self.lengths[row], symbol=candle['symbol'])
+                column = self.max_candles - 1
+            else:
+                matches = np.flatnonzero(self.window_start_ms[row] == window_start_ms)
+                if not matches.size:
+                    continue
+                column = matches[0]
+
+            self.closing_prices[row, column] = candle['closing_price']
+            self.volume[row, column] = candle['volume']
+            self.window_start_ms[row, column] = window_start_ms
+            if column == self.max_candles - 1:
+                latest.append(i)
+                rows.append(row)
+        return np.array(latest, dtype=np.int64), np.array(rows, dtype=np.int64)
+
+    def save(self, path: str):
+        """
+        Write the history to a file, replacing the previous one atomically.
+        """
+        num_rows = len(self.rows)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                symbols=np.array(list(self.rows), dtype=object),
+                closing_prices=self.closing_prices[:num_rows],
+                volume=self.volume[:num_rows],
+                lengths=self.lengths[:num_rows],
+                window_start_ms=self.window_start_ms[:num_rows],
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, max_candles: int) -> 'CandleHistory':
+        """
+        Read the history written by `save`, or start an empty one if there is none.
+        """
+        if not os.path.exists(path):
+            return cls(max_candles)
+
+        with np.load(path, allow_pickle=True) as data:
+            symbols = list(data['symbols'])
+            history = cls(max_candles, capacity=max(len(symbols), 16))
+            size = min(max_candles, data['closing_prices'].shape[1])
+            window_start_ms = data['window_start_ms']
+            if window_start_ms.ndim == 1:
+                # Files written before the window of every candle was kept
+                # only hold the window of the latest one.
+                window_start_ms = np.full(data['closing_prices'].shape, -1)
+                window_start_ms[:, -1] = data['window_start_ms']
+            for i, symbol in enumerate(symbols):
+                row = history._get_row(symbol)
+                history.closing_prices[row, -size:] = data['closing_prices'][i, -size:]
+                history.volume[row, -size:] = data['volume'][i, -size:]
+                history.window_start_ms[row, -size:] = window_start_ms[i, -size:]
+                history.lengths[row] = min(data['lengths'][i], max_candles)
+        logger.info(f'Loaded the candles of {len(symbols)} symbols from {path}')
+        return history
+
+
+def split_rounds(items: list[SinkItem]) -> list[list[SinkItem]]:
+    """
+    Split a batch of candles into rounds with at most one candle per symbol.
+
+    Only the latest update of every window is kept, and round `i` holds the
+    `i`-th window of every symbol in the batch, so the windows of a symbol are
+    added to the history in order.
+    """
+    windows: dict[str, list[SinkItem]] = {}
+    for item in items:
+        symbol_windows = windows.setdefault(item.value['symbol'], [])
+        if symbol_windows and is_same_window(item.value, symbol_windows[-1].value):
+            symbol_windows[-1] = item
+        else:
+            symbol_windows.append(item)
+
+    return [
+        [item for item in round_items if item is not None]
+        for round_items in zip_longest(*windows.values())
+    ]
+
+
+class TechnicalIndicatorsSink(BatchingSink):
+    def __init__(
+        self,
+        producer: Producer,
+        topic: Topic,
+        candle_duration: int,
+        max_candles: int,
+        state_path: str,
+        latency_column: bool = False,
+        latest_index: Optional[LatestIndicatorsIndex] = None,
+        latest_topic: Optional[Topic] = None,
+    ):
+        """
+        Computes the technical indicators of a batch of candles at once, and
+        produces them to a topic.
+
+        The batch is the candles consumed since the last checkpoint. The
+        indicators are only computed for the latest update of every window in
+        the batch, as the earlier ones would be overwritten downstream anyway.
+        The candle history is kept in memory and written to `state_path` once
+        per batch, before the offsets are committed. If the application stops
+        between the two, the batch is replayed, and its candles replace their
+        windows in the history instead of being added again.
+
+        Unlike the quixstreams state, the file is not backed by a changelog
+        topic. It is lost with the container unless `state_path` is on a
+        persistent volume, and it does not move with the partitions when they
+        are reassigned, so batch mode is meant to run as a single replica.
+
+        Args:
+            producer (Producer): The producer to produce the indicators with.
+            topic (Topic): The topic to produce technical indicators to.
+            candle_duration (int): The duration of the candles in seconds.
+            max_candles (int): The number of candles to keep per symbol.
+            state_path (str): The file to persist the candle history to.
+            latency_column (bool): Whether to add the `exchange_lag_ms` column.
+            latest_index (Optional[LatestIndicatorsIndex]): The index to add the
+                indicators to, if they are served.
+            latest_topic (Optional[Topic]): The compacted topic the index is
+                rebuilt from, required with `latest_index`.
+        """
+        super().__init__()
+        self.producer = producer
+        self.topic = topic
+        self.candle_duration = candle_duration
+        self.state_path = state_path
+        self.latency_column = latency_column
+        self.latest_index = latest_index
+        self.latest_topic = latest_topic
+        self.history = CandleHistory.load(state_path, max_candles)
+
+    def write(self, batch: SinkBatch):
+        items = [
+            item
+            for item in batch
+            if item.value['candle_duration'] == self.candle_duration
+        ]
+
+        for round_items in split_rounds(items):
+            latest, rows = self.history.update([item.value for item in round_items])
+            # Candles of older windows only update the history.
+            round_items = [round_items[i] for i in latest]
+            indicators = compute_technical_indicators_batch(
+                self.history.closing_prices[rows],
+                self.history.volume[rows],
+                self.history.lengths[rows],
+            )
+            # Python floats, as the JSON serializer does not take NumPy scalars.
+            indicators = {name: values.tolist() for name, values in indicators.items()}
+            for i, item in enumerate(round_items):
+                trace = stamp(from_headers(item.headers), INDICATOR_EMITTED)
+                value = {
+                    **item.value,
+                    **{name: values[i] for name, values in indicators.items()},
+                }
+                if self.latency_column:
+                    value['exchange_lag_ms'] = exchange_lag_ms(trace)
+                message = self.topic.serialize(key=item.key, value=value)
+                self.producer.produce(
+                    topic=self.topic.name,
+                    value=message.value,
+                    key=message.key,
+                    headers=to_headers(trace),
+                )
+                MESSAGES_PRODUCED.inc(topic=self.topic.name)
+                if self.latest_index is not None:
+                    self._index_latest(value)
+
+        self.producer.flush()
+        if items:
+            self.history.save(self.state_path)
+
+    def _index_latest(self, value: dict):
+        self.latest_index.update(value)
+        message = self.latest_topic.serialize(
+            key=self.latest_index.slot_key(value), value=value
+        )
+        self.producer.produce(
+            topic=self.latest_topic.name, value=message.value, key=message.key
+        )
+        MESSAGES_PRODUCED.inc(topic=self.latest_topic.name)
@@ -1,6 +1,17 @@
+from typing import Optional
+
+from observability import REGISTRY, Gauge
 from quixstreams import State
 
-from technical_indicators.config import settings
+from technical_indicators.config import get_settings
+
+CANDLES_IN_STATE = REGISTRY.register(
+    Gauge(
+        'state_candles',
+        'Candles kept in state to compute the indicators, per symbol.',
+        label_names=('symbol',),
+    )
+)
 
 
 def is_same_window(candle: dict, last_candle: dict) -> bool:
@@ -18,30 +29,50 @@ def is_same_window(candle: dict, last_candle: dict) -> bool:
     )
 
 
-def update_candle_state(candle: dict, state: State):
+def update_candle_state(
+    candle: dict, state: State, max_candles: Optional[int] = None
+) -> Optional[dict]:
     """
     Updates the state with the new candle.
 
+    A candle of an older window than the last one, i.e. a late update from the
+    candles service, replaces its window in the state, or is dropped if the
+    window is no longer in it.
+
     Args:
         candle (dict): The new candle to update the state with.
         state (State): The state to update.
+        max_candles (Optional[int]): The number of candles to keep. Defaults to
+            the `max_candles` setting.
 
     Returns:
-        updated_state (dict): The updated state.
+        Optional[dict]: The candle if it is of the latest window, to compute the
+            indicators for, or None if it only updated an older window.
     """
     candles = state.get('candles', default=[])
 
-    # check if new candle corresponds to the same window as the state
-    if not candles:
+    if not candles or candle['window_start_ms'] > candles[-1]['window_start_ms']:
         candles.append(candle)
-    elif is_same_window(candle, candles[-1]):
-        candles[-1] = candle
     else:
-        candles.append(candle)
+        # Most often an update of the last window, so search from the end.
+        i = next(
+            (
+                i
+                for i in range(len(candles) - 1, -1, -1)
+                if is_same_window(candle, candles[i])
+            ),
+            None,
+        )
+        if i is None:
+            return None
+        candles[i] = candle
 
-    if len(candles) > settings.max_candles:
+    if max_candles is None:
+        max_candles = get_settings().max_candles
+    if len(candles) > max_candles:
         candles.pop(0)
 
     state.set('candles', candles)
+    CANDLES_IN_STATE.set(len(candles), symbol=candle['symbol'])
 
-    return candle
+    return candle if candle is candles[-1] else None
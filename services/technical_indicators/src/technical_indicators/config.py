@@ -1,3 +1,7 @@
+from functools import lru_cache
+from typing import Literal, Optional
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -15,5 +19,53 @@ class Settings(BaseSettings):
 
     risingwave_table_name: str
 
+    # Run the candles service in the same application, consuming trades from
+    # `kafka_trades_topic` instead of candles from `kafka_input_topic`.
+    fused_mode: bool = False
+    kafka_trades_topic: Optional[str] = None
+    # Whether the fused application still publishes candles to `kafka_input_topic`.
+    publish_candles: bool = True
+    # The window settings of the candles service, in fused mode.
+    allowed_lateness_sec: float = 0.0
+    window_closing_strategy: Literal['key', 'partition'] = 'key'
+
+    # Compute the indicators of the candles of all symbols consumed in
+    # `batch_interval_sec`, or up to `batch_max_messages` of them, at once.
+    # The candle history is kept in a file under the state directory, without a
+    # changelog topic, so run a single replica with a persistent volume.
+    batch_mode: bool = False
+    batch_interval_sec: float = 0.5
+    batch_max_messages: int = 1000
+
+    # Serve the last `latest_rows` indicators of every symbol on `latest_port`,
+    # and keep them in the compacted `kafka_latest_topic` to rebuild them from.
+    latest_port: Optional[int] = None
+    latest_rows: int = 10
+    kafka_latest_topic: Optional[str] = None
+
+    # Whether to add the time since the trade on the exchange to the output.
+    latency_column: bool = False
+    # The port to serve metrics on, disabled when not set.
+    metrics_port: Optional[int] = None
+    # Profile for `profile_duration_sec` on SIGUSR1, or right away.
+    profile_dir: str = 'profiles'
+    profile_duration_sec: float = 30.0
+    profile_on_start: bool = False
+
+    @model_validator(mode='after')
+    def check_fused_mode(self) -> 'Settings':
+        if self.fused_mode and self.kafka_trades_topic is None:
+            raise ValueError('kafka_trades_topic is required in fused mode')
+        if self.fused_mode and self.batch_mode:
+            raise ValueError('fused mode and batch mode cannot be used together')
+        if self.latest_port is not None and self.kafka_latest_topic is None:
+            raise ValueError('kafka_latest_topic is required to serve the latest rows')
+        return self
+
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Get the settings of the technical indicators service, loaded on first use.
+    """
+    return Settings()
@@ -0,0 +1,207 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from confluent_kafka import OFFSET_BEGINNING, TopicPartition
+from loguru import logger
+from quixstreams import Application
+from quixstreams.models import Topic, TopicConfig
+from quixstreams.utils.json import dumps, loads
+
+Key = tuple[str, int]
+
+# Only the latest message of every key is kept by the broker.
+COMPACTED_TOPIC_CONFIG = TopicConfig(
+    num_partitions=1,
+    replication_factor=1,
+    extra_config={'cleanup.policy': 'compact'},
+)
+
+
+class LatestIndicatorsIndex:
+    def __init__(self, num_rows: int):
+        """
+        The last `num_rows` technical indicators of every (symbol, candle_duration),
+        to be queried without going through RisingWave.
+
+        The rows of a key are replaced as a whole on every update, with their
+        JSON encoding cached on first read, so lookups from the server threads
+        never wait on the stream. They are encoded like the messages of the
+        compacted topic, with the indicators still warming up as null instead
+        of NaN, so the rows served are the same before and after a rebuild.
+
+        Args:
+            num_rows: The number of rows to keep per key.
+        """
+        self.num_rows = num_rows
+        self._rows: dict[Key, tuple[dict, ...]] = {}
+        self._encoded: dict[Key, bytes] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def update(self, row: dict):
+        """
+        Add a row of technical indicators, replacing the row of the same window.
+        """
+        key = (row['symbol'], int(row['candle_duration']))
+        with self._lock:
+            rows = [
+                r
+                for r in self._rows.get(key, ())
+                if r['window_start_ms'] != row['window_start_ms']
+            ]
+            rows.append(row)
+            rows.sort(key=lambda r: r['window_start_ms'])
+            self._rows[key] = tuple(rows[-self.num_rows :])
+            self._encoded.pop(key, None)
+
+    def get(self, symbol: str, candle_duration: int) -> list[dict]:
+        """
+        Get the rows of a key, oldest first.
+        """
+        return list(self._rows.get((symbol, candle_duration), ()))
+
+    def get_encoded(self, symbol: str, candle_duration: int) -> Optional[bytes]:
+        """
+        Get the rows of a key as a JSON array, or None if there are none.
+        """
+        key = (symbol, candle_duration)
+        encoded = self._encoded.get(key)
+        if encoded is not None:
+            return encoded
+        with self._lock:
+            rows = self._rows.get(key)
+            if rows is None:
+                return None
+            encoded = dumps(rows)
+            self._encoded[key] = encoded
+        return encoded
+
+    def symbols(self, candle_duration: int) -> list[str]:
+        return sorted(s for s, d in list(self._rows) if d == candle_duration)
+
+    def slot_key(self, row: dict) -> str:
+        """
+        The key of a row in the compacted topic. The windows of a symbol take
+        turns over `num_rows` keys, so compaction keeps exactly the last ones.
+        """
+        duration_ms = int(row['candle_duration']) * 1000
+        slot = (row['window_start_ms'] // duration_ms) % self.num_rows
+        return f'{row["symbol"]}:{row["candle_duration"]}:{slot}'
+
+    def rebuild(self, app: Application, topic: Topic, timeout_sec: float = 10.0):
+        """
+        Load the rows of the compacted topic, from the beginning to its current end.
+
+        Args:
+            app: The application, to create the consumer with.
+            topic: The compacted topic.
+            timeout_sec: How long to wait for the metadata of the topic.
+        """
+        with app.get_consumer(auto_commit_enable=False) as consumer:
+            metadata = consumer.list_topics(topic.name, timeout=timeout_sec)
+            topic_metadata = metadata.topics.get(topic.name)
+            if topic_metadata is None or topic_metadata.error is not None:
+                logger.info(f'No topic {topic.name} to rebuild the index from')
+                return
+
+            # The offset to read up to, per partition that is not empty.
+            end_offsets = {}
+            for partition in topic_metadata.partitions:
+                low, high = consumer.get_watermark_offsets(
+                    TopicPartition(topic.name, partition), timeout=timeout_sec
+                )
+                if high > low:
+                    end_offsets[partition] = high
+            if not end_offsets:
+                return
+
+            consumer.assign(
+                [
+                    TopicPartition(topic.name, partition, OFFSET_BEGINNING)
+                    for partition in end_offsets
+                ]
+            )
+            num_messages = 0
+            while end_offsets:
+                message = consumer.poll(timeout=timeout_sec)
+                if message is None:
+                    logger.warning(f'Timed out rebuilding the index from {topic.name}')
+                    break
+                if message.error() is not None:
+                    logger.error(f'Error rebuilding the index: {message.error()}')
+                    continue
+                if message.value() is not None:
+                    self.update(loads(message.value()))
+                    num_messages += 1
+                if message.offset() + 1 >= end_offsets.get(message.partition(), 0):
+                    end_offsets.pop(message.partition(), None)
+
+        logger.info(
+            f'Rebuilt the index of {len(self)} keys from {num_messages} messages'
+        )
+
+
+def start_latest_server(
+    index: LatestIndicatorsIndex, port: int, host: str = '0.0.0.0'
+) -> ThreadingHTTPServer:
+    """
+    Serve the index from a daemon thread on
+    `http://<host>:<port>/latest?candle_duration=<seconds>&symbol=<symbol>`.
+
+    The response maps every symbol to its rows, oldest first. The `symbol`
+    parameter can be repeated to fetch several symbols at once, and all the
+    symbols of the candle duration are returned when it is left out.
+
+    Args:
+        index: The index to serve.
+        port: The port to listen on.
+        host: The address to listen on.
+
+    Returns:
+        The server, which can be stopped with `shutdown`.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep connections open between requests, and send the headers and
+        # the body without waiting for the ACK of the previous segment.
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path != '/latest':
+                self.send_error(404)
+                return
+            params = parse_qs(url.query)
+            try:
+                candle_duration = int(params['candle_duration'][0])
+            except (KeyError, ValueError):
+                self.send_error(400, 'candle_duration is required')
+                return
+
+            symbols = params.get('symbol') or index.symbols(candle_duration)
+            # The rows are already encoded, so they are only joined together.
+            entries = []
+            for symbol in symbols:
+                encoded = index.get_encoded(symbol, candle_duration)
+                if encoded is not None:
+                    entries.append(dumps(symbol) + b':' + encoded)
+            body = b'{' + b','.join(entries) + b'}'
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f'Serving the latest indicators on http://{host}:{port}/latest')
+    return server
@@ -1,8 +1,138 @@
+import os
+from typing import Any, Optional
+
 from loguru import logger
+from observability import start_metrics_server
+from observability.profiling import install_profiler, timed
+from observability.streaming import StreamMetrics
+from observability.tracing import (
+    INDICATOR_EMITTED,
+    exchange_lag_ms,
+    from_headers,
+    stamp,
+    to_headers,
+)
 from quixstreams import Application
+from quixstreams.dataframe import StreamingDataFrame
+from quixstreams.models import Topic
 
 from technical_indicators.candle import update_candle_state
 from technical_indicators.indicators import compute_technical_indicators
+from technical_indicators.latest import (
+    COMPACTED_TOPIC_CONFIG,
+    LatestIndicatorsIndex,
+    start_latest_server,
+)
+
+
+def trace_indicators(
+    value: dict, key: Any, timestamp: int, headers: Optional[list[tuple[str, Any]]]
+) -> list[tuple[str, bytes]]:
+    """
+    Add the emit time of the indicators to the timing headers of the candle.
+    """
+    return to_headers(stamp(from_headers(headers), INDICATOR_EMITTED))
+
+
+def add_exchange_lag(
+    value: dict, key: Any, timestamp: int, headers: Optional[list[tuple[str, Any]]]
+) -> dict:
+    """
+    Add the time between the latest trade on the exchange and the indicators
+    to the output, so that it can be queried next to them.
+    """
+    return {**value, 'exchange_lag_ms': exchange_lag_ms(from_headers(headers))}
+
+
+def index_latest_indicators(
+    app: Application, kafka_latest_topic: str, latest_port: int, latest_rows: int
+) -> tuple[LatestIndicatorsIndex, Topic]:
+    """
+    Rebuilds the index of the last `latest_rows` technical indicators of every
+    symbol from the compacted 'kafka_latest_topic' topic, and serves it on
+    `latest_port`.
+
+    Args:
+        app (Application): The application.
+        kafka_latest_topic (str): The compacted topic to keep the rows in.
+        latest_port (int): The port to serve the rows on.
+        latest_rows (int): The number of rows to keep per symbol.
+
+    Returns:
+        tuple[LatestIndicatorsIndex, Topic]: The index and the compacted topic,
+            which the new rows are to be added to.
+    """
+    index = LatestIndicatorsIndex(latest_rows)
+    latest_topic = app.topic(
+        kafka_latest_topic, value_serializer='json', config=COMPACTED_TOPIC_CONFIG
+    )
+    index.rebuild(app, latest_topic)
+    start_latest_server(index, latest_port)
+    return index, latest_topic
+
+
+def serve_latest_indicators(
+    app: Application,
+    sdf: StreamingDataFrame,
+    kafka_latest_topic: str,
+    latest_port: int,
+    latest_rows: int,
+) -> StreamingDataFrame:
+    """
+    Serves the last `latest_rows` technical indicators of every symbol on
+    `latest_port`, see `index_latest_indicators`.
+
+    Args:
+        app (Application): The application.
+        sdf (StreamingDataFrame): The dataframe of technical indicators.
+        kafka_latest_topic (str): The compacted topic to keep the rows in.
+        latest_port (int): The port to serve the rows on.
+        latest_rows (int): The number of rows to keep per symbol.
+
+    Returns:
+        StreamingDataFrame: The dataframe of technical indicators.
+    """
+    index, latest_topic = index_latest_indicators(
+        app, kafka_latest_topic, latest_port, latest_rows
+    )
+    sdf = sdf.update(index.update)
+    sdf = sdf.to_topic(latest_topic, key=index.slot_key)
+    return sdf
+
+
+def technical_indicators_from_candles(
+    sdf: StreamingDataFrame, candle_duration: int, latency_column: bool = False
+) -> StreamingDataFrame:
+    """
+    Computes the technical indicators over a dataframe of candles.
+
+    Args:
+        sdf (StreamingDataFrame): The dataframe of candles, keyed by symbol.
+        candle_duration (int): The duration of the candles in seconds.
+        latency_column (bool): Whether to add the `exchange_lag_ms` column.
+
+    Returns:
+        StreamingDataFrame: The dataframe of candles with technical indicators.
+    """
+    # filter the candles by the candle duration
+    sdf = sdf[sdf['candle_duration'] == candle_duration]
+
+    # Add candles to a state dictionary
+    sdf = sdf.apply(timed('update_candle_state')(update_candle_state), stateful=True)
+    # Late updates of older windows only update the state.
+    sdf = sdf.filter(lambda candle: candle is not None)
+
+    # TODO: Compute the technical indicators
+    sdf = sdf.apply(
+        timed('compute_technical_indicators')(compute_technical_indicators),
+        stateful=True,
+    )
+
+    sdf = sdf.set_headers(trace_indicators)
+    if latency_column:
+        sdf = sdf.apply(add_exchange_lag, metadata=True)
+
+    return sdf
 
 
 def run(
@@ -11,6 +141,11 @@ def run(
     kafka_output_topic: str,
     kafka_consumer_group: str,
     candle_duration: int,
+    latency_column: bool = False,
+    metrics_port: Optional[int] = None,
+    kafka_latest_topic: Optional[str] = None,
+    latest_port: Optional[int] = None,
+    latest_rows: int = 10,
 ):
     """
     Transforms a stream of input candles into a stream of technical indicators.
@@ -25,38 +160,248 @@ def run(
         kafka_output_topic (str): The topic to produce technical indicators to.
         candle_duration (int): The duration of the candles in seconds.
         kafka_consumer_group (str): The consumer group to use for the application.
+        latency_column (bool): Whether to add the `exchange_lag_ms` column.
+        metrics_port (Optional[int]): The port to serve metrics on.
+        kafka_latest_topic (Optional[str]): The compacted topic to keep the
+            latest indicators in, required with `latest_port`.
+        latest_port (Optional[int]): The port to serve the latest indicators on.
+            They are not served when not given.
+        latest_rows (int): The number of latest indicators to serve per symbol.
     """
+    if metrics_port is not None:
+        start_metrics_server(metrics_port)
+
+    metrics = StreamMetrics()
     app = Application(
         broker_address=kafka_broker_address,
         consumer_group=kafka_consumer_group,
+        on_message_processed=metrics.on_message_processed,
     )
+    metrics.watch(app)
 
     candles_topic = app.topic(kafka_input_topic, value_deserializer='json')
     technical_indicators_topic = app.topic(kafka_output_topic, value_serializer='json')
 
     # Create a dataframe to ingest candles from the candles topic
     sdf = app.dataframe(topic=candles_topic)
+    sdf = sdf.update(metrics.on_message_received, metadata=True)
+    sdf = technical_indicators_from_candles(sdf, candle_duration, latency_column)
 
-    # filter the candles by the candle duration
-    sdf = sdf[sdf['candle_duration'] == candle_duration]
+    sdf = sdf.update(lambda value: logger.debug(f'Final Candle: {value}'))
 
-    # Add candles to a state dictionary
-    sdf = sdf.apply(update_candle_state, stateful=True)
+    if latest_port is not None:
+        sdf = serve_latest_indicators(
+            app, sdf, kafka_latest_topic, latest_port, latest_rows
+        )
 
-    # TODO: Compute the technical indicators
-    sdf = sdf.apply(compute_technical_indicators, stateful=True)
+    # Write the transformed dataframe to the technical indicators topic.
+    sdf = sdf.to_topic(technical_indicators_topic)
+    sdf = sdf.update(metrics.count_produced(technical_indicators_topic.name))
+
+    # Run the application.
+    app.run()
+
+
+def run_batched(
+    kafka_broker_address: str,
+    kafka_input_topic: str,
+    kafka_output_topic: str,
+    kafka_consumer_group: str,
+    candle_duration: int,
+    max_candles: int,
+    batch_interval_sec: float,
+    batch_max_messages: int,
+    latency_column: bool = False,
+    metrics_port: Optional[int] = None,
+    kafka_latest_topic: Optional[str] = None,
+    latest_port: Optional[int] = None,
+    latest_rows: int = 10,
+):
+    """
+    Transforms a stream of input candles into a stream of technical indicators,
+    in micro-batches across symbols.
+
+    The candles consumed in `batch_interval_sec`, or up to `batch_max_messages`
+    of them, are added to a (symbols x candles) history and their indicators
+    computed with one set of NumPy operations, instead of one state round trip
+    and talib call per candle. See `TechnicalIndicatorsSink`.
+
+    The history is saved to a file under the state directory of the application,
+    which is not backed by a changelog topic: run a single replica, with the
+    state directory on a persistent volume.
+
+    Args:
+        kafka_broker_address (str): The address of the Kafka broker.
+        kafka_input_topic (str): The topic to ingest candles from.
+        kafka_output_topic (str): The topic to produce technical indicators to.
+        kafka_consumer_group (str): The consumer group to use for the application.
+        candle_duration (int): The duration of the candles in seconds.
+        max_candles (int): The number of candles to keep per symbol.
+        batch_interval_sec (float): The longest time to collect a batch for.
+        batch_max_messages (int): The most candles in a batch.
+        latency_column (bool): Whether to add the `exchange_lag_ms` column.
+        metrics_port (Optional[int]): The port to serve metrics on.
+        kafka_latest_topic (Optional[str]): The compacted topic to keep the
+            latest indicators in, required with `latest_port`.
+        latest_port (Optional[int]): The port to serve the latest indicators on.
+            They are not served when not given.
+        latest_rows (int): The number of latest indicators to serve per symbol.
+    """
+    from technical_indicators.batch import TechnicalIndicatorsSink
+
+    if metrics_port is not None:
+        start_metrics_server(metrics_port)
+
+    metrics = StreamMetrics()
+    # A batch is the messages processed between two checkpoints.
+    app = Application(
+        broker_address=kafka_broker_address,
+        consumer_group=kafka_consumer_group,
+        commit_interval=batch_interval_sec,
+        commit_every=batch_max_messages,
+        on_message_processed=metrics.on_message_processed,
+    )
+    metrics.watch(app)
+
+    candles_topic = app.topic(kafka_input_topic, value_deserializer='json')
+    technical_indicators_topic = app.topic(kafka_output_topic, value_serializer='json')
+
+    state_dir = os.path.join(app.config.state_dir, app.config.consumer_group)
+    os.makedirs(state_dir, exist_ok=True)
+
+    latest_index = latest_topic = None
+    if latest_port is not None:
+        latest_index, latest_topic = index_latest_indicators(
+            app, kafka_latest_topic, latest_port, latest_rows
+        )
+
+    with app.get_producer() as producer:
+        sink = TechnicalIndicatorsSink(
+            producer=producer,
+            topic=technical_indicators_topic,
+            candle_duration=candle_duration,
+            max_candles=max_candles,
+            state_path=os.path.join(state_dir, 'candle_history.npz'),
+            latency_column=latency_column,
+            latest_index=latest_index,
+            latest_topic=latest_topic,
+        )
+
+        sdf = app.dataframe(topic=candles_topic)
+        sdf = sdf.update(metrics.on_message_received, metadata=True)
+        sdf.sink(sink)
+
+        # Run the application.
+        app.run()
+
+
+def run_fused(
+    kafka_broker_address: str,
+    kafka_trades_topic: str,
+    kafka_output_topic: str,
+    kafka_consumer_group: str,
+    candle_duration: int,
+    kafka_candles_topic: Optional[str] = None,
+    allowed_lateness_ms: int = 0,
+    closing_strategy: str = 'key',
+    latency_column: bool = False,
+    metrics_port: Optional[int] = None,
+    kafka_latest_topic: Optional[str] = None,
+    latest_port: Optional[int] = None,
+    latest_rows: int = 10,
+):
+    """
+    Transforms a stream of input trades into a stream of technical indicators,
+    running the candles service in the same application.
+
+    Candles are passed to the indicator steps in memory instead of through the
+    broker, which saves a serialization round and two network hops per update.
+
+    - Ingests trades from the 'kafka_trades_topic' topic.
+    - Aggregates trades into candles of a fixed duration (in seconds).
+    - Aggregates candles into technical indicators.
+    - Produces technical indicators to the 'kafka_output_topic' topic.
+    - Optionally produces candles to the 'kafka_candles_topic' topic for other
+      consumers. The producer buffers these messages and sends them in the
+      background, so the indicator steps do not wait on the broker.
+
+    Args:
+        kafka_broker_address (str): The address of the Kafka broker.
+        kafka_trades_topic (str): The topic to ingest trades from.
+        kafka_output_topic (str): The topic to produce technical indicators to.
+        kafka_consumer_group (str): The consumer group to use for the application.
+        candle_duration (int): The duration of the candles in seconds.
+        kafka_candles_topic (Optional[str]): The topic to produce candles to.
+            Candles are not published when not given.
+        allowed_lateness_ms (int): How long after its end a candle window still
+            accepts trades.
+        closing_strategy (str): Whether the candle windows are closed per symbol
+            ('key') or per partition ('partition').
+        latency_column (bool): Whether to add the `exchange_lag_ms` column.
+        metrics_port (Optional[int]): The port to serve metrics on.
+        kafka_latest_topic (Optional[str]): The compacted topic to keep the
+            latest indicators in, required with `latest_port`.
+        latest_port (Optional[int]): The port to serve the latest indicators on.
+            They are not served when not given.
+        latest_rows (int): The number of latest indicators to serve per symbol.
+    """
+    from candles.main import candles_from_trades, timestamp_extractor
+
+    if metrics_port is not None:
+        start_metrics_server(metrics_port)
+
+    metrics = StreamMetrics()
+    app = Application(
+        broker_address=kafka_broker_address,
+        consumer_group=kafka_consumer_group,
+        on_message_processed=metrics.on_message_processed,
+    )
+    metrics.watch(app)
+
+    trades_topic = app.topic(
+        kafka_trades_topic,
+        value_deserializer='json',
+        timestamp_extractor=timestamp_extractor,
+    )
+    technical_indicators_topic = app.topic(kafka_output_topic, value_serializer='json')
+
+    # Create a dataframe to ingest trades from the trades topic
+    sdf = app.dataframe(topic=trades_topic)
+    sdf = sdf.update(metrics.on_message_received, metadata=True)
+    sdf = candles_from_trades(
+        sdf, candle_duration, allowed_lateness_ms, closing_strategy
+    )
+
+    if kafka_candles_topic is not None:
+        candles_topic = app.topic(kafka_candles_topic, value_serializer='json')
+        sdf = sdf.to_topic(candles_topic)
+        sdf = sdf.update(metrics.count_produced(candles_topic.name))
+
+    sdf = technical_indicators_from_candles(sdf, candle_duration, latency_column)
 
     sdf = sdf.update(lambda value: logger.debug(f'Final Candle: {value}'))
 
+    if latest_port is not None:
+        sdf = serve_latest_indicators(
+            app, sdf, kafka_latest_topic, latest_port, latest_rows
+        )
+
     # Write the transformed dataframe to the technical indicators topic.
     sdf = sdf.to_topic(technical_indicators_topic)
+    sdf = sdf.update(metrics.count_produced(technical_indicators_topic.name))
 
     # Run the application.
     app.run()
 
 
 if __name__ == '__main__':
-    from technical_indicators.config import settings
+    from technical_indicators.config import get_settings
+
+    settings = get_settings()
+
+    install_profiler(
+        settings.profile_dir, settings.profile_duration_sec, settings.profile_on_start
+    )
 
     # TODO: Use a dedicated migration tool for this, e.g. when there are multiple tables to manage.
     # from technical_indicators.risingwave import create_table
@@ -67,10 +412,52 @@ if __name__ == '__main__':
     #     kafka_broker_address=settings.kafka_broker_address,
     # )
 
-    run(
-        kafka_broker_address=settings.kafka_broker_address,
-        kafka_input_topic=settings.kafka_input_topic,
-        kafka_output_topic=settings.kafka_output_topic,
-        kafka_consumer_group=settings.kafka_consumer_group,
-        candle_duration=settings.candle_duration,
-    )
+    if settings.fused_mode:
+        logger.info('Running candles and technical indicators in one application')
+        run_fused(
+            kafka_broker_address=settings.kafka_broker_address,
+            kafka_trades_topic=settings.kafka_trades_topic,
+            kafka_output_topic=settings.kafka_output_topic,
+            kafka_consumer_group=settings.kafka_consumer_group,
+            candle_duration=settings.candle_duration,
+            allowed_lateness_ms=int(settings.allowed_lateness_sec * 1000),
+            closing_strategy=settings.window_closing_strategy,
+            latency_column=settings.latency_column,
+            metrics_port=settings.metrics_port,
+            kafka_latest_topic=settings.kafka_latest_topic,
+            latest_port=settings.latest_port,
+            latest_rows=settings.latest_rows,
+            kafka_candles_topic=settings.kafka_input_topic
+            if settings.publish_candles
+            else None,
+        )
+    elif settings.batch_mode:
+        logger.info('Computing the technical indicators in micro-batches')
+        run_batched(
+            kafka_broker_address=settings.kafka_broker_address,
+            kafka_input_topic=settings.kafka_input_topic,
+            kafka_output_topic=settings.kafka_output_topic,
+            kafka_consumer_group=settings.kafka_consumer_group,
+            candle_duration=settings.candle_duration,
+            max_candles=settings.max_candles,
+            batch_interval_sec=settings.batch_interval_sec,
+            batch_max_messages=settings.batch_max_messages,
+            latency_column=settings.latency_column,
+            metrics_port=settings.metrics_port,
+            kafka_latest_topic=settings.kafka_latest_topic,
+            latest_port=settings.latest_port,
+            latest_rows=settings.latest_rows,
+        )
+    else:
+        run(
+            kafka_broker_address=settings.kafka_broker_address,
+            kafka_input_topic=settings.kafka_input_topic,
+            kafka_output_topic=settings.kafka_output_topic,
+            kafka_consumer_group=settings.kafka_consumer_group,
+            candle_duration=settings.candle_duration,
+            latency_column=settings.latency_column,
+            metrics_port=settings.metrics_port,
+            kafka_latest_topic=settings.kafka_latest_topic,
+            latest_port=settings.latest_port,
+            latest_rows=settings.latest_rows,
+        )
@@ -0,0 +1,125 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import pytest
+from quixstreams.utils.json import dumps, loads
+from technical_indicators.batch import (
+    CandleHistory,
+    TechnicalIndicatorsSink,
+    compute_technical_indicators_batch,
+)
+
+MAX_CANDLES = 70
+
+
+def make_candles(symbol: str, num_candles: int, seed: int) -> list[dict]:
+    """
+    Consecutive one-minute candles, with Python floats as they are deserialized.
+    """
+    rng = np.random.default_rng(seed)
+    closing_price = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 1e-2, num_candles)))
+    volume = rng.lognormal(size=num_candles)
+    return [
+        {
+            'symbol': symbol,
+            'window_start_ms': i * 60_000,
+            'window_end_ms': (i + 1) * 60_000,
+            'opening_price': price,
+            'high_price': price,
+            'low_price': price,
+            'closing_price': price,
+            'volume': volume,
+        }
+        for i, (price, volume) in enumerate(
+            zip(closing_price.tolist(), volume.tolist(), strict=True)
+        )
+    ]
+
+
+def replay(candles_per_symbol: list[list[dict]]) -> CandleHistory:
+    """
+    Add the candles to a history, one window of every symbol at a time.
+    """
+    history = CandleHistory(MAX_CANDLES, capacity=2)
+    num_windows = max(len(candles) for candles in candles_per_symbol)
+    for i in range(num_windows):
+        history.update(
+            [candles[i] for candles in candles_per_symbol if i < len(candles)]
+        )
+    return history
+
+
+@pytest.mark.parametrize('num_candles', [1, 7, 8, 29, 30, 61, 100])
+def test_batch_indicators_match_talib(num_candles):
+    pytest.importorskip('talib')
+    from technical_indicators.indicators import compute_technical_indicators
+
+    candles_per_symbol = [
+        make_candles('BTC/USD', num_candles, seed=0),
+        make_candles('ETH/USD', 100, seed=1),
+        make_candles('SOL/USD', 5, seed=2),
+    ]
+    history = replay(candles_per_symbol)
+
+    batch = compute_technical_indicators_batch(
+        history.closing_prices, history.volume, history.lengths
+    )
+
+    for row, candles in enumerate(candles_per_symbol):
+        expected = compute_technical_indicators(
+            candles[-1], {'candles': candles[-MAX_CANDLES:]}
+        )
+        for name, values in batch.items():
+            np.testing.assert_allclose(
+                values[row], expected[name], rtol=1e-9, atol=1e-9, err_msg=name
+            )
+
+
+def test_replaying_a_batch_does_not_duplicate_windows():
+    candles = make_candles('BTC/USD', 100, seed=0)
+    history = replay([candles])
+    closing_prices = history.closing_prices.copy()
+
+    # A restart between saving the history and committing the offsets.
+    for candle in candles[-10:]:
+        latest, rows = history.update([candle])
+
+    np.testing.assert_array_equal(history.closing_prices, closing_prices)
+    assert history.lengths[0] == MAX_CANDLES
+    window_start_ms = history.window_start_ms[0]
+    assert len(np.unique(window_start_ms)) == MAX_CANDLES
+    # Only the replayed latest window gets its indicators computed again.
+    assert latest.tolist() == [0] and rows.tolist() == [0]
+
+
+def test_sink_produces_serializable_indicators(tmp_path):
+    topic = mock.Mock()
+    topic.name = 'technical_indicators'
+    # Serialize like the JSON serializer of the topic, which rejects NumPy scalars.
+    topic.serialize.side_effect = lambda key, value: SimpleNamespace(
+        key=key, value=dumps(value)
+    )
+    producer = mock.Mock()
+    sink = TechnicalIndicatorsSink(
+        producer,
+        topic,
+        candle_duration=60,
+        max_candles=MAX_CANDLES,
+        state_path=str(tmp_path / 'history.npz'),
+    )
+
+    sink.write(
+        [
+            SimpleNamespace(
+                key=candle['symbol'],
+                value={**candle, 'candle_duration': 60},
+                headers=None,
+            )
+            for candle in make_candles('BTC/USD', 100, seed=0)
+        ]
+    )
+
+    assert producer.produce.call_count == 100
+    value = loads(producer.produce.call_args.kwargs['value'])
+    assert np.isfinite(value['close_prices_macd_7_hist'])
@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -18,6 +21,33 @@ class Settings(BaseSettings):
     kafka_topic: str
     historical_data: bool = False
     since_days: int = 30
+    # Backfill `since_days` of trades of every symbol before switching to
+    # real-time data, instead of one or the other.
+    backfill_to_live: bool = False
+    # The real-time trades held while backfilling, and how long the backfilled
+    # trades are remembered to deduplicate them.
+    max_buffered_trades: int = 100_000
+    dedup_window_sec: float = 60.0
+    # The topic to produce order book snapshots to, the books are not ingested
+    # when not set.
+    kafka_book_topic: Optional[str] = None
+    # The depth of the book subscription: 10, 25, 100, 500 or 1000.
+    book_depth: int = 25
+    # The number of levels the depth and imbalance of a snapshot cover.
+    book_levels: int = 10
+    # The minimum time between two snapshots of a symbol.
+    book_snapshot_interval_ms: int = 1000
+    # The port to serve metrics on, disabled when not set.
+    metrics_port: Optional[int] = None
+    # Profile for `profile_duration_sec` on SIGUSR1, or right away.
+    profile_dir: str = 'profiles'
+    profile_duration_sec: float = 30.0
+    profile_on_start: bool = False
 
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Get the settings of the trades service, loaded on first use.
+    """
+    return Settings()
@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Hashable, Optional
+
+from loguru import logger
+
+from trades.kraken_rest_api import KrakenRestAPI
+from trades.kraken_websocket_api import KrakenWebsocketAPI
+from trades.order_book import BookSnapshot
+from trades.trade import Trade
+
+
+def get_trade_key(trade: Trade) -> Hashable:
+    if trade.trade_id is not None:
+        return trade.trade_id
+    return (trade.timestamp_ms, trade.price, trade.quantity)
+
+
+class TradeDeduplicator:
+    def __init__(self, window_sec: float, bucket_sec: float = 1.0):
+        """
+        A hash set of the trades of one symbol, bucketed by time, that only
+        remembers the trades of the last `window_sec` before the newest one.
+        Whole buckets are dropped as time moves on, so the memory is bounded by
+        the number of trades in the window.
+
+        Args:
+            window_sec: How far behind the newest trade trades are remembered.
+            bucket_sec: The time span of a bucket.
+        """
+        self.window_ms = int(window_sec * 1000)
+        self.bucket_ms = int(bucket_sec * 1000)
+        self._buckets: dict[int, set[Hashable]] = {}
+        self.newest_ms: Optional[int] = None
+
+    @property
+    def horizon_ms(self) -> Optional[int]:
+        """
+        The time before which trades are no longer remembered.
+        """
+        return None if self.newest_ms is None else self.newest_ms - self.window_ms
+
+    def add(self, trade: Trade):
+        self._buckets.setdefault(trade.timestamp_ms // self.bucket_ms, set()).add(
+            get_trade_key(trade)
+        )
+        if self.newest_ms is None or trade.timestamp_ms > self.newest_ms:
+            self.newest_ms = trade.timestamp_ms
+            oldest_bucket = self.horizon_ms // self.bucket_ms
+            for bucket in [b for b in self._buckets if b < oldest_bucket]:
+                del self._buckets[bucket]
+
+    def __contains__(self, trade: Trade) -> bool:
+        bucket = self._buckets.get(trade.timestamp_ms // self.bucket_ms)
+        return bucket is not None and get_trade_key(trade) in bucket
+
+
+class KrakenBackfillAPI:
+    def __init__(
+        self,
+        live: KrakenWebsocketAPI,
+        since_days: int,
+        max_buffered_trades: int = 100_000,
+        dedup_window_sec: float = 60.0,
+        rest_interval_sec: float = 1.0,
+    ):
+        """
+        Backfills the trades of the last `since_days` days from the REST API,
+        then switches to the websocket without a gap or duplicated trades.
+
+        The websocket is read from a background thread from the start, and its
+        trades are buffered while the symbols are backfilled one after the
+        other. The buffer is bounded: when it is full the oldest trades are
+        dropped, and the REST API is polled again for the symbols whose dropped
+        trades it has not returned yet. Once every symbol is caught up, the
+        buffered trades are returned, minus the ones the REST API already
+        returned, which are found by trade id in a `TradeDeduplicator` per
+        symbol.
+
+        Args:
+            live: The websocket API, subscribed to the symbols to backfill.
+            since_days: The number of days to backfill.
+            max_buffered_trades: The maximum number of websocket trades held
+                while backfilling.
+            dedup_window_sec: How long the trades returned by the REST API are
+                remembered to deduplicate the websocket trades.
+            rest_interval_sec: The minimum time between two REST requests, to
+                stay within the rate limits of Kraken.
+        """
+        self.live = live
+        self.max_buffered_trades = max_buffered_trades
+        self.dedup_window_sec = dedup_window_sec
+        self.rest_interval_sec = rest_interval_sec
+
+        self._rest = {
+            symbol: KrakenRestAPI(symbol=symbol, since_days=since_days)
+            for symbol in live.symbols
+        }
+        # The symbols left to backfill, or to poll again.
+        self._pending: deque[str] = deque(live.symbols)
+        self._requested_at = 0.0
+        self._is_live = False
+        self._seen: dict[str, TradeDeduplicator] = {}
+        # The time of the newest trade the REST API returned, per symbol.
+        self._covered_until_ms: dict[str, int] = {}
+        # The time of the newest trade dropped from the buffer, per symbol.
+        self._dropped_until_ms: dict[str, int] = defaultdict(lambda: -1)
+
+        self._buffer: deque[Trade] = deque()
+        self._buffer_changed = threading.Condition()
+        self._error: Optional[Exception] = None
+        self._reader = threading.Thread(
+            target=self._read_live, name='websocket-reader', daemon=True
+        )
+        self._reader.start()
+
+    def is_done(self) -> bool:
+        return False
+
+    def get_trades(self) -> list[Trade]:
+        if self._error is not None:
+            raise self._error
+        if self._is_live:
+            return self._get_live_trades()
+        return self._get_backfill_trades()
+
+    def get_book_snapshots(self) -> list[BookSnapshot]:
+        return self.live.get_book_snapshots()
+
+    def _read_live(self):
+        try:
+            while True:
+                trades = self.live.get_trades()
+                if not trades:
+                    continue
+                with self._buffer_changed:
+                    for trade in trades:
+                        if len(self._buffer) == self.max_buffered_trades:
+                            if self._is_live:
+                                logger.warning('Buffer full, dropping trades')
+                            dropped = self._buffer.popleft()
+                            self._dropped_until_ms[dropped.symbol] = max(
+                                self._dropped_until_ms[dropped.symbol],
+                                dropped.timestamp_ms,
+                            )
+                        self._buffer.append(trade)
+                    self._buffer_changed.notify()
+        except Exception as e:
+            logger.error(f'Error reading the websocket: {e}')
+            self._error = e
+
+    def _get_backfill_trades(self) -> list[Trade]:
+        if not self._pending:
+            self._go_live()
+            return []
+
+        wait_sec = self._requested_at + self.rest_interval_sec - time.monotonic()
+        if wait_sec > 0:
+            time.sleep(wait_sec)
+        self._requested_at = time.monotonic()
+
+        symbol = self._pending[0]
+        rest = self._rest[symbol]
+        trades = rest.get_trades()
+        seen = self._seen.setdefault(symbol, TradeDeduplicator(self.dedup_window_sec))
+        for trade in trades:
+            seen.add(trade)
+            self._covered_until_ms[symbol] = max(
+                self._covered_until_ms.get(symbol, -1), trade.timestamp_ms
+            )
+
+        if rest.is_done():
+            self._pending.popleft()
+            logger.info(f'Backfilled {symbol}')
+
+        return trades
+
+    def _go_live(self):
+        with self._buffer_changed:
+            # Poll again the symbols with dropped trades the REST API did not
+            # return, as they would otherwise be missing.
+            uncovered = [
+                symbol
+                for symbol in self._rest
+                if self._dropped_until_ms[symbol]
+                > self._covered_until_ms.get(symbol, -1)
+            ]
+            if not uncovered:
+                logger.info(
+                    f'Backfill complete, switching to the websocket with '
+                    f'{len(self._buffer)} buffered trades'
+                )
+                self._is_live = True
+                return
+
+        logger.info(f'Trades dropped from the buffer, polling {uncovered} again')
+        for symbol in uncovered:
+            self._rest[symbol].resume()
+        self._pending.extend(uncovered)
+
+    def _get_live_trades(self) -> list[Trade]:
+        with self._buffer_changed:
+            if not self._buffer:
+                self._buffer_changed.wait(timeout=1.0)
+            trades = list(self._buffer)
+            self._buffer.clear()
+
+        return [trade for trade in trades if not self._is_backfilled(trade)]
+
+    def _is_backfilled(self, trade: Trade) -> bool:
+        seen = self._seen.get(trade.symbol)
+        if seen is None or trade.timestamp_ms > self._covered_until_ms.get(
+            trade.symbol, -1
+        ):
+            return False
+        # Trades older than the deduplication window were all returned by the
+        # REST API, and the newer ones are looked up.
+        return trade.timestamp_ms < seen.horizon_ms or trade in seen
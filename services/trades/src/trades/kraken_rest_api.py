@@ -44,7 +44,13 @@ class KrakenRestAPI:
 
         # transform trades to Trade objects
         trades = [
-            Trade.from_rest_api(self.symbol, trade[0], trade[1], trade[2])
+            Trade.from_rest_api(
+                self.symbol,
+                trade[0],
+                trade[1],
+                trade[2],
+                trade_id=trade[6] if len(trade) > 6 else None,
+            )
             for trade in trades
         ]
 
@@ -56,3 +62,9 @@ class KrakenRestAPI:
 
     def is_done(self) -> bool:
         return self._is_done
+
+    def resume(self):
+        """
+        Poll again for the trades since the last one returned.
+        """
+        self._is_done = False
@@ -1,19 +1,63 @@
 import json
+import time
+from datetime import datetime
+from typing import Optional
 
 from loguru import logger
+from observability import REGISTRY, Counter
+from observability.profiling import timed
 from websocket import create_connection
 
+from trades.order_book import BookSnapshot, OrderBook
 from trades.trade import Trade
 
+BOOK_CHECKSUM_MISMATCHES = REGISTRY.register(
+    Counter(
+        'book_checksum_mismatches_total',
+        'Order book updates that failed checksum verification, per symbol.',
+        label_names=('symbol',),
+    )
+)
+
 
 class KrakenWebsocketAPI:
     URL = 'wss://ws.kraken.com/v2'
 
-    def __init__(self, symbols: list[str]):
+    def __init__(
+        self,
+        symbols: list[str],
+        book_depth: Optional[int] = None,
+        book_levels: int = 10,
+        book_snapshot_interval_ms: int = 1000,
+    ):
+        """
+        Streams trades, and optionally the order books, of the given symbols.
+
+        Args:
+            symbols: The symbols to subscribe to.
+            book_depth: The depth to subscribe to the `book` channel with, one of
+                10, 25, 100, 500 or 1000. The order books are not ingested when
+                not set.
+            book_levels: The number of levels the depth and imbalance of the
+                book snapshots are computed over.
+            book_snapshot_interval_ms: The minimum time between two book
+                snapshots of a symbol.
+        """
         self.symbols = symbols
+        self.book_depth = book_depth
+        self.book_levels = book_levels
+        self.book_snapshot_interval_ms = book_snapshot_interval_ms
+
+        self._books: dict[str, OrderBook] = {}
+        # The (price, qty) precisions of the symbols, to verify the checksums.
+        self._precisions: dict[str, tuple[int, int]] = {}
+        self._book_snapshots: list[BookSnapshot] = []
+        self._book_snapshot_at: dict[str, float] = {}
 
         self._ws_client = create_connection(self.URL)
         self._subscribe()
+        if self.book_depth is not None:
+            self._subscribe_book()
 
     def is_done(self) -> bool:
         return False
@@ -31,6 +75,18 @@ class KrakenWebsocketAPI:
             logger.error(f'Error decoding JSON: {e}')
             return []
 
+        channel = data.get('channel')
+        if channel == 'book':
+            self._on_book(data)
+            return []
+        if channel == 'instrument':
+            self._on_instrument(data)
+            return []
+        if 'method' in data:
+            if not data.get('success', True):
+                logger.error(f'Request failed: {data}')
+            return []
+
         try:
             trades_data = data['data']
         except KeyError as e:
@@ -43,6 +99,7 @@ class KrakenWebsocketAPI:
                 price=float(trade['price']),
                 quantity=float(trade['qty']),
                 timestamp=trade['timestamp'],
+                trade_id=trade.get('trade_id'),
             )
             for trade in trades_data
         ]
@@ -67,5 +124,97 @@ class KrakenWebsocketAPI:
             _ = self._ws_client.recv()
             _ = self._ws_client.recv()
 
+    def get_book_snapshots(self) -> list[BookSnapshot]:
+        """
+        Get the book snapshots taken since the last call.
+        """
+        snapshots, self._book_snapshots = self._book_snapshots, []
+        return snapshots
+
+    def _subscribe_book(self):
+        # The instruments give the precisions the book checksums are computed with.
+        self._ws_client.send(
+            json.dumps(
+                {
+                    'method': 'subscribe',
+                    'params': {'channel': 'instrument', 'snapshot': True},
+                }
+            )
+        )
+        self._send_book_request('subscribe', self.symbols)
+
+    def _send_book_request(self, method: str, symbols: list[str]):
+        self._ws_client.send(
+            json.dumps(
+                {
+                    'method': method,
+                    'params': {
+                        'channel': 'book',
+                        'symbol': symbols,
+                        'depth': self.book_depth,
+                    },
+                }
+            )
+        )
+
+    def _on_instrument(self, data: dict):
+        for pair in data['data'].get('pairs', []):
+            if pair['symbol'] not in self.symbols:
+                continue
+            precisions = (pair['price_precision'], pair['qty_precision'])
+            self._precisions[pair['symbol']] = precisions
+            if pair['symbol'] in self._books:
+                book = self._books[pair['symbol']]
+                book.price_precision, book.qty_precision = precisions
+
+    @timed('book_message')
+    def _on_book(self, data: dict):
+        for update in data['data']:
+            symbol = update['symbol']
+            if data['type'] == 'snapshot':
+                book = OrderBook(
+                    symbol, self.book_depth, *self._precisions.get(symbol, (None, None))
+                )
+                self._books[symbol] = book
+                book.apply_snapshot(update['bids'], update['asks'])
+            else:
+                book = self._books.get(symbol)
+                if book is None or not book.is_ready:
+                    # Waiting for the snapshot of a new subscription.
+                    continue
+                book.apply_update(update['bids'], update['asks'])
+
+            if not book.verify(update['checksum']):
+                # The book is out of sync, e.g. after a missed update, so it is
+                # rebuilt from the snapshot of a new subscription.
+                logger.warning(
+                    f'Checksum mismatch for the {symbol} book, resubscribing'
+                )
+                BOOK_CHECKSUM_MISMATCHES.inc(symbol=symbol)
+                book.is_ready = False
+                self._send_book_request('unsubscribe', [symbol])
+                self._send_book_request('subscribe', [symbol])
+                continue
+
+            now = time.monotonic()
+            if (
+                now - self._book_snapshot_at.get(symbol, float('-inf'))
+                < self.book_snapshot_interval_ms / 1000
+            ):
+                continue
+            snapshot = book.snapshot(
+                self.book_levels,
+                timestamp_ms=_to_timestamp_ms(update['timestamp'])
+                if 'timestamp' in update
+                else int(time.time() * 1000),
+            )
+            if snapshot is not None:
+                self._book_snapshots.append(snapshot)
+                self._book_snapshot_at[symbol] = now
+
     def _on_message(self, message):
         pass
+
+
+def _to_timestamp_ms(timestamp: str) -> int:
+    return int(datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%fZ').timestamp() * 1000)
@@ -1,7 +1,15 @@
+import time
+from typing import Optional
+
 from loguru import logger
+from observability import start_metrics_server
+from observability.profiling import install_profiler
+from observability.streaming import MESSAGES_PRODUCED, PROCESSING_MS
+from observability.tracing import EXCHANGE_TS, TRADES_PRODUCED, stamp, to_headers
 from quixstreams import Application
 
-from trades.config import settings
+from trades.config import get_settings
+from trades.kraken_backfill_api import KrakenBackfillAPI
 from trades.kraken_rest_api import KrakenRestAPI
 from trades.kraken_websocket_api import KrakenWebsocketAPI
 from trades.trade import Trade
@@ -10,40 +18,93 @@ from trades.trade import Trade
 def run(
     broker_address: str,
     kafka_topic_name: str,
-    kraken_api: KrakenWebsocketAPI | KrakenRestAPI,
+    kraken_api: KrakenWebsocketAPI | KrakenRestAPI | KrakenBackfillAPI,
+    metrics_port: Optional[int] = None,
+    kafka_book_topic: Optional[str] = None,
 ):
+    if metrics_port is not None:
+        start_metrics_server(metrics_port)
+
     app = Application(broker_address=broker_address)
 
     topic = app.topic(name=kafka_topic_name, value_serializer='json')
+    book_topic = (
+        app.topic(name=kafka_book_topic, value_serializer='json')
+        if kafka_book_topic is not None
+        else None
+    )
 
     with app.get_producer() as producer:
         while not kraken_api.is_done():
             events: list[Trade] = kraken_api.get_trades()
             for event in events:
+                started_at = time.perf_counter()
                 message = topic.serialize(key=event.symbol, value=event.to_dict())
 
-                producer.produce(topic=topic.name, value=message.value, key=message.key)
+                # Trace the time from the trade on the exchange to its indicators.
+                trace = stamp({EXCHANGE_TS: event.timestamp_ms}, TRADES_PRODUCED)
+
+                producer.produce(
+                    topic=topic.name,
+                    value=message.value,
+                    key=message.key,
+                    headers=to_headers(trace),
+                )
+                MESSAGES_PRODUCED.inc(topic=topic.name)
+                PROCESSING_MS.observe(
+                    (time.perf_counter() - started_at) * 1000, topic=topic.name
+                )
 
                 logger.info(f'Produced message to topic: {topic.name}')
                 logger.info(f'Trade {event.to_dict()} pushed to kafka')
 
-            import time
+            if book_topic is not None:
+                for snapshot in kraken_api.get_book_snapshots():
+                    message = book_topic.serialize(
+                        key=snapshot.symbol, value=snapshot.to_dict()
+                    )
+                    producer.produce(
+                        topic=book_topic.name, value=message.value, key=message.key
+                    )
+                    MESSAGES_PRODUCED.inc(topic=book_topic.name)
 
-            time.sleep(1)
+            # The websocket blocks until the next message, and must be read as
+            # fast as the book updates arrive.
+            if isinstance(kraken_api, KrakenRestAPI):
+                time.sleep(1)
 
 
 if __name__ == '__main__':
-    config = settings
+    config = get_settings()
+
+    install_profiler(
+        config.profile_dir, config.profile_duration_sec, config.profile_on_start
+    )
 
     if config.historical_data:
         logger.info('Using historical data')
         api = KrakenRestAPI(symbol=config.symbols[2], since_days=config.since_days)
     else:
         logger.info('Using real-time data')
-        api = KrakenWebsocketAPI(symbols=config.symbols)
+        api = KrakenWebsocketAPI(
+            symbols=config.symbols,
+            book_depth=config.book_depth if config.kafka_book_topic else None,
+            book_levels=config.book_levels,
+            book_snapshot_interval_ms=config.book_snapshot_interval_ms,
+        )
+        if config.backfill_to_live:
+            logger.info(f'Backfilling the last {config.since_days} days first')
+            api = KrakenBackfillAPI(
+                live=api,
+                since_days=config.since_days,
+                max_buffered_trades=config.max_buffered_trades,
+                dedup_window_sec=config.dedup_window_sec,
+            )
 
     run(
         broker_address=config.kafka_broker_address,
         kafka_topic_name=config.kafka_topic,
         kraken_api=api,
+        metrics_port=config.metrics_port,
+        kafka_book_topic=None if config.historical_data else config.kafka_book_topic,
     )
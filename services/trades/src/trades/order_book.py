@@ -0,0 +1,201 @@
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import Optional
+
+from pydantic import BaseModel
+
+# The number of levels per side the Kraken checksum is computed over.
+CHECKSUM_LEVELS = 10
+
+
+class BookSnapshot(BaseModel):
+    symbol: str
+    timestamp_ms: int
+    best_bid: float
+    best_ask: float
+    mid_price: float
+    spread: float
+    # The number of levels per side the depth and imbalance are computed over.
+    levels: int
+    bid_depth: float
+    ask_depth: float
+    # (bid_depth - ask_depth) / (bid_depth + ask_depth), in [-1, 1].
+    imbalance: float
+
+    def to_dict(self) -> dict:
+        return self.model_dump()
+
+
+class BookSide:
+    def __init__(self, descending: bool):
+        """
+        One side of an order book, as two parallel arrays of doubles sorted from
+        the best to the worst price.
+
+        Prices are stored negated on the bid side, so both sides are sorted in
+        ascending order and a level is found with a binary search. Inserting or
+        removing a level shifts the levels behind it, which for a book of a few
+        hundred levels is a small memmove, and the arrays hold 16 bytes per level
+        instead of two Python floats in a list.
+
+        Args:
+            descending: Whether the best price is the highest, i.e. for bids.
+        """
+        self._sign = -1.0 if descending else 1.0
+        self._keys = array('d')
+        self._qtys = array('d')
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def clear(self):
+        del self._keys[:]
+        del self._qtys[:]
+
+    def set(self, price: float, qty: float):
+        """
+        Set the quantity of a price level, removing the level when it is zero.
+        """
+        key = self._sign * price
+        i = bisect_left(self._keys, key)
+        found = i < len(self._keys) and self._keys[i] == key
+        if qty == 0:
+            if found:
+                del self._keys[i]
+                del self._qtys[i]
+        elif found:
+            self._qtys[i] = qty
+        else:
+            self._keys.insert(i, key)
+            self._qtys.insert(i, qty)
+
+    def truncate(self, depth: int):
+        """
+        Drop the levels beyond the given depth.
+        """
+        del self._keys[depth:]
+        del self._qtys[depth:]
+
+    def levels(self, n: int) -> list[tuple[float, float]]:
+        """
+        Get the (price, qty) of the best `n` levels.
+        """
+        return [
+            (self._sign * key, qty)
+            for key, qty in zip(self._keys[:n], self._qtys[:n], strict=True)
+        ]
+
+    def best(self) -> Optional[float]:
+        return self._sign * self._keys[0] if self._keys else None
+
+    def depth(self, n: int) -> float:
+        """
+        Get the total quantity of the best `n` levels.
+        """
+        return sum(self._qtys[:n])
+
+
+def _checksum_field(value: float, precision: int) -> str:
+    return f'{value:.{precision}f}'.replace('.', '').lstrip('0')
+
+
+class OrderBook:
+    def __init__(
+        self,
+        symbol: str,
+        depth: int,
+        price_precision: Optional[int] = None,
+        qty_precision: Optional[int] = None,
+    ):
+        """
+        The order book of a symbol, kept up to date from the Kraken v2 `book`
+        channel. The book never holds more than `depth` levels per side.
+
+        Args:
+            symbol: The symbol of the book.
+            depth: The depth the book was subscribed with.
+            price_precision: The number of decimals of the prices, used to
+                compute the checksum.
+            qty_precision: The number of decimals of the quantities, used to
+                compute the checksum.
+        """
+        self.symbol = symbol
+        self.depth = depth
+        self.price_precision = price_precision
+        self.qty_precision = qty_precision
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        # Whether the book was initialized from a snapshot.
+        self.is_ready = False
+
+    def apply_snapshot(self, bids: list[dict], asks: list[dict]):
+        self.bids.clear()
+        self.asks.clear()
+        self.apply_update(bids, asks)
+        self.is_ready = True
+
+    def apply_update(self, bids: list[dict], asks: list[dict]):
+        """
+        Apply the levels of an update, each a dict with `price` and `qty`.
+        """
+        for level in bids:
+            self.bids.set(level['price'], level['qty'])
+        for level in asks:
+            self.asks.set(level['price'], level['qty'])
+        # Levels pushed beyond the subscribed depth are no longer updated by
+        # the exchange, so they must be dropped.
+        self.bids.truncate(self.depth)
+        self.asks.truncate(self.depth)
+
+    def checksum(self) -> int:
+        """
+        Compute the Kraken checksum of the book: the CRC32 of the best 10 asks
+        from the lowest price, followed by the best 10 bids from the highest
+        price, each level as its price and quantity without the decimal point
+        and leading zeros.
+        """
+        fields = [
+            _checksum_field(price, self.price_precision)
+            + _checksum_field(qty, self.qty_precision)
+            for side in (self.asks, self.bids)
+            for price, qty in side.levels(CHECKSUM_LEVELS)
+        ]
+        return zlib.crc32(''.join(fields).encode())
+
+    def verify(self, checksum: int) -> bool:
+        """
+        Check the book against the checksum sent by the exchange. Books of
+        symbols with unknown precisions are not verified.
+        """
+        if self.price_precision is None or self.qty_precision is None:
+            return True
+        return self.checksum() == checksum
+
+    def snapshot(self, levels: int, timestamp_ms: int) -> Optional[BookSnapshot]:
+        """
+        Summarize the top of the book and its depth over the best `levels` levels.
+
+        Returns:
+            The snapshot, or None if either side of the book is empty.
+        """
+        best_bid = self.bids.best()
+        best_ask = self.asks.best()
+        if best_bid is None or best_ask is None:
+            return None
+
+        bid_depth = self.bids.depth(levels)
+        ask_depth = self.asks.depth(levels)
+        total_depth = bid_depth + ask_depth
+        return BookSnapshot(
+            symbol=self.symbol,
+            timestamp_ms=timestamp_ms,
+            best_bid=best_bid,
+            best_ask=best_ask,
+            mid_price=(best_bid + best_ask) / 2,
+            spread=best_ask - best_bid,
+            levels=levels,
+            bid_depth=bid_depth,
+            ask_depth=ask_depth,
+            imbalance=(bid_depth - ask_depth) / total_depth if total_depth else 0.0,
+        )
@@ -1,4 +1,5 @@
 from datetime import datetime, timezone
+from typing import Optional
 
 from pydantic import BaseModel
 
@@ -9,10 +10,17 @@ class Trade(BaseModel):
     quantity: float
     timestamp: str
     timestamp_ms: int
+    # The id of the trade on the exchange, shared by the REST and websocket APIs.
+    trade_id: Optional[int] = None
 
     @classmethod
     def from_websocket_api(
-        cls, symbol: str, price: float, quantity: float, timestamp: str
+        cls,
+        symbol: str,
+        price: float,
+        quantity: float,
+        timestamp: str,
+        trade_id: Optional[int] = None,
     ) -> 'Trade':
         """
         Convert a trade from the Kraken REST API to a Trade object.
@@ -25,11 +33,17 @@ class Trade(BaseModel):
             timestamp_ms=int(
                 datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%fZ').timestamp() * 1000
             ),
+            trade_id=trade_id,
         )
 
     @classmethod
     def from_rest_api(
-        cls, symbol: str, price: float, quantity: float, timestamp_sec: float
+        cls,
+        symbol: str,
+        price: float,
+        quantity: float,
+        timestamp_sec: float,
+        trade_id: Optional[int] = None,
     ) -> 'Trade':
         """
         Convert a trade from the Kraken REST API to a Trade object.
@@ -42,6 +56,7 @@ class Trade(BaseModel):
                 '%Y-%m-%dT%H:%M:%S.%fZ'
             ),
             timestamp_ms=int(timestamp_sec * 1000),
+            trade_id=trade_id,
         )
 
     def to_dict(self) -> dict: